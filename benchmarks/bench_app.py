@@ -0,0 +1,181 @@
+"""end-to-end latency and throughput of searches, mod toggles and image fetches, against a local fake osu! API (see fake_osu_api)
+
+    python benchmarks/bench_app.py [--sessions 4] [--iterations 50] [--latency-ms 30] [--jitter-ms 10] [--error-rate 0] [--json results.json]
+
+every session is a headless App with a real AppOssapiAsync pointed at the fake API, so requests go through the whole stack
+(request scheduler, shared connection pool, ossapi parsing, caches, renderers, control updates), only the network on the other end is fake
+each scenario runs on every session at once, and looks up ids no session has seen before, so the shared caches only help where they would in production
+"""
+from __future__ import annotations
+from collections.abc import Awaitable, Callable
+from typing import Any
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+# the fake API is plain http, which oauthlib refuses to send a token over unless told otherwise
+os.environ.setdefault('OAUTHLIB_INSECURE_TRANSPORT', '1')
+
+import headless
+import osu_api
+import osu_http
+import osu_images
+import osu_scheduler
+import osu_thumbnails
+from fake_osu_api import FakeOsuApi, make_png
+from osu_api_flet import App, BeatmapRenderer
+
+# --- -----
+
+MOD_CLICKS: tuple[str, ...] = ('HR', 'DT', 'HD', 'EZ', 'HT', 'NM')
+
+def make_app(fake_osu_api: FakeOsuApi) -> App:
+    page, _ = headless.make_page()
+    app: App = App(page)
+    app.ossapi_handler = osu_api.AppOssapiAsync(client_id=1, client_secret='benchmark', access_token='benchmark')
+    app.ossapi_handler.base_url = f'{fake_osu_api.base_url}/api/v2'
+    return app
+
+async def run_scenario(name: str, sessions: int, iterations: int, run: Callable[[int, int], Awaitable[bool]]) -> dict[str, Any]:
+    """run(session, iteration) on every session concurrently, each session doing its iterations one after another
+    run returns whether the iteration succeeded (as the user would see it), exceptions count as failures too
+    """
+    latencies_ms: list[float] = []
+    errors: int = 0
+
+    async def run_session(session: int) -> None:
+        nonlocal errors
+        for iteration in range(iterations):
+            iteration_start: float = time.perf_counter()
+            try:
+                succeeded: bool = await run(session, iteration)
+            except Exception:
+                succeeded = False
+            latencies_ms.append((time.perf_counter() - iteration_start)*1000)
+            errors += not succeeded
+
+    scenario_start: float = time.perf_counter()
+    await asyncio.gather(*[run_session(session) for session in range(sessions)])
+    scenario_seconds: float = time.perf_counter() - scenario_start
+
+    return {
+        'scenario': name,
+        'operations': len(latencies_ms),
+        'errors': errors,
+        'p50_ms': statistics.median(latencies_ms),
+        'p95_ms': headless.percentile(latencies_ms, 0.95),
+        'p99_ms': headless.percentile(latencies_ms, 0.99),
+        'max_ms': max(latencies_ms),
+        'ops_per_second': len(latencies_ms)/scenario_seconds
+    }
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=4)
+    parser.add_argument('--iterations', type=int, default=50, help='per session and scenario')
+    parser.add_argument('--latency-ms', type=float, default=30)
+    parser.add_argument('--jitter-ms', type=float, default=10)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--requests-per-minute', type=float, default=1_000_000, help='request scheduler budget (the app defaults to 1000, which would make this a benchmark of the rate limit)')
+    parser.add_argument('--prefetch', action='store_true', help='keep background prefetching of difficulty attributes on')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    # a click is measured until its star rating is shown, without waiting out the debounce first
+    BeatmapRenderer.MOD_TOGGLE_DEBOUNCE_SECONDS = 0
+    BeatmapRenderer.PREFETCH_DIFFICULTY_ATTRIBUTES = args.prefetch
+    osu_scheduler.request_scheduler = osu_scheduler.RequestScheduler(requests_per_minute=args.requests_per_minute, burst=max(30, args.sessions*4))
+
+    fake_osu_api: FakeOsuApi = FakeOsuApi(args.latency_ms/1000, args.jitter_ms/1000, args.error_rate)
+    await fake_osu_api.start()
+    apps: list[App] = [make_app(fake_osu_api) for _ in range(args.sessions)]
+    for app in apps:
+        await app.display('search')
+
+    # every (session, iteration) gets ids of its own, so lookups are never served by another session's cache entries
+    def get_id(scenario: int, session: int, iteration: int) -> int:
+        return 1 + scenario*1_000_000 + session*args.iterations + iteration
+
+    async def get_beatmap(session: int, iteration: int) -> bool:
+        app: App = apps[session]
+        app.textfield_beatmap_id.value = str(get_id(1, session, iteration))
+        await app.get_beatmap(None) # type: ignore
+        return app.beatmap_search_results_obj is not None
+
+    async def get_user(session: int, iteration: int) -> bool:
+        app: App = apps[session]
+        app.textfield_user_id_or_name.value = str(get_id(2, session, iteration))
+        await app.get_user(None) # type: ignore
+        return app.user_search_results_obj is not None
+
+    # every cycle of clicks starts on a beatmap nobody has toggled mods on yet, so each click waits for the API (except NM, known from the search)
+    mod_cycles: int = -(-args.iterations // len(MOD_CLICKS))
+    beatmap_renderers: list[list[BeatmapRenderer]] = [
+        [await BeatmapRenderer.init_async(app, await app.lookup_beatmap(get_id(3, session, cycle))) for cycle in range(mod_cycles)]
+        for session, app in enumerate(apps)
+    ]
+    for session, app in enumerate(apps):
+        for beatmap_renderer in beatmap_renderers[session]:
+            beatmap_renderer.render_osu_beatmap_info()
+
+    async def toggle_mod(session: int, iteration: int) -> bool:
+        beatmap_renderer: BeatmapRenderer = beatmap_renderers[session][iteration // len(MOD_CLICKS)]
+        await beatmap_renderer.toggle_mod_button(MOD_CLICKS[iteration % len(MOD_CLICKS)])(None) # type: ignore
+        return beatmap_renderer.text_beatmap_stars.value != 'Stars: ?'
+
+    # covers straight from the (fake) CDN into a cold image cache, then downscaled the way the image route would
+    image_cache: osu_images.ImageCache = osu_images.ImageCache(directory=tempfile.mkdtemp(prefix='osu-bench-images-'))
+    cover_entries: dict[tuple[int, int], osu_images.ImageCacheEntry] = {}
+
+    async def fetch_cover(session: int, iteration: int) -> bool:
+        entry: osu_images.ImageCacheEntry | None = await image_cache.get(f'{fake_osu_api.base_url}/assets/covers/{get_id(4, session, iteration)}/cover@2x.png')
+        if entry is not None:
+            cover_entries[(session, iteration)] = entry
+        return entry is not None
+
+    async def make_cover_thumbnail(session: int, iteration: int) -> bool:
+        entry: osu_images.ImageCacheEntry = cover_entries[(session, iteration)]
+        # the covers are all the same image, so give each its own digest to keep the thumbnail cache from answering
+        entry = osu_images.ImageCacheEntry(entry.content + iteration.to_bytes(4, 'big') + session.to_bytes(4, 'big'), entry.content_type, None, None, entry.fetched_at)
+        return (await osu_thumbnails.thumbnail_cache.get(entry, 400, None)) is not entry
+
+    scenarios: list[tuple[str, Callable[[int, int], Awaitable[bool]]]] = [
+        ('App.get_beatmap', get_beatmap),
+        ('App.get_user', get_user),
+        ('toggle_mod_button', toggle_mod),
+        ('image fetch', fetch_cover)
+    ]
+    if osu_thumbnails.thumbnail_cache.enabled:
+        # start the worker processes before timing anything
+        await osu_thumbnails.thumbnail_cache.get(osu_images.ImageCacheEntry(make_png(64, 64, seed=0), 'image/png', None, None, 0), 400, None)
+        scenarios.append(('thumbnail', make_cover_thumbnail))
+
+    results: list[dict[str, Any]] = []
+    for name, run in scenarios:
+        results.append(await run_scenario(name, args.sessions, args.iterations, run))
+
+    for app in apps:
+        app.release_beatmap_search_results()
+    osu_thumbnails.thumbnail_cache.shutdown()
+    await osu_http.close_client_session()
+    await fake_osu_api.stop()
+
+    print(f'{args.sessions} sessions x {args.iterations} iterations, fake API latency {args.latency_ms:g}+-{args.jitter_ms:g} ms, error rate {args.error_rate:g}')
+    print(f'{"":<20}{"ops":>8}{"errors":>8}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"max ms":>10}{"ops/s":>10}')
+    for result in results:
+        print(
+            f'{result["scenario"]:<20}{result["operations"]:>8}{result["errors"]:>8}'
+            f'{result["p50_ms"]:>10.2f}{result["p95_ms"]:>10.2f}{result["p99_ms"]:>10.2f}{result["max_ms"]:>10.2f}{result["ops_per_second"]:>10.1f}'
+        )
+    print(f'fake API requests: {fake_osu_api.requests}, injected errors: {fake_osu_api.errors}')
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as json_file:
+            json.dump({'arguments': vars(args), 'results': results, 'requests': fake_osu_api.requests}, json_file, indent=4)
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+"""construction time and memory of beatmap/user renderers, with and without their full panels
+
+    python benchmarks/bench_renderers.py [--count 50]
+
+"collapsed" is what a result card or a renderer that was never displayed costs, "panel" is what rendering the full panel adds on top
+"""
+from __future__ import annotations
+from collections.abc import Callable
+from typing import Any
+import argparse
+import asyncio
+import gc
+import statistics
+import sys
+import time
+import tracemalloc
+import headless
+from osu_api_flet import App, BeatmapRenderer, UserRenderer
+
+# --- -----
+
+def measure(label: str, count: int, build: Callable[[int], Any]) -> list[Any]:
+    gc.collect()
+    tracemalloc.start()
+    build_ms: list[float] = []
+    built: list[Any] = []
+    for i in range(count):
+        build_start: float = time.perf_counter()
+        built.append(build(i))
+        build_ms.append((time.perf_counter() - build_start)*1000)
+    memory_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f'{label:<36}{statistics.median(build_ms):>12.3f}{max(build_ms):>12.3f}{memory_bytes/count/1024:>14.1f}{memory_bytes/1024/1024:>14.2f}')
+    return built
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=50)
+    args = parser.parse_args()
+
+    page, _ = headless.make_page()
+    app: App = App(page)
+    app.ossapi_handler = headless.FakeOssapiHandler() # type: ignore
+    osu_beatmaps: list[Any] = [headless.make_fake_beatmap(beatmap_id) for beatmap_id in range(args.count)]
+    osu_users: list[Any] = [headless.make_fake_user(user_id) for user_id in range(args.count)]
+
+    # build one of everything first, so that one-off imports and caches inside Flet are not counted against the first measurement
+    BeatmapRenderer(app, osu_beatmaps[0]).build_beatmap_panel()
+    UserRenderer(app, osu_users[0]).build_user_panel()
+
+    print(f'{args.count} of each')
+    print(f'{"":<36}{"p50 ms":>12}{"max ms":>12}{"KiB each":>14}{"MiB total":>14}')
+
+    measure('beatmap card', args.count, lambda i: BeatmapRenderer.render_osu_beatmap_card(app, osu_beatmaps[i]))
+    beatmap_renderers: list[BeatmapRenderer] = measure('beatmap renderer (collapsed)', args.count, lambda i: BeatmapRenderer(app, osu_beatmaps[i]))
+    measure('  + beatmap panel', args.count, lambda i: beatmap_renderers[i].build_beatmap_panel())
+
+    def build_beatmap_renderer_with_panel(i: int) -> BeatmapRenderer:
+        beatmap_renderer: BeatmapRenderer = BeatmapRenderer(app, osu_beatmaps[i])
+        beatmap_renderer.build_beatmap_panel()
+        return beatmap_renderer
+
+    measure('beatmap renderer + panel', args.count, build_beatmap_renderer_with_panel)
+
+    measure('user row', args.count, lambda i: UserRenderer.render_osu_user_row(app, osu_users[i]))
+    user_renderers: list[UserRenderer] = measure('user renderer (collapsed)', args.count, lambda i: UserRenderer(app, osu_users[i]))
+    measure('  + user panel', args.count, lambda i: user_renderers[i].build_user_panel())
+
+    print()
+    print(f'BeatmapRenderer instance: {sys.getsizeof(beatmap_renderers[0])} bytes, __dict__: {hasattr(beatmap_renderers[0], "__dict__")}')
+    print(f'UserRenderer instance: {sys.getsizeof(user_renderers[0])} bytes, __dict__: {hasattr(user_renderers[0], "__dict__")}')
+
+if __name__ == '__main__':
+    asyncio.run(main())
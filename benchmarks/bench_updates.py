@@ -0,0 +1,97 @@
+"""websocket bytes and update latency of full page.update() calls vs targeted, batched updates
+
+    python benchmarks/bench_updates.py [--cards 10] [--clicks 200]
+
+runs the same session twice on a headless page, once with every update being a full page.update() (the old behaviour, same as OSU_TARGETED_UPDATES=0)
+and once through the targeted updater, then prints what each one sent and how long the handlers took
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import statistics
+import time
+import types
+import headless
+import osu_api_flet
+from osu_api_flet import App, BeatmapRenderer
+
+# --- -----
+
+MOD_CLICKS: tuple[str, ...] = ('HR', 'DT', 'HD', 'EZ', 'HT', 'NM')
+
+async def run_session(targeted: bool, cards: int, clicks: int) -> dict[str, float]:
+    page, connection = headless.make_page()
+    app: App = App(page)
+    app.updater.targeted = targeted
+    app.ossapi_handler = headless.FakeOssapiHandler() # type: ignore
+
+    await app.display('search')
+    await asyncio.sleep(0)
+
+    # a batch search with every card expanded, so the page holds as many controls as a busy session would
+    app.textfield_beatmap_id.value = ', '.join(str(beatmap_id) for beatmap_id in range(1, cards + 1))
+    await app.get_beatmap(None) # type: ignore
+    column_cards = app.container_beatmap_search_results.content
+    for expansiontile_beatmap_card in column_cards.controls: # type: ignore
+        await expansiontile_beatmap_card.on_change(types.SimpleNamespace(data='true'))
+    await asyncio.sleep(0)
+
+    beatmap_renderer: BeatmapRenderer = app.beatmap_search_results_list[0]
+    live_controls: int = app.count_live_controls()
+
+    # mod toggles (settings right away, then star rating from the API)
+    bytes_before: int = connection.websocket_stats.bytes
+    messages_before: int = connection.websocket_stats.messages
+    click_ms: list[float] = []
+    for i in range(clicks):
+        click_start: float = time.perf_counter()
+        await beatmap_renderer.toggle_mod_button(MOD_CLICKS[i % len(MOD_CLICKS)])(None) # type: ignore
+        await asyncio.sleep(0) # let the pending flush go out
+        click_ms.append((time.perf_counter() - click_start)*1000)
+    click_bytes: int = connection.websocket_stats.bytes - bytes_before
+    click_messages: int = connection.websocket_stats.messages - messages_before
+
+    # switching between the beatmap and user tabs
+    bytes_before = connection.websocket_stats.bytes
+    navigate_ms: list[float] = []
+    for i in range(clicks):
+        navigate_start: float = time.perf_counter()
+        await app.set_navigation_body((i + 1) % 2)
+        await asyncio.sleep(0)
+        navigate_ms.append((time.perf_counter() - navigate_start)*1000)
+    navigate_bytes: int = connection.websocket_stats.bytes - bytes_before
+
+    app.release_beatmap_search_results()
+    return {
+        'live_controls': live_controls,
+        'click_bytes': click_bytes/clicks,
+        'click_messages': click_messages/clicks,
+        'click_p50_ms': statistics.median(click_ms),
+        'click_p95_ms': headless.percentile(click_ms, 0.95),
+        'navigate_bytes': navigate_bytes/clicks,
+        'navigate_p50_ms': statistics.median(navigate_ms),
+        'navigate_p95_ms': headless.percentile(navigate_ms, 0.95)
+    }
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cards', type=int, default=10)
+    parser.add_argument('--clicks', type=int, default=200)
+    args = parser.parse_args()
+
+    # measure the updates themselves, not the debounce or background prefetching
+    BeatmapRenderer.MOD_TOGGLE_DEBOUNCE_SECONDS = 0
+    BeatmapRenderer.PREFETCH_DIFFICULTY_ATTRIBUTES = False
+
+    results: dict[str, dict[str, float]] = {}
+    for name, targeted in (('full page.update()', False), ('targeted', True)):
+        osu_api_flet.difficulty_attributes_cache = type(osu_api_flet.difficulty_attributes_cache)(max_entries=4096, ttl_seconds=6*60*60)
+        results[name] = await run_session(targeted, args.cards, args.clicks)
+
+    print(f'{args.cards} expanded beatmap cards, {args.clicks} clicks each')
+    print(f'{"":<22}' + ''.join(f'{name:>20}' for name in results))
+    for metric in next(iter(results.values())):
+        print(f'{metric:<22}' + ''.join(f'{result[metric]:>20.2f}' for result in results.values()))
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,224 @@
+"""local stand-in for the osu! API v2 endpoints the app uses, plus the covers/avatars CDN, serving canned responses
+
+    python benchmarks/fake_osu_api.py [--port 8790] [--latency-ms 50] [--jitter-ms 20] [--error-rate 0.01]
+
+point an AppOssapiAsync at it with ossapi_handler.base_url = f'{server.base_url}/api/v2' (and OAUTHLIB_INSECURE_TRANSPORT=1, since it is plain http)
+every response is delayed by latency +- jitter, and a fraction of API requests fail with a 500 (assets are never failed, only delayed)
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Any
+import argparse
+import asyncio
+import random
+import struct
+import zlib
+from aiohttp import web
+import ossapi # type: ignore
+
+# --- -----
+
+COVER_SIZE: tuple[int, int] = (1800, 500)
+AVATAR_SIZE: tuple[int, int] = (256, 256)
+
+def make_png(width: int, height: int, seed: int) -> bytes:
+    """a noisy RGB PNG, so that it is about as large as a real cover/avatar (a flat image would compress to almost nothing)
+    """
+    rng: random.Random = random.Random(seed)
+    # a few random rows repeated down the image, which keeps generation fast while still compressing about as badly as a photo
+    rows: list[bytes] = [b'\x00' + rng.randbytes(width*3) for _ in range(16)]
+    raw: bytes = b''.join(rows[y % len(rows)] for y in range(height))
+
+    def chunk(chunk_type: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)) + chunk(b'IDAT', zlib.compress(raw, 6)) + chunk(b'IEND', b'')
+
+### canned JSON, shaped like the real API responses (only the fields the app reads, ossapi fills in the rest with None)
+
+def make_user_json(base_url: str, user_id: int, username: str | None = None) -> dict[str, Any]:
+    return {
+        'id': user_id,
+        'username': username or f'user{user_id}',
+        'avatar_url': f'{base_url}/assets/avatars/{user_id}.png',
+        'country_code': 'JP',
+        'country': {'code': 'JP', 'name': 'Japan'},
+        'default_group': 'default',
+        'is_active': True,
+        'is_bot': False,
+        'is_deleted': False,
+        'is_online': False,
+        'is_supporter': False,
+        'pm_friends_only': False,
+        'profile_colour': None,
+        'title': None,
+        'playmode': 'osu',
+        'statistics': {
+            'global_rank': user_id,
+            'country_rank': max(user_id // 10, 1),
+            'pp': 12345.6 - user_id % 1000,
+            'hit_accuracy': 98.76,
+            'ranked_score': 1234567890,
+            'play_count': 12345,
+            'level': {'current': 100, 'progress': 50}
+        }
+    }
+
+def make_beatmapset_json(base_url: str, beatmapset_id: int) -> dict[str, Any]:
+    cover_url: str = f'{base_url}/assets/covers/{beatmapset_id}/cover@2x.png'
+    return {
+        'id': beatmapset_id,
+        'artist': 'Artist',
+        'artist_unicode': 'Artist',
+        'title': f'Title {beatmapset_id}',
+        'title_unicode': f'Title {beatmapset_id}',
+        'creator': 'Mapper',
+        'user_id': 2,
+        'status': 'ranked',
+        'bpm': 180.0,
+        'covers': {
+            'cover': cover_url, 'cover@2x': cover_url,
+            'card': cover_url, 'card@2x': cover_url,
+            'list': cover_url, 'list@2x': cover_url,
+            'slimcover': cover_url, 'slimcover@2x': cover_url
+        }
+    }
+
+def make_beatmap_json(base_url: str, beatmap_id: int) -> dict[str, Any]:
+    return {
+        'id': beatmap_id,
+        'beatmapset_id': beatmap_id,
+        'url': f'https://osu.ppy.sh/beatmaps/{beatmap_id}',
+        'mode': 'osu',
+        'mode_int': 0,
+        'version': 'Insane',
+        'user_id': 2,
+        'status': 'ranked',
+        'ranked': 1,
+        'difficulty_rating': 5.5,
+        'cs': 4.0,
+        'ar': 9.0,
+        'accuracy': 8.0,
+        'drain': 6.0,
+        'bpm': 180.0,
+        'total_length': 180,
+        'hit_length': 170,
+        'max_combo': 1000,
+        'count_circles': 600,
+        'count_sliders': 200,
+        'count_spinners': 2,
+        'beatmapset': make_beatmapset_json(base_url, beatmap_id)
+    }
+
+def make_difficulty_attributes_json(mods_value: int) -> dict[str, Any]:
+    return {'attributes': {'star_rating': 5.5 + mods_value % 7 / 10, 'max_combo': 1000, 'aim_difficulty': 2.8, 'speed_difficulty': 2.6}}
+
+# --- -----
+
+@dataclass
+class FakeOsuApi:
+    latency_seconds: float = 0
+    jitter_seconds: float = 0
+    error_rate: float = 0
+    seed: int = 0
+
+    requests: dict[str, int] = field(init=False, default_factory=dict)
+    errors: int = field(init=False, default=0)
+    base_url: str = field(init=False, default='')
+    _rng: random.Random = field(init=False)
+    _runner: web.AppRunner | None = field(init=False, default=None)
+    _assets: dict[tuple[str, int], bytes] = field(init=False, default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self._rng = random.Random(self.seed)
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> None:
+        web_app: web.Application = web.Application()
+        web_app.router.add_get('/api/v2/beatmaps/lookup', self.get_beatmap)
+        web_app.router.add_get('/api/v2/beatmaps', self.get_beatmaps)
+        web_app.router.add_post('/api/v2/beatmaps/{beatmap_id}/attributes', self.post_beatmap_attributes)
+        web_app.router.add_get('/api/v2/users', self.get_users)
+        web_app.router.add_get('/api/v2/users/{user}/{mode:.*}', self.get_user)
+        web_app.router.add_get('/assets/covers/{beatmapset_id}/{name}', self.get_cover)
+        web_app.router.add_get('/assets/avatars/{name}', self.get_avatar)
+
+        self._runner = web.AppRunner(web_app, access_log=None)
+        await self._runner.setup()
+        site: web.TCPSite = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port: int = self._runner.addresses[0][1]
+        self.base_url = f'http://{host}:{bound_port}'
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    # ---
+
+    async def respond(self, route: str, body: dict[str, Any]) -> web.Response:
+        self.requests[route] = self.requests.get(route, 0) + 1
+        await self.delay()
+        if self._rng.random() < self.error_rate:
+            self.errors += 1
+            return web.json_response({'error': 'injected error'}, status=500)
+        return web.json_response(body)
+
+    async def delay(self) -> None:
+        delay_seconds: float = max(0, self.latency_seconds + self._rng.uniform(-self.jitter_seconds, self.jitter_seconds))
+        if delay_seconds > 0:
+            await asyncio.sleep(delay_seconds)
+
+    async def get_beatmap(self, request: web.Request) -> web.Response:
+        return await self.respond('beatmap', make_beatmap_json(self.base_url, int(request.query['id'])))
+
+    async def get_beatmaps(self, request: web.Request) -> web.Response:
+        beatmap_ids: list[int] = [int(beatmap_id) for beatmap_id in request.query.getall('ids[]', [])]
+        return await self.respond('beatmaps', {'beatmaps': [make_beatmap_json(self.base_url, beatmap_id) for beatmap_id in beatmap_ids]})
+
+    async def post_beatmap_attributes(self, request: web.Request) -> web.Response:
+        # ossapi sends mods as acronyms (mods[]=HR&mods[]=DT)
+        form: Any = await request.post()
+        mods: str = ''.join(form.getall('mods[]', []))
+        mods_value: int = ossapi.Mod(mods).value if mods else 0
+        return await self.respond('beatmap_attributes', make_difficulty_attributes_json(mods_value))
+
+    async def get_user(self, request: web.Request) -> web.Response:
+        user: str = request.match_info['user']
+        user_json: dict[str, Any] = make_user_json(self.base_url, int(user)) if user.isdigit() and request.query.get('key') != 'username' else make_user_json(self.base_url, zlib.crc32(user.encode('utf-8')) % 1000000, user)
+        return await self.respond('user', user_json)
+
+    async def get_users(self, request: web.Request) -> web.Response:
+        user_ids: list[int] = [int(user_id) for user_id in request.query.getall('ids[]', [])]
+        return await self.respond('users', {'users': [make_user_json(self.base_url, user_id) for user_id in user_ids]})
+
+    async def get_cover(self, request: web.Request) -> web.Response:
+        return await self.respond_asset('cover', int(request.match_info['beatmapset_id']), COVER_SIZE)
+
+    async def get_avatar(self, request: web.Request) -> web.Response:
+        return await self.respond_asset('avatar', int(request.match_info['name'].split('.')[0]), AVATAR_SIZE)
+
+    async def respond_asset(self, route: str, asset_id: int, size: tuple[int, int]) -> web.Response:
+        self.requests[route] = self.requests.get(route, 0) + 1
+        await self.delay()
+        # every asset of a kind is the same image (generating one per id would dominate the benchmark), but each id is still its own URL to the app
+        content: bytes | None = self._assets.get((route, 0))
+        if content is None:
+            content = self._assets[(route, 0)] = make_png(*size, seed=len(route))
+        return web.Response(body=content, content_type='image/png', headers={'ETag': f'"{route}-{asset_id}"'})
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8790)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    args = parser.parse_args()
+
+    fake_osu_api: FakeOsuApi = FakeOsuApi(args.latency_ms/1000, args.jitter_ms/1000, args.error_rate)
+    await fake_osu_api.start(port=args.port)
+    print(f'serving on {fake_osu_api.base_url} (API at {fake_osu_api.base_url}/api/v2)')
+    await asyncio.Event().wait()
+
+if __name__ == '__main__':
+    asyncio.run(main())
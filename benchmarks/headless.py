@@ -0,0 +1,115 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any
+import asyncio
+import json
+import os
+import sys
+import types
+import uuid
+import flet as ft # type: ignore
+import ossapi as ossapi # type: ignore
+from flet_core.local_connection import LocalConnection # type: ignore
+from flet_core.protocol import ClientActions, ClientMessage, CommandEncoder, PageCommandsBatchResponsePayload, PageCommandResponsePayload # type: ignore
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# --- -----
+
+# headless Flet sessions for benchmarks: a real ft.Page on a connection that encodes every message the way the web server would, but only counts it instead of sending it
+
+@dataclass
+class WebsocketStats:
+    messages: int = 0
+    bytes: int = 0
+
+class HeadlessConnection(LocalConnection):
+    def __init__(self) -> None:
+        super().__init__()
+        self.websocket_stats: WebsocketStats = WebsocketStats()
+
+    def send_command(self, session_id: str, command: Any) -> PageCommandResponsePayload:
+        result, message = self._process_command(command)
+        if message:
+            self._send(message)
+        return PageCommandResponsePayload(result=result, error='')
+
+    def send_commands(self, session_id: str, commands: list[Any]) -> PageCommandsBatchResponsePayload:
+        results: list[Any] = []
+        messages: list[Any] = []
+        for command in commands:
+            result, message = self._process_command(command)
+            if command.name in ['add', 'get']:
+                results.append(result)
+            if message:
+                messages.append(message)
+        if messages:
+            self._send(ClientMessage(ClientActions.PAGE_CONTROLS_BATCH, messages))
+        return PageCommandsBatchResponsePayload(results=results, error='')
+
+    def _send(self, message: Any) -> None:
+        self.websocket_stats.messages += 1
+        self.websocket_stats.bytes += len(json.dumps(message, cls=CommandEncoder, separators=(',', ':')).encode('utf-8'))
+
+def make_page(loop: asyncio.AbstractEventLoop | None = None) -> tuple[ft.Page, HeadlessConnection]:
+    """a page that is "logged in" (page.auth.token.access_token is set), as if the OAuth flow had already finished
+    """
+    connection: HeadlessConnection = HeadlessConnection()
+    page: ft.Page = ft.Page(connection, uuid.uuid4().hex, loop or asyncio.get_running_loop())
+    page._Page__authorization = types.SimpleNamespace(token=types.SimpleNamespace(access_token='headless')) # type: ignore
+    return page, connection
+
+def percentile(samples: list[float], p: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples)*p))]
+
+# --- -----
+
+# in-process stand-in for OssapiAsync, returning just enough of each model for the renderers
+
+def make_fake_user(user_id: int, username: str | None = None) -> ossapi.User:
+    user: ossapi.User = ossapi.User.__new__(ossapi.User)
+    user._ossapi_data = dict(
+        id=user_id,
+        username=username or f'user{user_id}',
+        avatar_url=None,
+        title=None,
+        country_code='JP',
+        country=types.SimpleNamespace(name='Japan'),
+        statistics=types.SimpleNamespace(global_rank=user_id, country_rank=user_id, pp=1234.5, hit_accuracy=98.76, ranked_score=123456789),
+        statistics_rulesets=None
+    )
+    return user
+
+def make_fake_beatmap(beatmap_id: int) -> Any:
+    beatmapset: Any = types.SimpleNamespace(artist='Artist', title=f'Title {beatmap_id}', creator='Mapper', covers=types.SimpleNamespace(cover_2x=None))
+    return types.SimpleNamespace(
+        id=beatmap_id, url=f'https://osu.ppy.sh/b/{beatmap_id}', version='Insane', user_id=2,
+        cs=4.0, ar=9.0, accuracy=8.0, drain=6.0, total_length=180, bpm=180.0, max_combo=1000, difficulty_rating=5.5,
+        beatmapset=lambda: beatmapset
+    )
+
+@dataclass
+class FakeOssapiHandler:
+    latency_seconds: float = 0
+
+    async def beatmap(self, beatmap_id: int) -> Any:
+        await asyncio.sleep(self.latency_seconds)
+        return make_fake_beatmap(beatmap_id)
+
+    async def beatmaps(self, beatmap_ids: list[int]) -> list[Any]:
+        await asyncio.sleep(self.latency_seconds)
+        return [make_fake_beatmap(beatmap_id) for beatmap_id in beatmap_ids]
+
+    async def beatmap_attributes(self, beatmap_id: int, mods: ossapi.Mod | None = None) -> Any:
+        await asyncio.sleep(self.latency_seconds)
+        star_rating: float = 5.5 + (mods.value if mods is not None else 0) % 7 / 10
+        return types.SimpleNamespace(attributes=types.SimpleNamespace(star_rating=star_rating))
+
+    async def user(self, user: int | str, key: Any = None) -> ossapi.User:
+        await asyncio.sleep(self.latency_seconds)
+        return make_fake_user(int(user), None) if str(user).isdigit() else make_fake_user(1, str(user))
+
+    async def users(self, user_ids: list[int]) -> list[ossapi.User]:
+        await asyncio.sleep(self.latency_seconds)
+        return [make_fake_user(user_id) for user_id in user_ids]
@@ -0,0 +1,209 @@
+"""load test: hundreds of concurrent headless sessions running scripted flows against the local fake osu! API (see fake_osu_api)
+
+    python benchmarks/load_test.py [--sessions 300] [--concurrency 50] [--report-every 50] [--think-ms 0] [--latency-ms 30]
+
+each session logs in, searches a beatmap, toggles a few mods, switches to the user tab and searches a user, then stays open (as an idle tab would),
+so memory keeps growing with the number of sessions on the worker
+prints a row every --report-every sessions (live sessions, RSS, event loop lag, page.update time) to show where it starts to fall apart,
+then totals: sessions/second, RSS growth per session and per-step latency
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+import argparse
+import asyncio
+import gc
+import os
+import resource
+import statistics
+import time
+
+# the fake API is plain http, which oauthlib refuses to send a token over unless told otherwise
+os.environ.setdefault('OAUTHLIB_INSECURE_TRANSPORT', '1')
+# login_actual() reads the client id from the environment, the fake API does not check it
+os.environ.setdefault('OSU_CLIENT_ID', '1')
+
+import flet as ft # type: ignore
+import headless
+import osu_http
+import osu_scheduler
+from fake_osu_api import FakeOsuApi
+from osu_api_flet import App, BeatmapRenderer
+
+# --- -----
+
+FLOW_STEPS: tuple[str, ...] = ('login', 'search_beatmap', 'toggle_mods', 'switch_tab', 'search_user')
+MOD_CLICKS: tuple[str, ...] = ('HR', 'DT', 'HD', 'NM')
+
+def get_rss_bytes() -> int:
+    try:
+        with open('/proc/self/statm', 'r') as statm_file:
+            return int(statm_file.read().split()[1])*os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # not Linux: peak rather than current RSS (kilobytes on Linux, bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*1024
+
+@dataclass
+class LoopLagMonitor:
+    """how late a timer that should fire every interval actually fires, i.e. how long something else held the event loop
+    """
+    interval_seconds: float = 0.01
+
+    lags_ms: list[float] = field(init=False, default_factory=list)
+    _task: asyncio.Task[None] | None = field(init=False, default=None)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+    def take(self) -> list[float]:
+        lags_ms, self.lags_ms = self.lags_ms, []
+        return lags_ms
+
+    async def _run(self) -> None:
+        while True:
+            sleep_start: float = time.perf_counter()
+            await asyncio.sleep(self.interval_seconds)
+            self.lags_ms.append(max(0, (time.perf_counter() - sleep_start - self.interval_seconds)*1000))
+
+@dataclass
+class LoadTest:
+    fake_osu_api: FakeOsuApi
+    think_seconds: float = 0
+
+    apps: list[App] = field(init=False, default_factory=list)
+    connections: list[headless.HeadlessConnection] = field(init=False, default_factory=list)
+    step_ms: dict[str, list[float]] = field(init=False, default_factory=lambda: {step: [] for step in FLOW_STEPS})
+        # failed sessions, by step and exception type
+    failures: dict[str, int] = field(init=False, default_factory=dict)
+
+    async def run_session(self, session: int) -> None:
+        page, connection = headless.make_page()
+        page.title = 'osu! API test'
+        page.scroll = ft.ScrollMode.AUTO
+        app: App = App(page)
+        self.apps.append(app)
+        self.connections.append(connection)
+        await app.display()
+
+        async def login() -> None:
+            # the same handler Flet calls once the OAuth redirect comes back
+            await page.on_login(None) # type: ignore
+            app.ossapi_handler.base_url = f'{self.fake_osu_api.base_url}/api/v2'
+
+        async def search_beatmap() -> None:
+            app.textfield_beatmap_id.value = str(1 + session)
+            await app.get_beatmap(None) # type: ignore
+
+        async def toggle_mods() -> None:
+            beatmap_renderer: BeatmapRenderer | None = app.beatmap_search_results_obj
+            if beatmap_renderer is None:
+                raise RuntimeError('no beatmap to toggle mods on')
+            for mod in MOD_CLICKS:
+                await beatmap_renderer.toggle_mod_button(mod)(None) # type: ignore
+
+        async def switch_tab() -> None:
+            await app.set_navigation_body(1)
+
+        async def search_user() -> None:
+            app.textfield_user_id_or_name.value = str(1 + session)
+            await app.get_user(None) # type: ignore
+
+        for step, run_step in zip(FLOW_STEPS, (login, search_beatmap, toggle_mods, switch_tab, search_user)):
+            step_start: float = time.perf_counter()
+            try:
+                await run_step()
+            except Exception as e:
+                failure: str = f'{step}: {type(e).__name__}: {e}'
+                self.failures[failure] = self.failures.get(failure, 0) + 1
+                return
+            # let the batched control updates of this step go out before it counts as done
+            await asyncio.sleep(0)
+            self.step_ms[step].append((time.perf_counter() - step_start)*1000)
+            if self.think_seconds > 0:
+                await asyncio.sleep(self.think_seconds)
+
+    def get_page_update_ms(self) -> tuple[float, float]:
+        """mean and max page.update() time over every session so far
+        """
+        flushes: int = sum(app.updater.stats.flushes for app in self.apps)
+        flush_seconds_total: float = sum(app.updater.stats.flush_seconds_total for app in self.apps)
+        flush_seconds_max: float = max((app.updater.stats.flush_seconds_max for app in self.apps), default=0)
+        return (flush_seconds_total/flushes*1000 if flushes else 0, flush_seconds_max*1000)
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=300)
+    parser.add_argument('--concurrency', type=int, default=50, help='sessions running their flow at the same time')
+    parser.add_argument('--report-every', type=int, default=50)
+    parser.add_argument('--think-ms', type=float, default=0, help='pause between the steps of a flow')
+    parser.add_argument('--latency-ms', type=float, default=30)
+    parser.add_argument('--jitter-ms', type=float, default=10)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--requests-per-minute', type=float, default=1_000_000, help='request scheduler budget (the app defaults to 1000)')
+    args = parser.parse_args()
+
+    BeatmapRenderer.MOD_TOGGLE_DEBOUNCE_SECONDS = 0
+    osu_scheduler.request_scheduler = osu_scheduler.RequestScheduler(requests_per_minute=args.requests_per_minute, burst=max(30, args.concurrency*4))
+
+    fake_osu_api: FakeOsuApi = FakeOsuApi(args.latency_ms/1000, args.jitter_ms/1000, args.error_rate)
+    await fake_osu_api.start()
+    load_test: LoadTest = LoadTest(fake_osu_api, args.think_ms/1000)
+
+    # one session first (with ids none of the others use), so that one-off imports and caches are not counted as growth per session
+    await load_test.run_session(args.sessions)
+    gc.collect()
+    rss_start: int = get_rss_bytes()
+
+    loop_lag_monitor: LoopLagMonitor = LoopLagMonitor()
+    loop_lag_monitor.start()
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(args.concurrency)
+
+    print(f'{args.sessions} sessions, {args.concurrency} at a time, fake API latency {args.latency_ms:g}+-{args.jitter_ms:g} ms')
+    print(f'{"sessions":>10}{"sessions/s":>12}{"RSS MiB":>10}{"KiB/session":>13}{"lag p50 ms":>12}{"lag p99 ms":>12}{"lag max ms":>12}{"update ms":>11}{"update max":>12}')
+
+    async def run_session(session: int) -> None:
+        async with semaphore:
+            await load_test.run_session(session)
+
+    test_start: float = time.perf_counter()
+    for batch_start in range(0, args.sessions, args.report_every):
+        batch_size: int = min(args.report_every, args.sessions - batch_start)
+        batch_start_time: float = time.perf_counter()
+        await asyncio.gather(*[run_session(session) for session in range(batch_start, batch_start + batch_size)])
+        batch_seconds: float = time.perf_counter() - batch_start_time
+
+        lags_ms: list[float] = loop_lag_monitor.take() or [0]
+        sessions_done: int = batch_start + batch_size
+        rss: int = get_rss_bytes()
+        update_mean_ms, update_max_ms = load_test.get_page_update_ms()
+        print(
+            f'{sessions_done:>10}{batch_size/batch_seconds:>12.1f}{rss/1024/1024:>10.1f}{(rss - rss_start)/sessions_done/1024:>13.1f}'
+            f'{statistics.median(lags_ms):>12.2f}{headless.percentile(lags_ms, 0.99):>12.2f}{max(lags_ms):>12.2f}{update_mean_ms:>11.2f}{update_max_ms:>12.2f}'
+        )
+    test_seconds: float = time.perf_counter() - test_start
+
+    loop_lag_monitor.stop()
+    gc.collect()
+    rss_end: int = get_rss_bytes()
+
+    print()
+    print(f'sessions/s: {args.sessions/test_seconds:.1f} ({sum(load_test.failures.values())} failed)')
+    for failure, count in load_test.failures.items():
+        print(f'  {count} x {failure}')
+    print(f'RSS: {rss_start/1024/1024:.1f} -> {rss_end/1024/1024:.1f} MiB, {(rss_end - rss_start)/args.sessions/1024:.1f} KiB per open session')
+    print(f'live controls per session: {statistics.median(app.count_live_controls() for app in load_test.apps):.0f}, websocket bytes per session: {statistics.median(connection.websocket_stats.bytes for connection in load_test.connections):.0f}')
+    print(f'{"step":<16}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"max ms":>10}')
+    for step, step_ms in load_test.step_ms.items():
+        if step_ms:
+            print(f'{step:<16}{statistics.median(step_ms):>10.2f}{headless.percentile(step_ms, 0.95):>10.2f}{headless.percentile(step_ms, 0.99):>10.2f}{max(step_ms):>10.2f}')
+
+    for app in load_test.apps:
+        app.release_beatmap_search_results()
+    await osu_http.close_client_session()
+    await fake_osu_api.stop()
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,63 @@
+from __future__ import annotations
+from typing import Any
+import aiohttp
+import ossapi as ossapi # type: ignore
+from ossapi import OssapiAsync # type: ignore
+import osu_http
+import osu_metrics
+import osu_scheduler
+import osu_usernames
+
+# --- -----
+
+class AppOssapiAsync(OssapiAsync):
+    """OssapiAsync whose HTTP requests all go through the app-wide request scheduler and the shared osu_http connection pool
+    every session still gets its own instance (and its own access token), but they share one rate limit budget and one set of warm connections
+    """
+
+    # OssapiAsync (re)assigns self.session whenever it authenticates, so wrap each new OAuth session as it is set
+    @property
+    def session(self) -> Any:
+        return self._app_session
+
+    @session.setter
+    def session(self, oauth_session: Any) -> None:
+        request_async = oauth_session.request_async
+
+        async def scheduled_request_async(method: str, url: str, *, session: aiohttp.ClientSession, **kwargs: Any) -> aiohttp.ClientResponse:
+            # ossapi opens a throwaway ClientSession for every request, send it through the shared one instead
+            # the throwaway one is never used, and ossapi only closes it once a response has been read, which leaves it open
+            # whenever a request fails or is cancelled, so close it straight away (ossapi closing it again is a no-op)
+            await session.close()
+            return await osu_scheduler.request_scheduler.request(lambda: request_async(method, url, session=osu_http.get_client_session(), **kwargs))
+
+        oauth_session.request_async = scheduled_request_async
+        self._app_session = oauth_session
+
+    # the endpoints the app uses, timed end to end (including the wait for the request scheduler and any 429 retries)
+
+    async def beatmap(self, *args: Any, **kwargs: Any) -> ossapi.Beatmap:
+        with osu_metrics.registry.time(osu_metrics.API_REQUEST_SECONDS, osu_metrics.API_ERRORS_TOTAL, endpoint='beatmap'):
+            return await super().beatmap(*args, **kwargs)
+
+    async def beatmaps(self, *args: Any, **kwargs: Any) -> list[ossapi.Beatmap]:
+        with osu_metrics.registry.time(osu_metrics.API_REQUEST_SECONDS, osu_metrics.API_ERRORS_TOTAL, endpoint='beatmaps'):
+            return await super().beatmaps(*args, **kwargs)
+
+    async def beatmap_attributes(self, *args: Any, **kwargs: Any) -> ossapi.models.DifficultyAttributes:
+        with osu_metrics.registry.time(osu_metrics.API_REQUEST_SECONDS, osu_metrics.API_ERRORS_TOTAL, endpoint='beatmap_attributes'):
+            return await super().beatmap_attributes(*args, **kwargs)
+
+    # every user that comes back is added to the username index, for type-ahead and for resolving usernames to IDs locally
+
+    async def user(self, *args: Any, **kwargs: Any) -> ossapi.User:
+        with osu_metrics.registry.time(osu_metrics.API_REQUEST_SECONDS, osu_metrics.API_ERRORS_TOTAL, endpoint='user'):
+            user: ossapi.User = await super().user(*args, **kwargs)
+        osu_usernames.username_index.add_user(user)
+        return user
+
+    async def users(self, *args: Any, **kwargs: Any) -> list[ossapi.UserCompact]:
+        with osu_metrics.registry.time(osu_metrics.API_REQUEST_SECONDS, osu_metrics.API_ERRORS_TOTAL, endpoint='users'):
+            users: list[ossapi.UserCompact] = await super().users(*args, **kwargs)
+        osu_usernames.username_index.add_users(users)
+        return users
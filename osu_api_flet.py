@@ -1,41 +1,91 @@
 from __future__ import annotations
-from typing import Any, Literal
+from collections.abc import Awaitable
+from typing import Any, Literal, TypeVar
 from dataclasses import dataclass, field
-import base64
+import asyncio
+import re
+import time
 import flet as ft # type: ignore
 from flet_runtime.auth.oauth_provider import OAuthProvider # type: ignore
 #import aiohttp
-import math
 import os
 import ossapi as ossapi # type: ignore
 import ossapi.models # type: ignore
 from ossapi import OssapiAsync # type: ignore
-import requests
+import osu_api
+import osu_beatmap_store
+import osu_cache
+import osu_history
+import osu_images
+import osu_metrics
+import osu_mods
+import osu_scheduler
+import osu_server
+import osu_updates
+import osu_usernames
+from osu_mods import ModWorthPP
 
 # --- -----
 
-ModWorthPP = Literal['HD', 'HR', 'EZ', 'DT', 'NC', 'HT', 'FL', 'NF', 'SO']
-
-def get_beatmap_cs_with_mods(cs: float, mods: list[ModWorthPP]) -> float:
-    if 'EZ' in mods:
-        return cs*0.5
-    elif 'HR' in mods:
-        return min(cs*1.3, 10.0)
-    else:
-        return cs
-
-def get_beatmap_hp_with_mods(hp: float, mods: list[ModWorthPP]) -> float:
-    if 'EZ' in mods:
-        return hp*0.5
-    elif 'HR' in mods:
-        return min(hp*1.4, 10.0)
-    else:
-        return hp
+# difficulty attributes only depend on the beatmap and the mods, so one cache is shared by every session
+    # keyed on (beatmap id, bitmask of the mods that change difficulty), so that e.g. HR and HDHR share an entry (see ModSet.difficulty_mods)
+difficulty_attributes_cache: osu_cache.AsyncTTLCache[tuple[int, int], ossapi.models.DifficultyAttributes] = osu_cache.AsyncTTLCache(
+    max_entries=4096,
+    ttl_seconds=6*60*60
+)
+
+# beatmap lookups are deduplicated across sessions too, so a map posted somewhere and opened by dozens of people at once only resolves once
+    # beatmaps are keyed on beatmap id (the beatmapset comes embedded in the beatmap), mappers are keyed on user id
+beatmap_cache: osu_cache.AsyncTTLCache[int, ossapi.Beatmap] = osu_cache.AsyncTTLCache(
+    max_entries=1024,
+    ttl_seconds=10*60
+)
+beatmap_owner_cache: osu_cache.AsyncTTLCache[int, ossapi.User] = osu_cache.AsyncTTLCache(
+    max_entries=1024,
+    ttl_seconds=10*60
+)
+
+osu_metrics.registry.register_stats('difficulty_attributes_cache', lambda: difficulty_attributes_cache.as_dict())
+osu_metrics.registry.register_stats('beatmap_cache', lambda: beatmap_cache.as_dict())
+osu_metrics.registry.register_stats('beatmap_owner_cache', lambda: beatmap_owner_cache.as_dict())
+
+T = TypeVar('T')
+
+def parse_search_ids(search: str) -> list[int] | None:
+    """split a search of one or more IDs (separated by commas and/or whitespace) into a list of unique IDs, in the order given
+    returns None if any part of the search is not an ID
+    """
+    search_terms: list[str] = [search_term for search_term in re.split(r'[\s,]+', search) if search_term]
+    if not search_terms or not all(search_term.isdigit() for search_term in search_terms):
+        return None
+
+    return list(dict.fromkeys(int(search_term) for search_term in search_terms))
+
+def parse_user_searches(search: str) -> list[str]:
+    """split a search of one or more usernames/user IDs into a list of unique searches, in the order given
+    usernames can contain spaces, so only commas and newlines separate them
+    """
+    return list(dict.fromkeys(search_term.strip() for search_term in re.split(r'[,\n]+', search) if search_term.strip()))
+
+def chunk_list(items: list[T], chunk_size: int) -> list[list[T]]:
+    return [items[i:i+chunk_size] for i in range(0, len(items), chunk_size)]
 
 # --- -----
 
 Scene = Literal['login', 'search']
 
+@dataclass
+class HistoryEntry:
+    """a beatmap or user this session has viewed, kept with its renderer (selected mods, difficulty attributes, built controls)
+    so that going back to it shows it again as it was left, without any API calls
+    """
+        # navigation body the entry is shown in (0: beatmap search, 1: user search)
+    navigation_scene: int
+    search: str
+    renderer: BeatmapRenderer | UserRenderer
+        # what the entry put in its search results container, so it can be put back as is
+    control: ft.Control
+
 @dataclass
 class App:
     page: ft.Page
@@ -52,24 +102,59 @@ class App:
     ossapi_handler: OssapiAsync = field(init=False)
 
     OSU_PINK = '#FF66AA'
-    OSU_COLOR_HD = '#F1C232'
-    OSU_COLOR_HR = '#CC0000'
-    OSU_COLOR_EZ = '#6AA84F'
-    OSU_COLOR_DT = '#674EA7'
-    OSU_COLOR_NC = '#674EA7'
-    OSU_COLOR_HT = '#45818E'
-    OSU_COLOR_FL = '#434343'
+
+    ### Monitoring
+        # where the container types used in this app (View, AppBar, NavigationBar, Column, Row, Container, ExpansionTile, DataTable, PopupMenuButton, and Text with its spans) keep their child controls
+    CHILD_CONTROL_ATTRIBUTES = ('controls', 'content', 'spans', 'appbar', 'navigation_bar', 'leading', 'title', 'subtitle', 'trailing', 'actions', 'destinations', 'columns', 'rows', 'cells', 'label', 'items')
+    OSU_COLOR_HD = osu_mods.COLOR_HD
+    OSU_COLOR_HR = osu_mods.COLOR_HR
+    OSU_COLOR_EZ = osu_mods.COLOR_EZ
+    OSU_COLOR_DT = osu_mods.COLOR_DT
+    OSU_COLOR_NC = osu_mods.COLOR_NC
+    OSU_COLOR_HT = osu_mods.COLOR_HT
+    OSU_COLOR_FL = osu_mods.COLOR_FL
+
+    ### Batch Search
+        # limit of the bulk beatmaps endpoint
+    BEATMAPS_PER_REQUEST = 50
+        # limit of the bulk users endpoint
+    USERS_PER_REQUEST = 50
+        # usernames have no bulk endpoint, so they are looked up one by one, this many at a time
+    USERNAME_LOOKUPS_MAX_CONCURRENT = 4
+        # rows shown per page of a multi-user search (avatars are only downloaded for rows that are shown)
+    USER_ROWS_PER_PAGE = 10
+        # username type-ahead waits for a pause in typing this long before looking up (and sending) suggestions (set OSU_USERNAME_SUGGEST_DEBOUNCE_MS=0 to turn this off)
+    USERNAME_SUGGEST_DEBOUNCE_SECONDS = int(os.environ.get('OSU_USERNAME_SUGGEST_DEBOUNCE_MS', '120'))/1000
+    USERNAME_SUGGESTIONS = 8
+        # cards shown per page of a beatmap text search
+    BEATMAP_CARDS_PER_PAGE = 20
+
+    RATE_LIMITED_TEXT = 'The osu! API is busy right now, try again in a moment'
 
     ### Data
         # search beatmap
     beatmap_search_id: str = field(init=False)
     beatmap_search_results_obj: BeatmapRenderer | None = field(init=False)
+    beatmap_search_results_list: list[BeatmapRenderer] = field(init=False)
     beatmap_search_results_text: str = field(init=False)
+    beatmap_search_query: osu_beatmap_store.BeatmapQuery = field(init=False)
+    beatmap_search_results_offset: int = field(init=False)
         # search user
     user_search_id_or_name: str = field(init=False)
     user_search_results_obj: UserRenderer | None = field(init=False)
+    user_search_results_list: list[ossapi.UserCompact] = field(init=False)
     user_search_results_text: str = field(init=False)
+    username_suggestions_task: asyncio.Task[None] | None = field(init=False, default=None)
     
+    ### History
+        # the beatmaps and users viewed in this session, for back/forward (see osu_history)
+    history: osu_history.NavigationHistory[HistoryEntry] = field(init=False)
+
+    ### Views
+    scene_views: dict[Scene, ft.View] = field(init=False, default_factory=dict)
+        # collects the controls each handler changes and sends them in one targeted update
+    updater: osu_updates.ControlUpdater = field(init=False)
+
     ### Controls
     # login
     appbar_login_navigation: ft.AppBar = field(init=False)
@@ -77,18 +162,28 @@ class App:
     # search
     appbar_search_navigation: ft.AppBar = field(init=False)
     container_search_navigation_body: ft.Container = field(init=False)
+    column_search_navigation_body: ft.Column = field(init=False)
     navbar_search_navigation: ft.NavigationBar = field(init=False)
     popupmenuitem_logout: ft.PopupMenuItem = field(init=False)
+    button_history_back: ft.IconButton = field(init=False)
+    button_history_forward: ft.IconButton = field(init=False)
         # search beatmap
     textfield_beatmap_id: ft.TextField = field(init=False)
     button_beatmap_search: ft.ElevatedButton = field(init=False)
     container_beatmap_search_results: ft.Container = field(init=False)
+    column_beatmap_search_results_cards: ft.Column = field(init=False)
+    button_beatmap_search_results_more: ft.TextButton = field(init=False)
     text_beatmap_search_results: ft.Text = field(init=False)
+    column_beatmap_search: ft.Column = field(init=False)
         # search user
     textfield_user_id_or_name: ft.TextField = field(init=False)
+    column_username_suggestions: ft.Column = field(init=False)
     button_user_search: ft.ElevatedButton = field(init=False)
     container_user_search_results: ft.Container = field(init=False)
+    column_user_search_results_rows: ft.Column = field(init=False)
+    button_user_search_results_more: ft.TextButton = field(init=False)
     text_user_search_results: ft.Text = field(init=False)
+    column_user_search: ft.Column = field(init=False)
 
     def __post_init__(self) -> None:
         """after running page.on_login, go to the beatmap search scene of the App (now with an access token inside page.auth)
@@ -96,9 +191,11 @@ class App:
         """
         self.client_id: str = os.environ.get('OSU_CLIENT_ID', '')
         self.client_secret: str = os.environ.get('OSU_CLIENT_SECRET', '')
+        self.updater = osu_updates.ControlUpdater(self.page)
+        self.history = osu_history.NavigationHistory(release=App.release_history_entry)
 
         async def login_actual(_: ft.ControlEvent) -> None:
-            self.ossapi_handler = OssapiAsync(
+            self.ossapi_handler = osu_api.AppOssapiAsync(
                 client_id = int(self.client_id),
                 client_secret = self.client_secret,
                 access_token = str(self.page.auth.token.access_token) # type: ignore
@@ -107,6 +204,9 @@ class App:
             await self.display('search')
         
         async def logout_actual(_: ft.ControlEvent) -> None:
+            self.release_beatmap_search_results()
+            self.history.clear()
+
             await self.display('login')
 
         self.page.on_login = login_actual
@@ -165,39 +265,185 @@ class App:
     '''
 
     async def get_beatmap(self, _: ft.ControlEvent) -> None:
+        # the previously shown beatmaps are being left, so stop warming their difficulty attributes
+        self.release_beatmap_search_results()
+
         if not self.textfield_beatmap_id.value:
             self.beatmap_search_results_obj = None
             self.beatmap_search_results_text = 'Search is empty'
             
-            self.container_beatmap_search_results = ft.Container()
+            self.container_beatmap_search_results.content = None
             self.text_beatmap_search_results.value = self.beatmap_search_results_text
-            self.page.update() # type: ignore
+            self.updater.update(self.container_beatmap_search_results, self.text_beatmap_search_results)
         else:
             self.beatmap_search_id = self.textfield_beatmap_id.value
+            beatmap_search_ids: list[int] | None = parse_search_ids(self.beatmap_search_id)
 
-            if self.page.auth.token.access_token: # type: ignore
+            if self.page.auth.token.access_token and beatmap_search_ids is not None and len(beatmap_search_ids) > 1: # type: ignore
+                await self.get_beatmaps(beatmap_search_ids)
+            elif self.page.auth.token.access_token and beatmap_search_ids is None: # type: ignore
+                await self.search_beatmaps(self.beatmap_search_id)
+            elif self.page.auth.token.access_token: # type: ignore
                 try:
-                    beatmap_ossapi: ossapi.Beatmap = await self.ossapi_handler.beatmap(int(self.beatmap_search_id))
+                    lookup_start: float = time.perf_counter()
+                    beatmap_ossapi: ossapi.Beatmap = await self.lookup_beatmap(beatmap_search_ids[0]) # type: ignore
+                    lookup_seconds: float = time.perf_counter() - lookup_start
+
                     self.beatmap_search_results_obj = await BeatmapRenderer.init_async(self, beatmap_ossapi)
+                    self.beatmap_search_results_obj.record_stage('beatmap', lookup_seconds)
                     self.beatmap_search_results_text = ''
                     
                     self.container_beatmap_search_results.content = self.beatmap_search_results_obj.render_osu_beatmap_info()
                     self.text_beatmap_search_results.value = ''
-                    self.page.update() # type: ignore
-                except:
+                    self.updater.update(self.container_beatmap_search_results, self.text_beatmap_search_results)
+                    self.history.visit(HistoryEntry(0, self.beatmap_search_id, self.beatmap_search_results_obj, self.container_beatmap_search_results.content))
+                except osu_scheduler.RateLimited:
+                    osu_metrics.registry.increment(osu_metrics.SEARCH_ERRORS_TOTAL, search='beatmap', error='RateLimited')
+                    self.beatmap_search_results_obj = None
+                    self.beatmap_search_results_text = App.RATE_LIMITED_TEXT
+
+                    self.container_beatmap_search_results.content = None
+                    self.text_beatmap_search_results.value = self.beatmap_search_results_text
+                    self.updater.update(self.container_beatmap_search_results, self.text_beatmap_search_results)
+                except Exception as e:
+                    osu_metrics.registry.increment(osu_metrics.SEARCH_ERRORS_TOTAL, search='beatmap', error=type(e).__name__)
                     self.beatmap_search_results_obj = None
                     self.beatmap_search_results_text = 'Could not find beatmap'
 
                     self.container_beatmap_search_results.content = None
                     self.text_beatmap_search_results.value = self.beatmap_search_results_text
-                    self.page.update() # type: ignore
+                    self.updater.update(self.container_beatmap_search_results, self.text_beatmap_search_results)
             else:
                 self.beatmap_search_results_obj = None
                 self.beatmap_search_results_text = 'Could not get authorization'
 
                 self.container_beatmap_search_results.content = None
                 self.text_beatmap_search_results.value = self.beatmap_search_results_text
-                self.page.update() # type: ignore
+                self.updater.update(self.container_beatmap_search_results, self.text_beatmap_search_results)
+
+        self.update_history_buttons()
+
+    async def get_beatmaps(self, beatmap_ids:list[int]) -> None:
+        try:
+            beatmaps_ossapi: dict[int, ossapi.Beatmap] = await self.lookup_beatmaps(beatmap_ids)
+        except Exception as e:
+            osu_metrics.registry.increment(osu_metrics.SEARCH_ERRORS_TOTAL, search='beatmaps', error=type(e).__name__)
+            self.beatmap_search_results_obj = None
+            self.beatmap_search_results_text = App.RATE_LIMITED_TEXT if isinstance(e, osu_scheduler.RateLimited) else 'Could not find beatmaps'
+
+            self.container_beatmap_search_results.content = None
+            self.text_beatmap_search_results.value = self.beatmap_search_results_text
+            self.updater.update(self.container_beatmap_search_results, self.text_beatmap_search_results)
+            return
+
+        # show one compact card per beatmap, in the order searched, only building the full BeatmapRenderer once a card is expanded
+        missing_beatmap_ids: list[int] = [beatmap_id for beatmap_id in beatmap_ids if beatmap_id not in beatmaps_ossapi]
+        self.beatmap_search_results_obj = None
+        self.beatmap_search_results_text = f'Could not find beatmaps: {", ".join(str(beatmap_id) for beatmap_id in missing_beatmap_ids)}' if missing_beatmap_ids else ''
+
+        self.container_beatmap_search_results.content = ft.Column(
+            controls=[
+                BeatmapRenderer.render_osu_beatmap_card(self, beatmaps_ossapi[beatmap_id])
+                for beatmap_id in beatmap_ids if beatmap_id in beatmaps_ossapi
+            ]
+        )
+        self.text_beatmap_search_results.value = self.beatmap_search_results_text
+        self.updater.update(self.container_beatmap_search_results, self.text_beatmap_search_results)
+
+    async def lookup_beatmap(self, beatmap_id:int) -> ossapi.Beatmap:
+        # the local dump store answers ranked/loved beatmaps without an API call, everything else (or a missing store) goes through the cache to the API
+        beatmap_ossapi: ossapi.Beatmap | None = osu_beatmap_store.beatmap_store.get_beatmap(beatmap_id)
+        if beatmap_ossapi is not None:
+            return beatmap_ossapi
+        return await beatmap_cache.get_or_fetch(beatmap_id, lambda: self.ossapi_handler.beatmap(beatmap_id))
+
+    async def lookup_beatmaps(self, beatmap_ids:list[int]) -> dict[int, ossapi.Beatmap]:
+        # serve whatever is in the local dump store or already cached, and resolve the rest through the bulk beatmaps endpoint, all chunks at once
+        beatmaps_ossapi: dict[int, ossapi.Beatmap] = osu_beatmap_store.beatmap_store.get_beatmaps(beatmap_ids)
+        uncached_beatmap_ids: list[int] = []
+
+        for beatmap_id in beatmap_ids:
+            if beatmap_id in beatmaps_ossapi:
+                continue
+            beatmap_ossapi: ossapi.Beatmap | None = beatmap_cache.get(beatmap_id)
+            if beatmap_ossapi is not None:
+                beatmaps_ossapi[beatmap_id] = beatmap_ossapi
+            else:
+                uncached_beatmap_ids.append(beatmap_id)
+        beatmap_cache.stats.misses += len(uncached_beatmap_ids)
+
+        beatmap_chunks: list[list[ossapi.Beatmap]] = await asyncio.gather(*[
+            self.ossapi_handler.beatmaps(beatmap_ids_chunk)
+            for beatmap_ids_chunk in chunk_list(uncached_beatmap_ids, App.BEATMAPS_PER_REQUEST)
+        ])
+        for beatmap_chunk in beatmap_chunks:
+            for beatmap_ossapi in beatmap_chunk:
+                beatmap_cache.put(beatmap_ossapi.id, beatmap_ossapi)
+                beatmaps_ossapi[beatmap_ossapi.id] = beatmap_ossapi
+
+        return beatmaps_ossapi
+
+    async def search_beatmaps(self, search:str) -> None:
+        # text search over the local beatmap store, shown as compact cards a page at a time
+        self.beatmap_search_query = osu_beatmap_store.BeatmapQuery.parse(search)
+        self.beatmap_search_results_offset = 0
+        self.beatmap_search_results_obj = None
+
+        if not osu_beatmap_store.beatmap_store.can_search or self.beatmap_search_query.is_empty:
+            self.beatmap_search_results_text = 'Search by name is not available, search by beatmap ID instead' if self.beatmap_search_query.terms or self.beatmap_search_query.filters else 'Search is empty'
+
+            self.container_beatmap_search_results.content = None
+            self.text_beatmap_search_results.value = self.beatmap_search_results_text
+            self.updater.update(self.container_beatmap_search_results, self.text_beatmap_search_results)
+            return
+
+        self.beatmap_search_results_text = ''
+        self.column_beatmap_search_results_cards = ft.Column(controls=[])
+        self.button_beatmap_search_results_more = ft.TextButton('Show more', on_click=self.show_more_beatmaps, visible=False)
+        self.container_beatmap_search_results.content = ft.Column(
+            controls=[
+                self.column_beatmap_search_results_cards,
+                self.button_beatmap_search_results_more
+            ]
+        )
+        self.text_beatmap_search_results.value = self.beatmap_search_results_text
+        self.updater.update(self.container_beatmap_search_results, self.text_beatmap_search_results)
+
+        await self.show_more_beatmaps(None)
+
+    async def show_more_beatmaps(self, _: ft.ControlEvent | None) -> None:
+        # one id past the page, to know whether there is a next one
+        beatmap_ids: list[int] = osu_beatmap_store.beatmap_store.search_beatmaps(self.beatmap_search_query, self.beatmap_search_results_offset, App.BEATMAP_CARDS_PER_PAGE + 1)
+        page_beatmap_ids: list[int] = beatmap_ids[:App.BEATMAP_CARDS_PER_PAGE]
+
+        try:
+            # ranked beatmaps come straight from the store, the rest of the page in one bulk request
+            beatmaps_ossapi: dict[int, ossapi.Beatmap] = await self.lookup_beatmaps(page_beatmap_ids)
+        except Exception as e:
+            osu_metrics.registry.increment(osu_metrics.SEARCH_ERRORS_TOTAL, search='beatmap_search', error=type(e).__name__)
+            self.beatmap_search_results_text = App.RATE_LIMITED_TEXT if isinstance(e, osu_scheduler.RateLimited) else 'Could not load beatmaps'
+
+            self.text_beatmap_search_results.value = self.beatmap_search_results_text
+            self.updater.update(self.text_beatmap_search_results)
+            return
+
+        self.beatmap_search_results_offset += len(page_beatmap_ids)
+        self.beatmap_search_results_text = 'No beatmaps found' if not self.beatmap_search_results_offset else ''
+
+        self.column_beatmap_search_results_cards.controls.extend(
+            BeatmapRenderer.render_osu_beatmap_card(self, beatmaps_ossapi[beatmap_id], self.beatmap_search_query.mods)
+            for beatmap_id in page_beatmap_ids if beatmap_id in beatmaps_ossapi
+        )
+        self.button_beatmap_search_results_more.visible = len(beatmap_ids) > len(page_beatmap_ids)
+        self.text_beatmap_search_results.value = self.beatmap_search_results_text
+        self.updater.update(self.column_beatmap_search_results_cards, self.button_beatmap_search_results_more, self.text_beatmap_search_results)
+
+    def release_beatmap_search_results(self) -> None:
+        if self.beatmap_search_results_obj is not None:
+            self.beatmap_search_results_obj.cancel_prefetch()
+        for beatmap_renderer in self.beatmap_search_results_list:
+            beatmap_renderer.cancel_prefetch()
+        self.beatmap_search_results_list = []
 
     '''
     async def get_user_raw(self, _: ft.ControlEvent) -> None:
@@ -240,38 +486,263 @@ class App:
     '''
 
     async def get_user(self, _: ft.ControlEvent) -> None:
+        self.clear_username_suggestions()
+
         if not self.textfield_user_id_or_name.value:
             self.user_search_results_text = 'Search is empty'
             
             self.text_user_search_results.value = self.user_search_results_text
-            self.page.update() # type: ignore
+            self.updater.update(self.text_user_search_results)
         else:
             self.user_search_id_or_name = self.textfield_user_id_or_name.value
+            user_searches: list[str] = parse_user_searches(self.user_search_id_or_name)
 
-            if self.page.auth.token.access_token: # type: ignore
+            if self.page.auth.token.access_token and len(user_searches) > 1: # type: ignore
+                await self.get_users(user_searches)
+            elif self.page.auth.token.access_token: # type: ignore
                 try:
-                    user_ossapi: ossapi.User = await self.ossapi_handler.user(self.user_search_id_or_name)
-                    self.user_search_results_obj = UserRenderer(self, user_ossapi)
+                    user_ossapi: ossapi.User = await self.lookup_user(self.user_search_id_or_name)
+                    self.user_search_results_obj = await UserRenderer.init_async(self, user_ossapi)
                     self.user_search_results_text = ''
 
                     self.container_user_search_results.content = self.user_search_results_obj.render_osu_user_info()
                     self.text_user_search_results.value = ''
-                    self.page.update() # type: ignore
-                except:
+                    self.updater.update(self.container_user_search_results, self.text_user_search_results)
+                    self.history.visit(HistoryEntry(1, self.user_search_id_or_name, self.user_search_results_obj, self.container_user_search_results.content))
+                except osu_scheduler.RateLimited:
+                    osu_metrics.registry.increment(osu_metrics.SEARCH_ERRORS_TOTAL, search='user', error='RateLimited')
+                    self.user_search_results_obj = None
+                    self.user_search_results_text = App.RATE_LIMITED_TEXT
+
+                    self.container_user_search_results.content = None
+                    self.text_user_search_results.value = self.user_search_results_text
+                    self.updater.update(self.container_user_search_results, self.text_user_search_results)
+                except Exception as e:
+                    osu_metrics.registry.increment(osu_metrics.SEARCH_ERRORS_TOTAL, search='user', error=type(e).__name__)
                     self.user_search_results_obj = None
                     self.user_search_results_text = 'Could not find user'
 
                     self.container_user_search_results.content = None
                     self.text_user_search_results.value = self.user_search_results_text
-                    self.page.update() # type: ignore
+                    self.updater.update(self.container_user_search_results, self.text_user_search_results)
             else:
                 self.user_search_results_obj = None
                 self.user_search_results_text = 'Could not get authorization'
 
                 self.container_user_search_results.content = None
                 self.text_user_search_results.value = self.user_search_results_text
-                self.page.update() # type: ignore
+                self.updater.update(self.container_user_search_results, self.text_user_search_results)
+
+        self.update_history_buttons()
     
+    async def lookup_user(self, user_search:str) -> ossapi.User:
+        # a current username the app has seen before is looked up by its ID
+        user_id: int | None = osu_usernames.username_index.resolve(user_search) if not user_search.strip().isdigit() else None
+        user_ossapi: ossapi.User | None = None
+        if user_id is not None:
+            try:
+                user_ossapi = await self.ossapi_handler.user(user_id, key=ossapi.UserLookupKey.ID)
+            except osu_scheduler.RateLimited:
+                raise
+            except Exception:
+                # e.g. the account has since been deleted or restricted, the name may belong to someone else now
+                user_ossapi = None
+        # unless they have been renamed since the app saw them (someone else may have the name now)
+        if user_ossapi is None or not osu_usernames.is_username(user_ossapi, user_search):
+            user_ossapi = await self.ossapi_handler.user(user_search)
+        return user_ossapi
+
+    async def get_users(self, user_searches:list[str]) -> None:
+        try:
+            users_ossapi: dict[str, ossapi.UserCompact] = await self.lookup_users(user_searches)
+        except Exception as e:
+            osu_metrics.registry.increment(osu_metrics.SEARCH_ERRORS_TOTAL, search='users', error=type(e).__name__)
+            self.user_search_results_obj = None
+            self.user_search_results_text = App.RATE_LIMITED_TEXT if isinstance(e, osu_scheduler.RateLimited) else 'Could not find users'
+
+            self.container_user_search_results.content = None
+            self.text_user_search_results.value = self.user_search_results_text
+            self.updater.update(self.container_user_search_results, self.text_user_search_results)
+            return
+
+        missing_user_searches: list[str] = [user_search for user_search in user_searches if user_search not in users_ossapi]
+        self.user_search_results_obj = None
+        self.user_search_results_list = [users_ossapi[user_search] for user_search in user_searches if user_search in users_ossapi]
+        self.user_search_results_text = f'Could not find users: {", ".join(missing_user_searches)}' if missing_user_searches else ''
+
+        # one compact row per user, shown a page at a time
+        self.column_user_search_results_rows = ft.Column(controls=[])
+        self.button_user_search_results_more = ft.TextButton('Show more', on_click=self.show_more_users)
+        self.container_user_search_results.content = ft.Column(
+            controls=[
+                self.column_user_search_results_rows,
+                self.button_user_search_results_more
+            ]
+        )
+        self.text_user_search_results.value = self.user_search_results_text
+        self.updater.update(self.container_user_search_results, self.text_user_search_results)
+
+        await self.show_more_users(None)
+
+    async def show_more_users(self, _: ft.ControlEvent | None) -> None:
+        rows_shown: int = len(self.column_user_search_results_rows.controls)
+        users_ossapi: list[ossapi.UserCompact] = self.user_search_results_list[rows_shown:rows_shown+App.USER_ROWS_PER_PAGE]
+
+        expansiontiles_user_rows: list[ft.ExpansionTile] = [UserRenderer.render_osu_user_row(self, user_ossapi) for user_ossapi in users_ossapi]
+        self.column_user_search_results_rows.controls.extend(expansiontiles_user_rows)
+        self.button_user_search_results_more.visible = rows_shown + len(users_ossapi) < len(self.user_search_results_list)
+        # only the rows that were just shown have their avatars requested by the browser
+        self.updater.update(self.column_user_search_results_rows, self.button_user_search_results_more)
+
+    async def lookup_users(self, user_searches:list[str]) -> dict[str, ossapi.UserCompact]:
+        # resolve user IDs, and current usernames the username index knows the ID of, through the bulk users endpoint (all chunks at once)
+        # and the remaining usernames one by one with bounded parallelism
+        users_ossapi: dict[str, ossapi.UserCompact] = {}
+        user_ids: dict[str, int] = {user_search: int(user_search) for user_search in user_searches if user_search.isdigit()}
+        for user_search in user_searches:
+            if user_search not in user_ids:
+                user_id: int | None = osu_usernames.username_index.resolve(user_search)
+                if user_id is not None:
+                    user_ids[user_search] = user_id
+
+        user_chunks: list[list[ossapi.UserCompact]] = await asyncio.gather(*[
+            self.ossapi_handler.users(user_ids_chunk)
+            for user_ids_chunk in chunk_list(list(dict.fromkeys(user_ids.values())), App.USERS_PER_REQUEST)
+        ])
+        users_by_id: dict[int, ossapi.UserCompact] = {user_ossapi.id: user_ossapi for user_chunk in user_chunks for user_ossapi in user_chunk}
+        for user_search, user_id in user_ids.items():
+            # a username resolved from the index that is no longer theirs is looked up by name below
+            if user_id in users_by_id and (user_search.isdigit() or osu_usernames.is_username(users_by_id[user_id], user_search)):
+                users_ossapi[user_search] = users_by_id[user_id]
+
+        # a number that is not a user ID may still be someone's username
+        usernames: list[str] = [user_search for user_search in user_searches if user_search not in users_ossapi]
+        semaphore: asyncio.Semaphore = asyncio.Semaphore(App.USERNAME_LOOKUPS_MAX_CONCURRENT)
+
+        async def lookup_username(username: str) -> ossapi.User | None:
+            async with semaphore:
+                try:
+                    return await self.ossapi_handler.user(username, key=ossapi.UserLookupKey.USERNAME)
+                except ValueError:
+                    # ossapi raises ValueError when the API answers with an error (404 for a username nobody has),
+                    # anything else (rate limiting, network errors, cancellation) fails the whole search as before
+                    return None
+
+        for username, user_ossapi in zip(usernames, await asyncio.gather(*[lookup_username(username) for username in usernames])):
+            if user_ossapi is not None:
+                users_ossapi[username] = user_ossapi
+
+        return users_ossapi
+
+    async def suggest_usernames(self, _: ft.ControlEvent) -> None:
+        # every keystroke restarts the wait, so a burst of typing only looks up (and sends) suggestions once
+        if self.username_suggestions_task is not None:
+            self.username_suggestions_task.cancel()
+        self.username_suggestions_task = asyncio.create_task(self.update_username_suggestions())
+
+    async def update_username_suggestions(self) -> None:
+        if App.USERNAME_SUGGEST_DEBOUNCE_SECONDS > 0:
+            await asyncio.sleep(App.USERNAME_SUGGEST_DEBOUNCE_SECONDS)
+
+        # suggest for the username being typed, i.e. the last one of a multi-user search
+        username_prefix: str = re.split(r'[,\n]', self.textfield_user_id_or_name.value or '')[-1].strip()
+        username_suggestions: list[osu_usernames.UsernameSuggestion] = (
+            osu_usernames.username_index.suggest(username_prefix, App.USERNAME_SUGGESTIONS) if username_prefix and not username_prefix.isdigit() else []
+        )
+        # the only suggestion being what was typed would just repeat it
+        if len(username_suggestions) == 1 and username_suggestions[0].username.casefold() == username_prefix.casefold():
+            username_suggestions = []
+
+        self.column_username_suggestions.controls = [
+            ft.TextButton(
+                text=f'{username_suggestion.username} (formerly {username_suggestion.former_username})' if username_suggestion.former_username else username_suggestion.username,
+                on_click=self.pick_username_suggestion(username_suggestion)
+            )
+            for username_suggestion in username_suggestions
+        ]
+        self.updater.update(self.column_username_suggestions)
+
+    def pick_username_suggestion(self, username_suggestion:osu_usernames.UsernameSuggestion):
+        async def callback(_: ft.ControlEvent) -> None:
+            # replace the username being typed, and search right away if it is the only one
+            user_searches: list[str] = re.split(r'([,\n]\s*)', self.textfield_user_id_or_name.value or '')
+            user_searches[-1] = username_suggestion.username
+            self.textfield_user_id_or_name.value = ''.join(user_searches)
+            self.updater.update(self.textfield_user_id_or_name)
+
+            if len(user_searches) == 1:
+                await self.get_user(None) # type: ignore
+            else:
+                self.clear_username_suggestions()
+
+        return callback
+
+    def clear_username_suggestions(self) -> None:
+        if self.username_suggestions_task is not None:
+            self.username_suggestions_task.cancel()
+            self.username_suggestions_task = None
+        if self.column_username_suggestions.controls:
+            self.column_username_suggestions.controls = []
+            self.updater.update(self.column_username_suggestions)
+
+    @staticmethod
+    def release_history_entry(history_entry:HistoryEntry) -> None:
+        # an entry that aged out (or was dropped by visiting another one after going back) stops any background work,
+        # and is then only referenced by whatever still shows it, so its controls (cover/avatar images included) go once nothing does
+        if isinstance(history_entry.renderer, BeatmapRenderer):
+            history_entry.renderer.cancel_prefetch()
+            history_entry.renderer.cancel_beatmap_stars_update()
+
+    def is_history_entry_shown(self, history_entry:HistoryEntry) -> bool:
+        container_search_results: ft.Container = self.container_beatmap_search_results if history_entry.navigation_scene == 0 else self.container_user_search_results
+        return self.navbar_search_navigation.selected_index == history_entry.navigation_scene and container_search_results.content is history_entry.control
+
+    async def history_back_click(self, _: ft.ControlEvent) -> None:
+        # a search since the current entry (a batch search, an error) has replaced it on screen, so back returns to it first
+        current_entry: HistoryEntry | None = self.history.current
+        history_entry: HistoryEntry | None = current_entry if current_entry is not None and not self.is_history_entry_shown(current_entry) else self.history.back()
+        if history_entry is not None:
+            await self.show_history_entry(history_entry)
+
+    async def history_forward_click(self, _: ft.ControlEvent) -> None:
+        history_entry: HistoryEntry | None = self.history.forward()
+        if history_entry is not None:
+            await self.show_history_entry(history_entry)
+
+    async def show_history_entry(self, history_entry:HistoryEntry) -> None:
+        # put the kept renderer's controls back as they were left, nothing is fetched or rebuilt
+        match history_entry.navigation_scene:
+            case 0:
+                self.release_beatmap_search_results()
+                self.beatmap_search_id = history_entry.search
+                self.beatmap_search_results_obj = history_entry.renderer # type: ignore
+                self.beatmap_search_results_text = ''
+
+                self.textfield_beatmap_id.value = self.beatmap_search_id
+                self.container_beatmap_search_results.content = history_entry.control
+                self.text_beatmap_search_results.value = self.beatmap_search_results_text
+                self.updater.update(self.textfield_beatmap_id, self.container_beatmap_search_results, self.text_beatmap_search_results)
+            case _:
+                self.clear_username_suggestions()
+                self.user_search_id_or_name = history_entry.search
+                self.user_search_results_obj = history_entry.renderer # type: ignore
+                self.user_search_results_text = ''
+
+                self.textfield_user_id_or_name.value = self.user_search_id_or_name
+                self.container_user_search_results.content = history_entry.control
+                self.text_user_search_results.value = self.user_search_results_text
+                self.updater.update(self.textfield_user_id_or_name, self.container_user_search_results, self.text_user_search_results)
+
+        self.navbar_search_navigation.selected_index = history_entry.navigation_scene
+        self.updater.update(self.navbar_search_navigation)
+        await self.set_navigation_body(history_entry.navigation_scene)
+
+    def update_history_buttons(self) -> None:
+        current_entry: HistoryEntry | None = self.history.current
+        self.button_history_back.disabled = current_entry is None or (not self.history.can_go_back and self.is_history_entry_shown(current_entry))
+        self.button_history_forward.disabled = not self.history.can_go_forward
+        self.updater.update(self.button_history_back, self.button_history_forward)
+
     async def logout_click(self, _: ft.ControlEvent) -> None:
         """use Flet's built-in logout function to clear the page.auth access token and (manually) return to the login page
         """
@@ -283,12 +754,23 @@ class App:
         # set the App scene to the inputted scene, or to the login page by default
         self.scene = sc
 
-        # create a new empty View instance to represent the current page
+        # build the View of each scene only the first time it is displayed in this session, and reuse it after that
+        if self.scene not in self.scene_views:
+            self.scene_views[self.scene] = self.build_view(self.scene)
+        await self.reset_view(self.scene)
+
+        # only keep the current scene's View on the page, so that the views of earlier scenes are released instead of piling up
+        self.page.views.clear()
+        self.page.views.append(self.scene_views[self.scene])
+        self.updater.update()
+
+    def build_view(self, sc:Scene) -> ft.View:
+        # create a new empty View instance to represent the scene
         view: ft.View = ft.View(controls=[])
         view.scroll = ft.ScrollMode.AUTO # set the view to have a vertical scrollbar if content overflows
         
         # add different controls to the View depending on what scene is asked to be displayed
-        match self.scene:
+        match sc:
             case 'login':
                 ### Controls
                 self.appbar_beatmap_search_navigation = ft.AppBar(
@@ -301,20 +783,17 @@ class App:
                 ### View
                 view.controls.append(self.button_login)
             case 'search':
-                ### Data
-                self.beatmap_search_id = ''
-                self.beatmap_search_results_text = ''
-
-                self.user_search_id_or_name = ''
-                self.user_search_results_text = ''
-
                 ### Controls
                 self.popupmenuitem_logout = ft.PopupMenuItem(text="Log Out", checked=False, on_click=self.logout_click)
+                self.button_history_back = ft.IconButton(icon=ft.icons.ARROW_BACK, tooltip='Back', icon_color=ft.colors.BLACK, on_click=self.history_back_click, disabled=True)
+                self.button_history_forward = ft.IconButton(icon=ft.icons.ARROW_FORWARD, tooltip='Forward', icon_color=ft.colors.BLACK, on_click=self.history_forward_click, disabled=True)
                 self.appbar_search_navigation = ft.AppBar(
                     title=ft.Text(value='osu! API Test', color=ft.colors.BLACK),
                     bgcolor=App.OSU_PINK,
                     automatically_imply_leading=False,
                     actions=[
+                        self.button_history_back,
+                        self.button_history_forward,
                         ft.PopupMenuButton(
                             items=[
                                 self.popupmenuitem_logout
@@ -324,54 +803,44 @@ class App:
                 )
 
                 # search beatmap
-                self.textfield_beatmap_id = ft.TextField(label='Beatmap ID', value=self.beatmap_search_id, on_submit=self.get_beatmap, width=200, autofocus=True)
+                self.textfield_beatmap_id = ft.TextField(label='Beatmap ID(s) or Search', hint_text='freedom dive hr stars>7', value='', on_submit=self.get_beatmap, width=300, autofocus=True)
                 self.button_beatmap_search = ft.ElevatedButton('Search', on_click=self.get_beatmap)
                 self.container_beatmap_search_results = ft.Container()
-                self.text_beatmap_search_results = ft.Text(value=self.beatmap_search_results_text, color=ft.colors.RED, selectable=True)
+                self.text_beatmap_search_results = ft.Text(value='', color=ft.colors.RED, selectable=True)
+                self.column_beatmap_search = ft.Column(
+                    controls = [
+                        self.textfield_beatmap_id,
+                        self.button_beatmap_search,
+                        self.container_beatmap_search_results,
+                        self.text_beatmap_search_results
+                    ]
+                )
                 
                 # search user
-                self.textfield_user_id_or_name = ft.TextField(label='Username or User ID', value=self.user_search_id_or_name, on_submit=self.get_user, width=200, autofocus=True)
+                self.textfield_user_id_or_name = ft.TextField(label='Username(s) or User ID(s)', value='', on_submit=self.get_user, on_change=self.suggest_usernames, width=200, autofocus=True)
+                self.column_username_suggestions = ft.Column(controls=[], spacing=0)
                 self.button_user_search = ft.ElevatedButton('Search', on_click=self.get_user)
                 self.container_user_search_results = ft.Container()
-                self.text_user_search_results = ft.Text(value=self.user_search_results_text, color=ft.colors.RED, selectable=True)
+                self.text_user_search_results = ft.Text(value='', color=ft.colors.RED, selectable=True)
+                self.column_user_search = ft.Column(
+                    controls = [
+                        self.textfield_user_id_or_name,
+                        self.column_username_suggestions,
+                        self.button_user_search,
+                        self.container_user_search_results,
+                        self.text_user_search_results
+                    ]
+                )
 
                 # navigate between searches
+                    # both searches stay on the page and only the selected one is visible, so switching tabs only sends their visibility instead of re-adding a whole search
+                self.column_search_navigation_body = ft.Column(
+                    controls = [
+                        self.column_beatmap_search,
+                        self.column_user_search
+                    ]
+                )
                 self.container_search_navigation_body = ft.Container()
-
-                # function to change the contents of the navigation body to a specific "scene"
-                async def set_navigation_body(navigation_scene:int) -> None:
-                    match navigation_scene:
-                        case 0:
-                            # search beatmap
-                            self.container_search_navigation_body.content = ft.Column(
-                                controls = [
-                                    self.textfield_beatmap_id,
-                                    self.button_beatmap_search,
-                                    self.container_beatmap_search_results,
-                                    self.text_beatmap_search_results
-                                ]
-                            )
-                        case 1:
-                            # search user
-                            self.container_search_navigation_body.content = ft.Column(
-                                controls = [
-                                    self.textfield_user_id_or_name,
-                                    self.button_user_search,
-                                    self.container_user_search_results,
-                                    self.text_user_search_results
-                                ]
-                            )
-                        case _:
-                            self.container_search_navigation_body.content = ft.Text('Could not navigate click', color=ft.colors.BLACK)
-                        
-                    self.page.update() # type: ignore
-
-                # set default navigation body to beatmap search
-                await set_navigation_body(0)
-
-                # function to set navigation body to whichever Destination is clicked in the Navigation Bar
-                async def navigate_click(e: ft.ControlEvent) -> None:
-                    await set_navigation_body(e.control.selected_index) # type: ignore
                 
                 # navigation bar destinations
                 self.navbar_search_navigation = ft.NavigationBar(
@@ -385,7 +854,7 @@ class App:
                         )
                     ],
                     height=80,
-                    on_change=navigate_click 
+                    on_change=self.navigate_click 
                 )
                 
                 ### View
@@ -393,17 +862,99 @@ class App:
                 view.controls.append(self.container_search_navigation_body)
                 view.controls.append(self.navbar_search_navigation)
 
-        self.page.views.append(view)
-        self.page.update() # type: ignore
+        return view
+
+    async def reset_view(self, sc:Scene) -> None:
+        # put a (possibly reused) scene back into the state it starts in
+        match sc:
+            case 'login':
+                pass
+            case 'search':
+                ### Data
+                self.beatmap_search_id = ''
+                self.beatmap_search_results_obj = None
+                self.beatmap_search_results_list = []
+                self.beatmap_search_results_text = ''
+                self.beatmap_search_query = osu_beatmap_store.BeatmapQuery()
+                self.beatmap_search_results_offset = 0
+
+                self.user_search_id_or_name = ''
+                self.user_search_results_obj = None
+                self.user_search_results_list = []
+                self.user_search_results_text = ''
+
+                ### Controls
+                self.textfield_beatmap_id.value = self.beatmap_search_id
+                self.container_beatmap_search_results.content = None
+                self.text_beatmap_search_results.value = self.beatmap_search_results_text
+
+                self.textfield_user_id_or_name.value = self.user_search_id_or_name
+                self.column_username_suggestions.controls = []
+                self.container_user_search_results.content = None
+                self.text_user_search_results.value = self.user_search_results_text
+
+                # set default navigation body to beatmap search
+                self.navbar_search_navigation.selected_index = 0
+                await self.set_navigation_body(0)
+
+    # function to change the contents of the navigation body to a specific "scene"
+    async def set_navigation_body(self, navigation_scene:int) -> None:
+        match navigation_scene:
+            case 0:
+                # search beatmap
+                self.container_search_navigation_body.content = self.column_search_navigation_body
+                self.column_beatmap_search.visible = True
+                self.column_user_search.visible = False
+            case 1:
+                # search user
+                self.container_search_navigation_body.content = self.column_search_navigation_body
+                self.column_beatmap_search.visible = False
+                self.column_user_search.visible = True
+            case _:
+                self.container_search_navigation_body.content = ft.Text('Could not navigate click', color=ft.colors.BLACK)
+            
+        self.updater.update(self.container_search_navigation_body)
+        # whether back has anything to go to depends on what is on screen
+        self.update_history_buttons()
+
+    # function to set navigation body to whichever Destination is clicked in the Navigation Bar
+    async def navigate_click(self, e: ft.ControlEvent) -> None:
+        await self.set_navigation_body(e.control.selected_index) # type: ignore
+
+    def count_live_controls(self) -> int:
+        """number of controls in this session's page right now, to keep an eye on long-lived sessions
+        """
+        def count_controls(control: ft.Control) -> int:
+            return 1 + sum(count_controls(child) for child in get_child_controls(control))
+
+        def get_child_controls(control: ft.Control) -> list[ft.Control]:
+            # through the public attributes the app's container types keep their children in (rather than Flet's private _get_children())
+            child_controls: list[ft.Control] = []
+            for attribute in App.CHILD_CONTROL_ATTRIBUTES:
+                value: Any = getattr(control, attribute, None)
+                child_controls.extend(child for child in (value if isinstance(value, list) else [value]) if isinstance(child, ft.Control))
+            return child_controls
+
+        return sum(count_controls(view) for view in self.page.views)
 
     @classmethod
     async def main(cls, page: ft.Page) -> None:
         page.title = 'osu! API test'
         page.scroll = ft.ScrollMode.AUTO
 
+        osu_metrics.registry.increment(osu_metrics.SESSIONS_TOTAL)
+        osu_metrics.registry.increment(osu_metrics.ACTIVE_SESSIONS)
+
+        # fired once Flet drops the session (after the client has been gone for longer than the session timeout)
+        async def close_session(_: ft.ControlEvent) -> None:
+            osu_metrics.registry.increment(osu_metrics.ACTIVE_SESSIONS, -1)
+
+        page.on_close = close_session
+
         await App(page).display()
 
-@dataclass
+# renderers use __slots__, since a session can hold dozens of them and each one has ~40 control attributes
+@dataclass(slots=True)
 class BeatmapRenderer:
     ### __init__()
     _app: App
@@ -415,7 +966,31 @@ class BeatmapRenderer:
     osu_beatmap_difficulty_attributes: ossapi.models.DifficultyAttributes | None = field(init=False)
 
     ### Data
-    selected_mods_list: list[ModWorthPP] = field(init=False)
+    selected_mods: osu_mods.ModSet = field(init=False)
+    prefetch_task: asyncio.Task[None] | None = field(init=False, default=None)
+        # latest-wins mod toggling
+    beatmap_stars_task: asyncio.Task[None] | None = field(init=False, default=None)
+    mod_toggle_updates_applied: int = field(init=False, default=0)
+    mod_toggle_updates_cancelled: int = field(init=False, default=0)
+        # milliseconds spent in each stage of building this renderer (beatmap, controls, owner, difficulty_attributes, init, panel), also recorded in osu_metrics
+    stage_timings: dict[str, float] = field(init=False, default_factory=dict)
+        # whether build_beatmap_panel() has run yet (every control below "beatmap statistics" only exists after it has)
+    beatmap_panel_built: bool = field(init=False, default=False)
+
+    ### Prefetch
+        # after a beatmap opens, speculatively fetch difficulty attributes for the most commonly played mod combinations in the background
+        # HD is left out, since HD, HDHR, HDDT and HDHRDT have the same attributes as NoMod, HR, DT and HRDT (see ModSet.difficulty_mods)
+        # (set OSU_PREFETCH_DIFFICULTY_ATTRIBUTES=0 to turn this off, or OSU_PREFETCH_MODS to a comma-separated list like HR,DT,EZ,HT)
+    PREFETCH_DIFFICULTY_ATTRIBUTES = os.environ.get('OSU_PREFETCH_DIFFICULTY_ATTRIBUTES', '1') != '0'
+    PREFETCH_MODS = tuple(osu_mods.ModSet.from_acronyms(mods) for mods in os.environ.get('OSU_PREFETCH_MODS', 'HR,DT,HRDT').split(',') if mods)
+    PREFETCH_MAX_CONCURRENT = 2
+        # prefetching stops while the app-wide request budget has fewer tokens than this left (or anything is queued for one),
+        # so it never spends requests that searches and mod toggles are about to need
+    PREFETCH_MIN_SCHEDULER_TOKENS = int(os.environ.get('OSU_PREFETCH_MIN_SCHEDULER_TOKENS', '10'))
+
+    ### Mod Toggling
+        # star rating requests wait this long after a click, so a burst of clicks only makes one request (set OSU_MOD_TOGGLE_DEBOUNCE_MS=0 to turn this off)
+    MOD_TOGGLE_DEBOUNCE_SECONDS = int(os.environ.get('OSU_MOD_TOGGLE_DEBOUNCE_MS', '150'))/1000
 
     ### Controls
     container_beatmap_metadata: ft.Container = field(init=False)
@@ -448,18 +1023,22 @@ class BeatmapRenderer:
     button_mod_dt: ft.IconButton = field(init=False)
     button_mod_nc: ft.IconButton = field(init=False)
     button_mod_ht: ft.IconButton = field(init=False)
+    button_mod_fl: ft.IconButton = field(init=False)
+    button_mod_nf: ft.IconButton = field(init=False)
+    button_mod_so: ft.IconButton = field(init=False)
 
     def __post_init__(self) -> None:
         self.osu_beatmapset = self.osu_beatmap.beatmapset()
 
         # --- -----
 
-        # temp: fetch image as base64 manually, since Flet is unable to load images if view=ft.AppView.WEB_BROWSER for flet>=0.21.1
+        # Flet is unable to load images from other origins if view=ft.AppView.WEB_BROWSER for flet>=0.21.1
         # see: https://github.com/flet-dev/flet/issues/2851
+            # so the cover is served from this app's own image route (see osu_server), which the browser downloads and caches by itself
+            # downscaled to the width it is displayed at (see osu_thumbnails)
 
         self.image_beatmap_banner = ft.Image(
-            #src=self.osu_beatmapset.covers.cover_2x,
-            src_base64=base64.b64encode(requests.get(self.osu_beatmapset.covers.cover_2x).content).decode('utf-8'),
+            src=osu_images.image_cache.get_src(self.osu_beatmapset.covers.cover_2x, width=400),
             width=400,
             fit=ft.ImageFit.CONTAIN,
             gapless_playback=True
@@ -508,20 +1087,12 @@ class BeatmapRenderer:
             selectable=True,
         )
 
-        # Beatmap Container without diff owner
-        self.container_beatmap_body = ft.Container(
-            content=ft.Column(
-                controls=[
-                    self.image_beatmap_banner,
-                    self.text_beatmap_artist_title,
-                    self.text_beatmapset_creator
-                ]
-            ),
-            bgcolor='#DDDDDD',#App.OSU_PINK,
-            padding=ft.padding.all(20)
-        )
+        self.selected_mods = osu_mods.ModSet()
 
-        # --- -----
+    def build_beatmap_panel(self) -> None:
+        # statistics, settings and mods are only needed once the full panel is shown, so they are built the first time it is rendered
+        # (a renderer behind a collapsed card or one that is never displayed never pays for its ~40 controls)
+        self.beatmap_panel_built = True
 
         self.text_beatmap_stars = ft.Text(value=f'Stars: {self.osu_beatmap.difficulty_rating}', tooltip=f'{self.osu_beatmap.difficulty_rating}', color=ft.colors.BLACK)
         self.text_beatmap_length = ft.Text(value=f'Length: {self.osu_beatmap.total_length}', tooltip=f'{self.osu_beatmap.total_length}', color=ft.colors.BLACK)
@@ -630,10 +1201,9 @@ class BeatmapRenderer:
 
         # --- -----
         
-        self.selected_mods_list = []
         self.text_selected_mods = ft.Text(
-            value=f'Mods: {ossapi.Mod(self.selected_mods_list)}',
-            tooltip=f'{ossapi.Mod(self.selected_mods_list)}'
+            value=f'Mods: {self.selected_mods}',
+            tooltip=f'{self.selected_mods}'
         )
 
         # NoMod
@@ -744,10 +1314,12 @@ class BeatmapRenderer:
         )
 
     async def _post_init_async(self):
-        # await coroutine to get the user that mapped the beatmap
-            # ignore type until Ossapi fixes the type hint of user() to be Union[User, Awaitable[User]] instead of just User
-        #assert isawaitable(self.osu_beatmap.user())
-        self.osu_beatmap_owner = await self.osu_beatmap.user() # type: ignore       
+        # the user that mapped the beatmap and the NoMod difficulty attributes only depend on the beatmap itself,
+        # so fetch them both at once (the whole stage takes as long as the slower of them, rather than both added up)
+        self.osu_beatmap_owner, self.osu_beatmap_difficulty_attributes = await asyncio.gather(
+            self.time_stage('owner', self.lookup_beatmap_owner()),
+            self.time_stage('difficulty_attributes', self.get_initial_difficulty_attributes())
+        )
         assert isinstance(self.osu_beatmap_owner, ossapi.User) # type: ignore   
 
         # --- -----
@@ -792,135 +1364,239 @@ class BeatmapRenderer:
     def toggle_mod_button(self, mod:ModWorthPP | Literal['NM']):
         async def callback(_: ft.ControlEvent) -> None:
             if mod == 'NM':
-                self.selected_mods_list = []
+                await self.select_mods(osu_mods.ModSet())
             else:
-                if mod in self.selected_mods_list:
-                    self.selected_mods_list = [selected_mod for selected_mod in self.selected_mods_list if selected_mod != mod]
-                else:
-                    # dict denoting a list of all mods that conflict with a given mod
-                    conflict_mods: dict[ModWorthPP, list[ModWorthPP]] = {
-                        'HR': ['EZ'],
-                        'EZ': ['HR'],
-                        'DT': ['NC', 'HT'],
-                        'NC': ['DT', 'HT'],
-                        'HT': ['DT', 'NC']
-                    }
+                # deselect the mod if it is selected, otherwise select it (deselecting every mod that conflicts with it)
+                await self.select_mods(self.selected_mods.toggle(mod))
+
+        return callback
 
-                    # remove all mods that conflict with a newly selected mod
-                    self.selected_mods_list = [selected_mod for selected_mod in self.selected_mods_list if selected_mod not in conflict_mods.get(mod, [])]
+    async def select_mods(self, mods:osu_mods.ModSet) -> None:
+        self.selected_mods = mods
+
+        # any star rating still being fetched for a previous click is now stale
+        self.cancel_beatmap_stars_update()
+
+        # update everything that can be derived locally straight away, then fill in star rating once the API responds
+        self.update_beatmap_settings()
+        self._app.updater.update(
+            self.text_beatmap_stars,
+            self.text_beatmap_length,
+            self.text_beatmap_bpm,
+            self.text_beatmap_cs,
+            self.text_beatmap_ar,
+            self.text_beatmap_od,
+            self.text_beatmap_hp,
+            self.text_selected_mods
+        )
 
-                    # add the actual mod to the list of selected mods
-                    self.selected_mods_list.append(mod)
+        if self.osu_beatmap_difficulty_attributes is not None:
+            self.mod_toggle_updates_applied += 1
+        else:
+            self.beatmap_stars_task = asyncio.create_task(self.update_beatmap_stars())
+            # asyncio.wait instead of await, so a newer click cancelling this task does not raise into this handler
+            await asyncio.wait([self.beatmap_stars_task])
 
-            # store difficulty attributes in instance variable to preserve API call results
-            self.osu_beatmap_difficulty_attributes = await self._app.ossapi_handler.beatmap_attributes(self.osu_beatmap.id, mods=ossapi.Mod(self.selected_mods_list))
-                
-            # ---
+    def update_beatmap_settings(self) -> None:
+        ### update beatmap settings based on mods, from the (memoized) display model of this beatmap and mod selection
+        beatmap_display_model: osu_mods.BeatmapDisplayModel = osu_mods.get_beatmap_display_model(self.osu_beatmap, self.selected_mods)
 
-            ### update beatmap settings based on mods, text rounded off to 2 decimal places, tooltips with exact value
-            
-            # Stars
+        # Stars (show the local dump's or cached value if there is one, otherwise wait for update_beatmap_stars)
+        self.osu_beatmap_difficulty_attributes = self.get_known_difficulty_attributes(self.selected_mods)
+        if self.osu_beatmap_difficulty_attributes is not None:
             self.text_beatmap_stars.value = f'Stars: {round(self.osu_beatmap_difficulty_attributes.attributes.star_rating, 2)}'
             self.text_beatmap_stars.tooltip = f'{self.osu_beatmap_difficulty_attributes.attributes.star_rating}'
-            
-            # Length, BPM
-            if 'DT' in self.selected_mods_list or 'NC' in self.selected_mods_list:
-                self.text_beatmap_length.value = f'Length: {math.floor(self.osu_beatmap.total_length * 2/3)}'
-                self.text_beatmap_length.tooltip = f'{math.floor(self.osu_beatmap.total_length * 2/3)}'
-                self.text_beatmap_bpm.value = f'BPM: {round(self.osu_beatmap.bpm * 3/2, 3):g}' if self.osu_beatmap.bpm is not None else 'BPM: ?'
-                self.text_beatmap_bpm.tooltip = f'{(self.osu_beatmap.bpm * 3/2):g}' if self.osu_beatmap.bpm is not None else '?'
-            elif 'HT' in self.selected_mods_list:
-                self.text_beatmap_length.value = f'Length: {math.floor(self.osu_beatmap.total_length * 4/3)}'
-                self.text_beatmap_length.tooltip = f'{math.floor(self.osu_beatmap.total_length * 4/3)}'
-                self.text_beatmap_bpm.value = f'BPM: {round(self.osu_beatmap.bpm * 3/4, 3):g}' if self.osu_beatmap.bpm is not None else 'BPM: ?'
-                self.text_beatmap_bpm.tooltip = f'{(self.osu_beatmap.bpm * 3/4):g}' if self.osu_beatmap.bpm is not None else '?'
-            else:
-                self.text_beatmap_length.value = f'Length: {self.osu_beatmap.total_length}'
-                self.text_beatmap_length.tooltip = f'{self.osu_beatmap.total_length}'
-                self.text_beatmap_bpm.value = f'BPM: {self.osu_beatmap.bpm:g}' if self.osu_beatmap.bpm is not None else 'BPM: ?'
-                self.text_beatmap_bpm.tooltip = f'{self.osu_beatmap.bpm:g}' if self.osu_beatmap.bpm is not None else '?'
-            
-            # CS
-            self.text_beatmap_cs.value = f'{round(get_beatmap_cs_with_mods(self.osu_beatmap.cs, self.selected_mods_list), 2):g}'
-            self.text_beatmap_cs.tooltip = f'{get_beatmap_cs_with_mods(self.osu_beatmap.cs, self.selected_mods_list):g}'
-
-            # AR
-            if self.osu_beatmap_difficulty_attributes.attributes.approach_rate is not None:
-                self.text_beatmap_ar.value = f'{round(self.osu_beatmap_difficulty_attributes.attributes.approach_rate, 2):g}'
-                self.text_beatmap_ar.tooltip = f'{self.osu_beatmap_difficulty_attributes.attributes.approach_rate:g}'
-            else:
-                self.text_beatmap_ar.value = '?'
-                self.text_beatmap_ar.tooltip = '?'
-            
-            # OD
-            if self.osu_beatmap_difficulty_attributes.attributes.overall_difficulty is not None:
-                self.text_beatmap_od.value = f'{round(self.osu_beatmap_difficulty_attributes.attributes.overall_difficulty, 2):g}'
-                self.text_beatmap_od.tooltip = f'{self.osu_beatmap_difficulty_attributes.attributes.overall_difficulty:g}'
-            else:
-                self.text_beatmap_od.value = '?'
-                self.text_beatmap_od.tooltip = '?'
-            
-            # HP
-            self.text_beatmap_hp.value = f'{round(get_beatmap_hp_with_mods(self.osu_beatmap.drain, self.selected_mods_list), 2):g}'
-            self.text_beatmap_hp.tooltip = f'{get_beatmap_hp_with_mods(self.osu_beatmap.drain, self.selected_mods_list):g}'
-
-            # ---
-
-            # change color of beatmap settings depending on mod affecting each stat
-            # if FL is detected, override only Stars
-            if 'FL' in self.selected_mods_list:
-                self.text_beatmap_stars.color = App.OSU_COLOR_FL
-            # if HR/EZ/NM, override main color for all settings
-            if 'HR' in self.selected_mods_list:
-                self.text_beatmap_stars.color = App.OSU_COLOR_HR
-                self.text_beatmap_cs.color = App.OSU_COLOR_HR
-                self.text_beatmap_ar.color = App.OSU_COLOR_HR
-                self.text_beatmap_od.color = App.OSU_COLOR_HR
-                self.text_beatmap_hp.color = App.OSU_COLOR_HR
-            elif 'EZ' in self.selected_mods_list:
-                self.text_beatmap_stars.color = App.OSU_COLOR_EZ
-                self.text_beatmap_cs.color = App.OSU_COLOR_EZ
-                self.text_beatmap_ar.color = App.OSU_COLOR_EZ
-                self.text_beatmap_od.color = App.OSU_COLOR_EZ
-                self.text_beatmap_hp.color = App.OSU_COLOR_EZ
-            else:
-                self.text_beatmap_stars.color = ft.colors.BLACK
-                self.text_beatmap_cs.color = ft.colors.BLACK
-                self.text_beatmap_ar.color = ft.colors.BLACK
-                self.text_beatmap_od.color = ft.colors.BLACK
-                self.text_beatmap_hp.color = ft.colors.BLACK
-            # if DT/NC/HT is detected, override only Stars, Length, BPM, AR, and OD
-            if 'DT' in self.selected_mods_list or 'NC' in self.selected_mods_list:
-                self.text_beatmap_stars.color = App.OSU_COLOR_DT
-                self.text_beatmap_length.color = App.OSU_COLOR_DT
-                self.text_beatmap_bpm.color = App.OSU_COLOR_DT
-                self.text_beatmap_ar.color = App.OSU_COLOR_DT
-                self.text_beatmap_od.color = App.OSU_COLOR_DT
-            elif 'HT' in self.selected_mods_list:
-                self.text_beatmap_stars.color = App.OSU_COLOR_HT
-                self.text_beatmap_length.color = App.OSU_COLOR_HT
-                self.text_beatmap_bpm.color = App.OSU_COLOR_HT
-                self.text_beatmap_ar.color = App.OSU_COLOR_HT
-                self.text_beatmap_od.color = App.OSU_COLOR_HT
-            else:
-                self.text_beatmap_length.color = ft.colors.BLACK
-                self.text_beatmap_bpm.color = ft.colors.BLACK
+        else:
+            self.text_beatmap_stars.value = 'Stars: ...'
+            self.text_beatmap_stars.tooltip = '...'
+        self.text_beatmap_stars.color = beatmap_display_model.stars_color
+
+        # Length, BPM, CS, AR, OD, HP
+        for text_beatmap_setting, display_value in (
+            (self.text_beatmap_length, beatmap_display_model.length),
+            (self.text_beatmap_bpm, beatmap_display_model.bpm),
+            (self.text_beatmap_cs, beatmap_display_model.cs),
+            (self.text_beatmap_ar, beatmap_display_model.ar),
+            (self.text_beatmap_od, beatmap_display_model.od),
+            (self.text_beatmap_hp, beatmap_display_model.hp)
+        ):
+            text_beatmap_setting.value = display_value.value
+            text_beatmap_setting.tooltip = display_value.tooltip
+            text_beatmap_setting.color = display_value.color
+
+        # update displayed list of selected mods
+        self.text_selected_mods.value = beatmap_display_model.mods.value
+        self.text_selected_mods.tooltip = beatmap_display_model.mods.tooltip
+
+    async def update_beatmap_stars(self) -> None:
+        # star rating is the only setting that needs the API
+        # this task is cancelled as soon as a newer mod toggle comes in (CancelledError is not caught below),
+        # so a stale result never gets past the await and only the latest selection is ever applied
+        mods: osu_mods.ModSet = self.selected_mods
+
+        # wait out a burst of clicks, so that only the last one makes a request
+        if BeatmapRenderer.MOD_TOGGLE_DEBOUNCE_SECONDS > 0:
+            await asyncio.sleep(BeatmapRenderer.MOD_TOGGLE_DEBOUNCE_SECONDS)
+
+        try:
+            with osu_scheduler.request_priority('mod_toggle'):
+                difficulty_attributes: ossapi.models.DifficultyAttributes | None = await self.get_difficulty_attributes(mods)
+        except Exception:
+            difficulty_attributes = None
+
+        # store difficulty attributes in instance variable to preserve API call results
+        self.osu_beatmap_difficulty_attributes = difficulty_attributes
+        if self.osu_beatmap_difficulty_attributes is not None:
+            self.text_beatmap_stars.value = f'Stars: {round(self.osu_beatmap_difficulty_attributes.attributes.star_rating, 2)}'
+            self.text_beatmap_stars.tooltip = f'{self.osu_beatmap_difficulty_attributes.attributes.star_rating}'
+        else:
+            self.text_beatmap_stars.value = 'Stars: ?'
+            self.text_beatmap_stars.tooltip = '?'
+
+        self.mod_toggle_updates_applied += 1
+        self._app.updater.update(self.text_beatmap_stars)
+
+    def cancel_beatmap_stars_update(self) -> None:
+        if self.beatmap_stars_task is not None and not self.beatmap_stars_task.done():
+            self.beatmap_stars_task.cancel()
+            self.mod_toggle_updates_cancelled += 1
+        self.beatmap_stars_task = None
+
+    async def lookup_beatmap_owner(self) -> ossapi.User:
+        # look up the owner through this session's own handler rather than osu_beatmap.user(),
+        # since a cached beatmap may have been fetched by a session that has since logged out
+        return await beatmap_owner_cache.get_or_fetch(
+            self.osu_beatmap.user_id,
+            lambda: self._app.ossapi_handler.user(self.osu_beatmap.user_id, key=ossapi.UserLookupKey.ID)
+        )
 
-            # update displayed list of selected mods
-            self.text_selected_mods.value = f'Mods: {ossapi.Mod(self.selected_mods_list)}'
-            self.text_selected_mods.tooltip = f'{ossapi.Mod(self.selected_mods_list)}'
+    async def get_initial_difficulty_attributes(self) -> ossapi.models.DifficultyAttributes | None:
+        try:
+            return await self.get_difficulty_attributes(osu_mods.ModSet())
+        except Exception:
+            # the NoMod stars are already known from the beatmap itself, so this is not worth failing the search over
+            return None
+
+    async def time_stage(self, stage:str, awaitable:Awaitable[T]) -> T:
+        stage_start: float = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.record_stage(stage, time.perf_counter() - stage_start)
+
+    def record_stage(self, stage:str, seconds:float) -> None:
+        self.stage_timings[stage] = seconds*1000
+        osu_metrics.registry.observe(osu_metrics.RENDER_STAGE_SECONDS, seconds, renderer='beatmap', stage=stage)
+
+    def get_known_difficulty_attributes(self, mods:osu_mods.ModSet) -> ossapi.models.DifficultyAttributes | None:
+        # the local dump store and then the shared cache, without calling the API
+        difficulty_attributes: ossapi.models.DifficultyAttributes | None = osu_beatmap_store.beatmap_store.get_difficulty_attributes(self.osu_beatmap.id, mods)
+        if difficulty_attributes is not None:
+            return difficulty_attributes
+        return difficulty_attributes_cache.get((self.osu_beatmap.id, mods.difficulty_mods.value))
+
+    async def get_difficulty_attributes(self, mods:osu_mods.ModSet) -> ossapi.models.DifficultyAttributes:
+        # only call the API if neither the local dump store nor the shared cache has this beatmap and mod combination yet
+        difficulty_attributes: ossapi.models.DifficultyAttributes | None = osu_beatmap_store.beatmap_store.get_difficulty_attributes(self.osu_beatmap.id, mods)
+        if difficulty_attributes is not None:
+            return difficulty_attributes
+        difficulty_mods: osu_mods.ModSet = mods.difficulty_mods
+        return await difficulty_attributes_cache.get_or_fetch(
+            (self.osu_beatmap.id, difficulty_mods.value),
+            lambda: self._app.ossapi_handler.beatmap_attributes(self.osu_beatmap.id, mods=difficulty_mods.to_ossapi())
+        )
 
-            self._app.page.update() # type: ignore
+    async def prefetch_difficulty_attributes(self) -> None:
+        semaphore: asyncio.Semaphore = asyncio.Semaphore(BeatmapRenderer.PREFETCH_MAX_CONCURRENT)
 
-        return callback
+        async def prefetch(mods: osu_mods.ModSet) -> None:
+            async with semaphore:
+                if osu_scheduler.request_scheduler.queue_depth > 0 or osu_scheduler.request_scheduler.available_tokens < BeatmapRenderer.PREFETCH_MIN_SCHEDULER_TOKENS:
+                    osu_metrics.registry.increment(osu_metrics.PREFETCH_SKIPPED_TOTAL)
+                    return
+                try:
+                    # queue behind every search and mod toggle in the app-wide request scheduler
+                    with osu_scheduler.request_priority('background'):
+                        await self.get_difficulty_attributes(mods)
+                except Exception:
+                    # prefetching is best-effort, the click itself will retry
+                    pass
+
+        await asyncio.gather(*[prefetch(mods) for mods in dict.fromkeys(mods.difficulty_mods for mods in BeatmapRenderer.PREFETCH_MODS if mods.is_valid)])
+
+    def start_prefetch(self) -> None:
+        if BeatmapRenderer.PREFETCH_DIFFICULTY_ATTRIBUTES and self.prefetch_task is None:
+            self.prefetch_task = asyncio.create_task(self.prefetch_difficulty_attributes())
+
+    def cancel_prefetch(self) -> None:
+        # requests that already started still finish and fill the shared cache, but no new ones are made
+        if self.prefetch_task is not None:
+            self.prefetch_task.cancel()
+            self.prefetch_task = None
 
     @classmethod
     async def init_async(cls, app:App, osu_beatmap:ossapi.Beatmap) -> BeatmapRenderer:
+        init_start: float = time.perf_counter()
+
         beatmap_renderer = BeatmapRenderer(app, osu_beatmap)
+        beatmap_renderer.record_stage('controls', time.perf_counter() - init_start)
+
         await beatmap_renderer._post_init_async()
+        beatmap_renderer.record_stage('init', time.perf_counter() - init_start)
+
+        beatmap_renderer.start_prefetch()
         return beatmap_renderer
 
+    @classmethod
+    def render_osu_beatmap_card(cls, app:App, osu_beatmap:ossapi.Beatmap, mods:osu_mods.ModSet=osu_mods.ModSet()) -> ft.ExpansionTile:
+        # compact card for batch searches, built only from the beatmap itself
+        # the full BeatmapRenderer (mapper, cover, difficulty attributes) is only built the first time the card is expanded, with mods selected
+        osu_beatmapset: ossapi.Beatmapset = osu_beatmap.beatmapset()
+
+        expansiontile_beatmap_card = ft.ExpansionTile(
+            title=ft.Text(
+                value=f'{osu_beatmapset.artist} - {osu_beatmapset.title} [{osu_beatmap.version}]',
+                tooltip=f'{osu_beatmapset.artist} - {osu_beatmapset.title} [{osu_beatmap.version}]',
+                weight=ft.FontWeight.BOLD,
+                color=ft.colors.BLACK
+            ),
+            subtitle=ft.Text(
+                value=f'{osu_beatmap.id} | Stars: {round(osu_beatmap.difficulty_rating, 2)} | Mapset by {osu_beatmapset.creator}',
+                color=ft.colors.BLACK
+            ),
+            controls=[],
+            maintain_state=True,
+            bgcolor='#DDDDDD',
+            collapsed_bgcolor='#DDDDDD'
+        )
+
+        async def expand_card(e: ft.ControlEvent) -> None:
+            if e.data != 'true' or expansiontile_beatmap_card.controls:
+                return
+
+            try:
+                beatmap_renderer: BeatmapRenderer = await BeatmapRenderer.init_async(app, osu_beatmap)
+                app.beatmap_search_results_list.append(beatmap_renderer)
+                expansiontile_beatmap_card.controls = [beatmap_renderer.render_osu_beatmap_info()]
+            except Exception as e:
+                osu_metrics.registry.increment(osu_metrics.SEARCH_ERRORS_TOTAL, search='beatmap_card', error=type(e).__name__)
+                expansiontile_beatmap_card.controls = [ft.Text(value='Could not load beatmap', color=ft.colors.RED)]
+                app.updater.update(expansiontile_beatmap_card)
+                return
+            app.updater.update(expansiontile_beatmap_card)
+
+            if mods:
+                await beatmap_renderer.select_mods(mods)
+
+        expansiontile_beatmap_card.on_change = expand_card
+        return expansiontile_beatmap_card
+
     def render_osu_beatmap_info(self) -> ft.Container:
+        if not self.beatmap_panel_built:
+            panel_start: float = time.perf_counter()
+            self.build_beatmap_panel()
+            self.record_stage('panel', time.perf_counter() - panel_start)
+
         return ft.Container(
             content=ft.Row(
                 controls=[
@@ -941,7 +1617,7 @@ class BeatmapRenderer:
             )
         )
 
-@dataclass
+@dataclass(slots=True)
 class UserRenderer:
     ###__init__()
     _app: App
@@ -951,6 +1627,10 @@ class UserRenderer:
     osu_user_statistics: ossapi.models.UserStatistics = field(init=False)
     osu_user_country: ossapi.models.Country = field(init=False)
 
+    ### Data
+        # whether build_user_panel() has run yet (every control except the avatar only exists after it has)
+    user_panel_built: bool = field(init=False, default=False)
+
     ### Controls
     container_user_body: ft.Container = field(init=False)
     image_user_profile_url: ft.Image = field(init=False)
@@ -972,18 +1652,22 @@ class UserRenderer:
 
         # --- -----
 
-        # temp: fetch image as base64 manually, since Flet is unable to load images if view=ft.AppView.WEB_BROWSER for flet>=0.21.1
+        # Flet is unable to load images from other origins if view=ft.AppView.WEB_BROWSER for flet>=0.21.1
         # see: https://github.com/flet-dev/flet/issues/2851
+            # so the avatar is served from this app's own image route (see osu_server)
 
         # User Avatar
         self.image_user_profile_url = ft.Image(
-            #src=self.osu_user.avatar_url,
-            src_base64=base64.b64encode(requests.get(self.osu_user.avatar_url).content).decode('utf-8'),
+            src=osu_images.image_cache.get_src(self.osu_user.avatar_url, width=150, height=150),
             width=150,
             height=150,
             fit=ft.ImageFit.CONTAIN
         )
 
+    def build_user_panel(self) -> None:
+        # the rest of the panel is only built the first time it is rendered
+        self.user_panel_built = True
+
         # User Identification
         self.text_user_username = ft.Text(
             value=f'{self.osu_user.username}',
@@ -1111,7 +1795,68 @@ class UserRenderer:
 
         # --- -----
 
+    @classmethod
+    async def init_async(cls, app:App, osu_user:ossapi.User) -> UserRenderer:
+        # nothing to wait for anymore (the avatar is loaded by the browser), kept async to match BeatmapRenderer.init_async
+        with osu_metrics.registry.time(osu_metrics.RENDER_STAGE_SECONDS, renderer='user', stage='init'):
+            return UserRenderer(app, osu_user)
+
+    @classmethod
+    def render_osu_user_row(cls, app:App, osu_user:ossapi.UserCompact) -> ft.ExpansionTile:
+        # compact row for multi-user searches, built only from the (possibly compact) user itself
+        # the full UserRenderer is only built once the row is expanded
+        osu_user_statistics: ossapi.models.UserStatistics | None = osu_user.statistics or (osu_user.statistics_rulesets.osu if osu_user.statistics_rulesets else None)
+
+        expansiontile_user_row = ft.ExpansionTile(
+            leading=ft.Image(
+                src=osu_images.image_cache.get_src(osu_user.avatar_url, width=40, height=40),
+                width=40,
+                height=40,
+                fit=ft.ImageFit.CONTAIN
+            ),
+            title=ft.Text(
+                value=f'{osu_user.username}',
+                tooltip=f'{osu_user.username}',
+                weight=ft.FontWeight.BOLD,
+                color=ft.colors.BLACK
+            ),
+            subtitle=ft.Text(
+                value=(
+                    f'{osu_user.country_code} | '
+                    f'#{osu_user_statistics.global_rank if osu_user_statistics and osu_user_statistics.global_rank else "--"} | '
+                    f'{"{:,}".format(osu_user_statistics.pp) if osu_user_statistics and osu_user_statistics.pp is not None else "--"}pp'
+                ),
+                color=ft.colors.BLACK
+            ),
+            controls=[],
+            maintain_state=True,
+            bgcolor='#DDDDDD',
+            collapsed_bgcolor='#DDDDDD'
+        )
+
+        async def expand_row(e: ft.ControlEvent) -> None:
+            if e.data != 'true' or expansiontile_user_row.controls:
+                return
+
+            try:
+                # compact users are missing fields the full panel needs (title, statistics), so get the full user first
+                user_ossapi: ossapi.User = osu_user if isinstance(osu_user, ossapi.User) else await app.ossapi_handler.user(osu_user.id, key=ossapi.UserLookupKey.ID)
+                user_renderer: UserRenderer = await UserRenderer.init_async(app, user_ossapi)
+                expansiontile_user_row.controls = [user_renderer.render_osu_user_info()]
+            except Exception as e:
+                osu_metrics.registry.increment(osu_metrics.SEARCH_ERRORS_TOTAL, search='user_row', error=type(e).__name__)
+                expansiontile_user_row.controls = [ft.Text(value='Could not load user', color=ft.colors.RED)]
+            app.updater.update(expansiontile_user_row)
+
+        expansiontile_user_row.on_change = expand_row
+        return expansiontile_user_row
+
     def render_osu_user_info(self) -> ft.Container:
+        if not self.user_panel_built:
+            with osu_metrics.registry.time(osu_metrics.RENDER_STAGE_SECONDS, renderer='user', stage='panel'):
+                self.build_user_panel()
+
         return self.container_user_body
 
-ft.app(target=App.main, port=80, view=ft.AppView.WEB_BROWSER, web_renderer=ft.WebRenderer.CANVAS_KIT) # type: ignore
\ No newline at end of file
+if __name__ == '__main__':
+    osu_server.serve(App.main, port=80)
\ No newline at end of file
@@ -0,0 +1,551 @@
+from __future__ import annotations
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field, asdict
+from typing import IO, Any
+import argparse
+import datetime
+import os
+import pathlib
+import re
+import sqlite3
+import tarfile
+import time
+import ossapi as ossapi # type: ignore
+import ossapi.enums # type: ignore
+import ossapi.models # type: ignore
+import osu_metrics
+import osu_mods
+
+# --- -----
+
+# local SQLite copy of the public osu! data dumps (https://data.ppy.sh): beatmapsets, beatmaps and difficulty attributes
+# beatmap lookups and star ratings are answered from it when it has a row for them, and only go to the API for everything else
+# it also holds a full-text index of every difficulty, for searching beatmaps by artist, title, creator, difficulty name and tags
+# ingest a dump with:
+#   python osu_beatmap_store.py 2024_10_01_performance_osu_top_1000.tar.bz2 [more dumps, .sql files or directories...] [--db path] [--dump-date YYYY-MM-DD]
+# the dump date comes from the dump names (or --dump-date), a store without one is never trusted for beatmap details
+# the dump is loaded into a new file next to the store and swapped in once complete, so a running app keeps serving the old one until then
+
+BEATMAP_STORE_PATH: str = os.environ.get('OSU_BEATMAP_STORE', os.path.join('.cache', 'beatmaps.sqlite3'))
+    # ranked, approved and loved beatmaps are frozen, so they are trusted until the dump itself is this old (0 to trust them forever)
+    # everything else (pending, WIP, graveyard, qualified) can still change at any time, so it always goes to the API
+BEATMAP_STORE_MAX_AGE_DAYS: float = float(os.environ.get('OSU_BEATMAP_STORE_MAX_AGE_DAYS', '180'))
+BEATMAP_STORE_TRUSTED_STATUSES: tuple[int, ...] = (ossapi.enums.RankStatus.RANKED.value, ossapi.enums.RankStatus.APPROVED.value, ossapi.enums.RankStatus.LOVED.value)
+    # how often a running app checks whether the store file was replaced by a new ingest
+BEATMAP_STORE_RELOAD_SECONDS: float = 60
+
+# the tables (and columns) kept from the dumps, under the same names the dumps use
+DUMP_COLUMNS: dict[str, tuple[str, ...]] = {
+    'osu_beatmapsets': (
+        'beatmapset_id', 'user_id', 'artist', 'artist_unicode', 'title', 'title_unicode', 'creator', 'source', 'tags',
+        'video', 'storyboard', 'nsfw', 'bpm', 'approved', 'approved_date', 'submit_date', 'last_update', 'favourite_count', 'play_count', 'deleted_at'
+    ),
+    'osu_beatmaps': (
+        'beatmap_id', 'beatmapset_id', 'user_id', 'checksum', 'version', 'total_length', 'hit_length', 'countNormal', 'countSlider', 'countSpinner',
+        'diff_drain', 'diff_size', 'diff_overall', 'diff_approach', 'playmode', 'approved', 'last_update', 'difficultyrating', 'playcount', 'passcount', 'bpm', 'deleted_at'
+    ),
+    'osu_beatmap_difficulty_attribs': ('beatmap_id', 'mode', 'mods', 'attrib_id', 'value')
+}
+
+# difficulty attribute ids (see osu.Game.Rulesets.Difficulty.DifficultyAttributes), only the ones the osu! API returns for osu!standard are kept
+DIFFICULTY_ATTRIBUTES: dict[int, str] = {
+    1: 'aim_difficulty',
+    3: 'speed_difficulty',
+    5: 'overall_difficulty',
+    7: 'approach_rate',
+    9: 'max_combo',
+    11: 'star_rating',
+    17: 'flashlight_difficulty',
+    19: 'slider_factor',
+    21: 'speed_note_count'
+}
+
+SCHEMA: str = '''
+CREATE TABLE IF NOT EXISTS osu_beatmapsets (
+    beatmapset_id INTEGER PRIMARY KEY, user_id INTEGER, artist TEXT, artist_unicode TEXT, title TEXT, title_unicode TEXT, creator TEXT, source TEXT, tags TEXT,
+    video INTEGER, storyboard INTEGER, nsfw INTEGER, bpm REAL, approved INTEGER, approved_date TEXT, submit_date TEXT, last_update TEXT, favourite_count INTEGER, play_count INTEGER, deleted_at TEXT
+);
+CREATE TABLE IF NOT EXISTS osu_beatmaps (
+    beatmap_id INTEGER PRIMARY KEY, beatmapset_id INTEGER NOT NULL, user_id INTEGER, checksum TEXT, version TEXT, total_length INTEGER, hit_length INTEGER, countNormal INTEGER, countSlider INTEGER, countSpinner INTEGER,
+    diff_drain REAL, diff_size REAL, diff_overall REAL, diff_approach REAL, playmode INTEGER, approved INTEGER, last_update TEXT, difficultyrating REAL, playcount INTEGER, passcount INTEGER, bpm REAL, deleted_at TEXT
+);
+CREATE INDEX IF NOT EXISTS osu_beatmaps_beatmapset_id ON osu_beatmaps (beatmapset_id);
+CREATE INDEX IF NOT EXISTS osu_beatmaps_difficultyrating ON osu_beatmaps (difficultyrating);
+CREATE TABLE IF NOT EXISTS osu_beatmap_difficulty_attribs (
+    beatmap_id INTEGER NOT NULL, mode INTEGER NOT NULL, mods INTEGER NOT NULL, attrib_id INTEGER NOT NULL, value REAL,
+    PRIMARY KEY (beatmap_id, mode, mods, attrib_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+'''
+
+BEATMAP_QUERY: str = '''
+SELECT b.*,
+    s.artist, s.artist_unicode, s.title, s.title_unicode, s.creator, s.user_id AS beatmapset_user_id, s.source, s.tags,
+    s.video, s.storyboard, s.nsfw, s.bpm AS beatmapset_bpm, s.approved AS beatmapset_approved, s.favourite_count, s.play_count,
+    (SELECT a.value FROM osu_beatmap_difficulty_attribs a WHERE a.beatmap_id = b.beatmap_id AND a.mode = b.playmode AND a.mods = 0 AND a.attrib_id = 9) AS max_combo
+FROM osu_beatmaps b JOIN osu_beatmapsets s USING (beatmapset_id)
+WHERE b.beatmap_id IN ({placeholders}) AND b.deleted_at IS NULL AND s.deleted_at IS NULL
+'''
+
+# the dumps only have attributes for mods that change difficulty, under the legacy bitmask of ModSet.difficulty_mods (NC is stored as DT, HD only along with FL)
+DIFFICULTY_ATTRIBUTES_QUERY: str = '''
+SELECT a.attrib_id, a.value, b.approved
+FROM osu_beatmap_difficulty_attribs a JOIN osu_beatmaps b USING (beatmap_id)
+WHERE a.beatmap_id = ? AND a.mode = b.playmode AND a.mods = ? AND b.deleted_at IS NULL
+'''
+
+# full-text index of every difficulty, built once the dumps are loaded
+# contentless (the text is already in the tables), with prefix indexes so that short prefixes do not have to scan the whole term list
+# its rowids are the difficulties in play count order (see osu_beatmaps_search_order), so walking a match in rowid order visits the most played first
+SEARCH_INDEX_SCHEMA: str = '''
+CREATE TABLE osu_beatmaps_search_order (search_rowid INTEGER PRIMARY KEY, beatmap_id INTEGER NOT NULL);
+INSERT INTO osu_beatmaps_search_order (beatmap_id)
+SELECT b.beatmap_id FROM osu_beatmaps b JOIN osu_beatmapsets s USING (beatmapset_id)
+WHERE b.deleted_at IS NULL AND s.deleted_at IS NULL
+ORDER BY b.playcount DESC, b.beatmap_id;
+CREATE VIRTUAL TABLE osu_beatmaps_search USING fts5(
+    artist, title, creator, version, tags,
+    content='', tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+INSERT INTO osu_beatmaps_search (rowid, artist, title, creator, version, tags)
+SELECT o.search_rowid,
+    s.artist || CASE WHEN s.artist_unicode != s.artist THEN ' ' || s.artist_unicode ELSE '' END,
+    s.title || CASE WHEN s.title_unicode != s.title THEN ' ' || s.title_unicode ELSE '' END,
+    s.creator, b.version, s.tags
+FROM osu_beatmaps_search_order o JOIN osu_beatmaps b USING (beatmap_id) JOIN osu_beatmapsets s USING (beatmapset_id);
+INSERT INTO osu_beatmaps_search (osu_beatmaps_search) VALUES ('optimize');
+'''
+
+### Data Dumps (mysqldump output: CREATE TABLE statements followed by extended INSERTs, one per line)
+
+DUMP_CREATE_TABLE_PATTERN: re.Pattern[str] = re.compile(r'^CREATE TABLE `(\w+)`')
+DUMP_COLUMN_PATTERN: re.Pattern[str] = re.compile(r'^\s+`(\w+)`')
+DUMP_INSERT_PATTERN: re.Pattern[str] = re.compile(r'^INSERT INTO `(\w+)`(?: \(([^)]*)\))? VALUES ')
+    # one token of a VALUES list: a parenthesis, a quoted string (with backslash escapes), or a bare value (number, NULL, _binary prefix)
+DUMP_VALUE_PATTERN: re.Pattern[str] = re.compile(r"[()]|'(?:[^'\\]|\\.)*'|[^,()';\s]+")
+DUMP_ESCAPE_PATTERN: re.Pattern[str] = re.compile(r'\\(.)', re.DOTALL)
+DUMP_ESCAPES: dict[str, str] = {'0': '\0', 'b': '\b', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\x1a'}
+DUMP_DATE_PATTERN: re.Pattern[str] = re.compile(r'(\d{4})_(\d{2})_(\d{2})')
+
+def iter_dump_values(values: str) -> Iterator[tuple[str | None, ...]]:
+    row: list[str | None] | None = None
+    for match in DUMP_VALUE_PATTERN.finditer(values):
+        token: str = match.group()
+        if token == '(':
+            row = []
+        elif token == ')':
+            if row is not None:
+                yield tuple(row)
+            row = None
+        elif row is None or token == '_binary':
+            continue
+        elif token[0] == "'":
+            row.append(DUMP_ESCAPE_PATTERN.sub(lambda escape: DUMP_ESCAPES.get(escape.group(1), escape.group(1)), token[1:-1]))
+        elif token == 'NULL':
+            row.append(None)
+        else:
+            # numbers are stored as text, and SQLite converts them to the column's type (INTEGER/REAL affinity)
+            row.append(token)
+
+def iter_dump_rows(lines: Iterable[str]) -> Iterator[tuple[str, tuple[str, ...], list[tuple[str | None, ...]]]]:
+    """(table, columns, rows) for every INSERT in a mysqldump file, with columns taken from the INSERT or else from its CREATE TABLE
+    """
+    table_columns: dict[str, list[str]] = {}
+    create_table: str | None = None
+
+    for line in lines:
+        if create_table is not None:
+            column_match: re.Match[str] | None = DUMP_COLUMN_PATTERN.match(line)
+            if column_match:
+                table_columns[create_table].append(column_match.group(1))
+            else:
+                create_table = None if not line.startswith('  ') else create_table
+            continue
+
+        create_table_match: re.Match[str] | None = DUMP_CREATE_TABLE_PATTERN.match(line)
+        if create_table_match:
+            create_table = create_table_match.group(1)
+            table_columns[create_table] = []
+            continue
+
+        insert_match: re.Match[str] | None = DUMP_INSERT_PATTERN.match(line)
+        if insert_match:
+            table: str = insert_match.group(1)
+            columns: list[str] = [column.strip(' `') for column in insert_match.group(2).split(',')] if insert_match.group(2) else table_columns.get(table, [])
+            yield table, tuple(columns), list(iter_dump_values(line[insert_match.end():]))
+
+def iter_dump_files(path: str) -> Iterator[tuple[str, Iterable[str]]]:
+    """(file name, text stream) of every table dump in path: a .sql file, a directory of them, or a dump archive (.tar.bz2)
+    """
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.endswith('.sql'):
+                with open(os.path.join(path, name), 'r', encoding='utf-8', errors='replace') as dump_file:
+                    yield name, dump_file
+    elif tarfile.is_tarfile(path):
+        # streamed in order, the archives are several GB uncompressed
+        with tarfile.open(path, 'r|*') as dump_archive:
+            for member in dump_archive:
+                member_file: IO[bytes] | None = dump_archive.extractfile(member) if member.isfile() and member.name.endswith('.sql') else None
+                if member_file is not None:
+                    # (TextIOWrapper needs a seekable file, which a streamed member is not)
+                    yield os.path.basename(member.name), (line.decode('utf-8', errors='replace') for line in member_file)
+    else:
+        with open(path, 'r', encoding='utf-8', errors='replace') as dump_file:
+            yield os.path.basename(path), dump_file
+
+def ingest(dump_paths: list[str], store_path: str = BEATMAP_STORE_PATH, dump_date: datetime.date | None = None) -> dict[str, int]:
+    """load every beatmapset, beatmap and difficulty attribute in dump_paths into a new store at store_path (replacing the old one)
+    dump_date defaults to the newest date in the dump names, a store with neither is undated and never used as fresh
+    returns the number of rows loaded per table
+    """
+    os.makedirs(os.path.dirname(store_path) or '.', exist_ok=True)
+    ingest_path: str = f'{store_path}.ingest'
+    if os.path.exists(ingest_path):
+        os.remove(ingest_path)
+
+    rows_loaded: dict[str, int] = {table: 0 for table in DUMP_COLUMNS}
+    connection: sqlite3.Connection = sqlite3.connect(ingest_path)
+    try:
+        # nothing reads this file until it is complete, so durability only matters at the very end
+        connection.execute('PRAGMA journal_mode = OFF')
+        connection.execute('PRAGMA synchronous = OFF')
+        connection.executescript(SCHEMA)
+
+        named_dump_date: datetime.date | None = None
+        for dump_path in dump_paths:
+            date_match: re.Match[str] | None = DUMP_DATE_PATTERN.search(os.path.basename(dump_path))
+            if date_match:
+                named_dump_date = max(named_dump_date or datetime.date.min, datetime.date(*map(int, date_match.groups())))
+
+            for name, dump_file in iter_dump_files(dump_path):
+                for table, columns, rows in iter_dump_rows(dump_file):
+                    kept_columns: tuple[str, ...] | None = DUMP_COLUMNS.get(table)
+                    if kept_columns is None:
+                        continue
+
+                    column_indexes: list[int] = [columns.index(column) if column in columns else -1 for column in kept_columns]
+                    if table == 'osu_beatmap_difficulty_attribs':
+                        attrib_id_index: int = columns.index('attrib_id')
+                        rows = [row for row in rows if int(row[attrib_id_index] or 0) in DIFFICULTY_ATTRIBUTES]
+
+                    connection.executemany(
+                        f'INSERT OR REPLACE INTO {table} ({", ".join(kept_columns)}) VALUES ({", ".join("?"*len(kept_columns))})',
+                        ([row[column_index] if column_index >= 0 else None for column_index in column_indexes] for row in rows)
+                    )
+                    rows_loaded[table] += len(rows)
+                print(f'{name}: done ({rows_loaded})')
+
+        dump_date = dump_date or named_dump_date
+        if dump_date is None:
+            print('no dump date in the dump names and no --dump-date given, the store is undated, so it is only used to find beatmaps and never for their details')
+        connection.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', [
+            *([('dump_date', dump_date.isoformat())] if dump_date is not None else []),
+            ('ingested_at', str(time.time())),
+            ('dumps', ', '.join(os.path.basename(dump_path) for dump_path in dump_paths))
+        ])
+        connection.executescript(SEARCH_INDEX_SCHEMA)
+        connection.commit()
+        connection.execute('ANALYZE')
+        connection.execute('VACUUM')
+    finally:
+        connection.close()
+
+    os.replace(ingest_path, store_path)
+    return rows_loaded
+
+### Search
+
+# filters that can be added to a search as <name><operator><number>, e.g. "stars>=6.5 ar>9 bpm<200", on the beatmap's nomod values
+SEARCH_FILTER_COLUMNS: dict[str, str] = {
+    'stars': 'b.difficultyrating',
+    'sr': 'b.difficultyrating',
+    'ar': 'b.diff_approach',
+    'cs': 'b.diff_size',
+    'od': 'b.diff_overall',
+    'hp': 'b.diff_drain',
+    'bpm': 'b.bpm',
+    'length': 'b.total_length'
+}
+SEARCH_FILTER_PATTERN: re.Pattern[str] = re.compile(r'^(' + '|'.join(SEARCH_FILTER_COLUMNS) + r')(<=|>=|<|>|=|:)(\d+(?:\.\d*)?)$', re.IGNORECASE)
+    # mod acronyms in a search ("freedom dive hr") are selected on the beatmaps it opens instead of being searched for
+SEARCH_MODS: dict[str, osu_mods.ModWorthPP] = {mod.lower(): mod for mod in ('HD', 'HR', 'EZ', 'DT', 'NC', 'HT', 'FL')}
+    # bm25 weight of each indexed column (artist, title, creator, version, tags)
+SEARCH_COLUMN_WEIGHTS: tuple[float, ...] = (4.0, 4.0, 2.0, 2.0, 1.0)
+    # only this many of the most played matches are ranked by relevance, the rest follow in play count order
+    # bm25 costs a few microseconds per match, which a common word ("insane") has tens of thousands of
+SEARCH_RANKED_MATCHES: int = 200
+
+SEARCH_MATCHES_QUERY: str = '''
+SELECT o.beatmap_id{score}
+FROM osu_beatmaps_search JOIN osu_beatmaps_search_order o ON o.search_rowid = osu_beatmaps_search.rowid JOIN osu_beatmaps b USING (beatmap_id)
+WHERE osu_beatmaps_search MATCH ?{filters}
+ORDER BY osu_beatmaps_search.rowid LIMIT ? OFFSET ?
+'''
+
+@dataclass(frozen=True)
+class BeatmapQuery:
+    """a parsed beatmap search: words to match (the last one as a prefix), numeric filters and mods to select
+    """
+    terms: tuple[str, ...] = ()
+        # (column, operator, value) with = turned into a range as wide as the precision the value was written with, like osu! does ("stars=6" is 5.5 to 6.5)
+    filters: tuple[tuple[str, str, float], ...] = ()
+    mods: osu_mods.ModSet = osu_mods.ModSet()
+
+    @classmethod
+    def parse(cls, search: str) -> BeatmapQuery:
+        terms: list[str] = []
+        filters: list[tuple[str, str, float]] = []
+        mods: list[osu_mods.ModWorthPP] = []
+
+        for word in search.split():
+            filter_match: re.Match[str] | None = SEARCH_FILTER_PATTERN.match(word)
+            if filter_match:
+                name, operator, number = filter_match.groups()
+                column: str = SEARCH_FILTER_COLUMNS[name.lower()]
+                if operator in ('=', ':'):
+                    tolerance: float = 0.5*10**-len(number.partition('.')[2])
+                    filters += [(column, '>=', float(number) - tolerance), (column, '<', float(number) + tolerance)]
+                else:
+                    filters.append((column, operator, float(number)))
+            elif word.lower() in SEARCH_MODS:
+                mods.append(SEARCH_MODS[word.lower()])
+            else:
+                # the same word splitting the index uses, so punctuation never reaches the FTS query syntax
+                terms += [term.lower() for term in re.findall(r'\w+', word)]
+
+        # a search of nothing but a mod acronym is probably a title
+        if mods and not terms and not filters:
+            return BeatmapQuery(terms=tuple(mod.lower() for mod in mods))
+        return BeatmapQuery(tuple(terms), tuple(filters), osu_mods.ModSet.from_mods(mods))
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.terms and not self.filters
+
+    def to_fts(self) -> str:
+        # the last word is a prefix, so a search matches as it is being typed (unless it is a single letter, which as a prefix matches almost everything)
+        # the words before it are whole words: a long prefix has to merge every word it starts, which for a common one costs milliseconds
+        return ' '.join(f'"{term}"*' if i == len(self.terms) - 1 and len(term) > 1 else f'"{term}"' for i, term in enumerate(self.terms))
+
+### Store
+
+@dataclass
+class BeatmapStoreStats:
+    beatmap_hits: int = 0
+    beatmap_misses: int = 0
+    attribute_hits: int = 0
+    attribute_misses: int = 0
+    searches: int = 0
+
+@dataclass
+class BeatmapStore:
+    """read-only access to an ingested store, answering with the same ossapi models the API would
+    lookups are indexed point queries (well under a millisecond, mostly building the models), so they run on the event loop rather than in a thread (whose handoff would cost more than the query)
+    if there is no store (nothing was ingested), every lookup is a miss
+    """
+    path: str = BEATMAP_STORE_PATH
+    max_age_days: float = BEATMAP_STORE_MAX_AGE_DAYS
+
+    stats: BeatmapStoreStats = field(default_factory=BeatmapStoreStats)
+    _connection: sqlite3.Connection | None = field(init=False, default=None)
+    _file_id: tuple[int, int] | None = field(init=False, default=None)
+    _checked_at: float = field(init=False, default=-BEATMAP_STORE_RELOAD_SECONDS)
+    _dump_date: datetime.date | None = field(init=False, default=None)
+        # whether the store has a search index (stores ingested before it existed do not)
+    _searchable: bool = field(init=False, default=False)
+        # whether the dump is recent enough to be trusted at all (see BEATMAP_STORE_MAX_AGE_DAYS)
+    _fresh: bool = field(init=False, default=False)
+
+    def get_beatmap(self, beatmap_id: int) -> ossapi.Beatmap | None:
+        return self.get_beatmaps([beatmap_id]).get(beatmap_id)
+
+    def get_beatmaps(self, beatmap_ids: list[int]) -> dict[int, ossapi.Beatmap]:
+        """the beatmaps in beatmap_ids that the store has (and trusts), by beatmap id
+        """
+        connection: sqlite3.Connection | None = self._get_connection()
+        if connection is None or not beatmap_ids:
+            self.stats.beatmap_misses += len(beatmap_ids)
+            return {}
+
+        osu_beatmaps: dict[int, ossapi.Beatmap] = {}
+        # chunked to stay under SQLite's limit on query parameters
+        for chunk_start in range(0, len(beatmap_ids), 500):
+            beatmap_ids_chunk: list[int] = beatmap_ids[chunk_start:chunk_start+500]
+            for row in connection.execute(BEATMAP_QUERY.format(placeholders=', '.join('?'*len(beatmap_ids_chunk))), beatmap_ids_chunk):
+                if row['approved'] in BEATMAP_STORE_TRUSTED_STATUSES:
+                    osu_beatmaps[row['beatmap_id']] = make_beatmap(row)
+
+        self.stats.beatmap_hits += len(osu_beatmaps)
+        self.stats.beatmap_misses += len(beatmap_ids) - len(osu_beatmaps)
+        return osu_beatmaps
+
+    def get_difficulty_attributes(self, beatmap_id: int, mods: osu_mods.ModSet) -> ossapi.models.DifficultyAttributes | None:
+        connection: sqlite3.Connection | None = self._get_connection()
+        rows: list[sqlite3.Row] = connection.execute(DIFFICULTY_ATTRIBUTES_QUERY, (beatmap_id, mods.difficulty_mods.value)).fetchall() if connection else []
+
+        attributes: dict[str, Any] = {DIFFICULTY_ATTRIBUTES[row['attrib_id']]: row['value'] for row in rows if row['approved'] in BEATMAP_STORE_TRUSTED_STATUSES}
+        if 'star_rating' not in attributes:
+            self.stats.attribute_misses += 1
+            return None
+
+        self.stats.attribute_hits += 1
+        if attributes.get('max_combo') is not None:
+            attributes['max_combo'] = int(attributes['max_combo'])
+        return ossapi.models.DifficultyAttributes(attributes=ossapi.models.BeatmapDifficultyAttributes(**attributes))
+
+    @property
+    def can_search(self) -> bool:
+        self._get_connection()
+        return self._searchable
+
+    def search_beatmaps(self, query: BeatmapQuery, offset: int = 0, limit: int = 20) -> list[int]:
+        """ids of the beatmaps matching query, best match first (or by star rating for a search of only filters)
+        the most played matches are ranked by bm25 over the indexed columns (see SEARCH_RANKED_MATCHES), then the rest follow by play count
+        the ids may include beatmaps the store does not trust, so they are looked up like any other ids
+        """
+        # a stale dump still finds the right beatmaps, only their details have to come from the API
+        connection: sqlite3.Connection | None = self._get_connection(fresh_only=False)
+        if connection is None or not self._searchable or query.is_empty:
+            return []
+
+        filters_sql: str = ''.join(f' AND {column} {operator} ?' for column, operator, _ in query.filters)
+        parameters: list[Any] = [value for _, _, value in query.filters]
+
+        with osu_metrics.registry.time(osu_metrics.LOCAL_SEARCH_SECONDS, index='beatmaps'):
+            if query.terms:
+                ranked_rows: list[sqlite3.Row] = connection.execute(
+                    SEARCH_MATCHES_QUERY.format(score=f', bm25(osu_beatmaps_search, {", ".join(map(str, SEARCH_COLUMN_WEIGHTS))}) AS score', filters=filters_sql),
+                    [query.to_fts(), *parameters, SEARCH_RANKED_MATCHES, 0]
+                ).fetchall()
+                # sorted stably, so equally relevant matches stay in play count order
+                rows: list[sqlite3.Row] = sorted(ranked_rows, key=lambda row: row['score'])[offset:offset+limit]
+
+                if len(ranked_rows) == SEARCH_RANKED_MATCHES and offset + limit > SEARCH_RANKED_MATCHES:
+                    rows += connection.execute(
+                        SEARCH_MATCHES_QUERY.format(score='', filters=filters_sql),
+                        [query.to_fts(), *parameters, limit - len(rows), max(offset, SEARCH_RANKED_MATCHES)]
+                    ).fetchall()
+            else:
+                # in star rating order, which walks its index instead of sorting every match
+                rows = connection.execute(
+                    f'SELECT b.beatmap_id FROM osu_beatmaps b WHERE b.deleted_at IS NULL{filters_sql} ORDER BY b.difficultyrating LIMIT ? OFFSET ?',
+                    [*parameters, limit, offset]
+                ).fetchall()
+
+        self.stats.searches += 1
+        return [row['beatmap_id'] for row in rows]
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self.stats) | {'open': self._connection is not None, 'fresh': self._fresh, 'dump_age_days': (datetime.date.today() - self._dump_date).days if self._dump_date else -1}
+
+    # ---
+
+    def _get_connection(self, fresh_only: bool = True) -> sqlite3.Connection | None:
+        # (re)open the store if it appeared or was replaced by a new ingest since the last check
+        now: float = time.monotonic()
+        if now - self._checked_at >= BEATMAP_STORE_RELOAD_SECONDS:
+            self._checked_at = now
+            try:
+                store_stat: os.stat_result = os.stat(self.path)
+                file_id: tuple[int, int] | None = (store_stat.st_ino, store_stat.st_mtime_ns)
+            except OSError:
+                file_id = None
+
+            if file_id != self._file_id:
+                self._open(file_id)
+            # (a long running app can outlive its dump)
+            self._fresh = self._dump_date is not None and (self.max_age_days <= 0 or (datetime.date.today() - self._dump_date).days <= self.max_age_days)
+
+        return self._connection if self._fresh or not fresh_only else None
+
+    def _open(self, file_id: tuple[int, int] | None) -> None:
+        if self._connection is not None:
+            self._connection.close()
+        self._connection, self._file_id, self._dump_date, self._searchable = None, file_id, None, False
+        if file_id is None:
+            return
+
+        try:
+            connection: sqlite3.Connection = sqlite3.connect(f'{pathlib.Path(self.path).absolute().as_uri()}?mode=ro', uri=True)
+            connection.row_factory = sqlite3.Row
+            dump_date_row: sqlite3.Row | None = connection.execute("SELECT value FROM meta WHERE key = 'dump_date'").fetchone()
+            searchable: bool = connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'osu_beatmaps_search'").fetchone() is not None
+        except sqlite3.Error:
+            return
+
+        self._connection = connection
+        self._dump_date = datetime.date.fromisoformat(dump_date_row['value']) if dump_date_row else None
+        self._searchable = searchable
+
+def make_beatmap(row: sqlite3.Row) -> ossapi.Beatmap:
+    """the ossapi.Beatmap (with its beatmapset embedded) that the API would return for a row of BEATMAP_QUERY
+    """
+    beatmapset_id: int = row['beatmapset_id']
+    covers: ossapi.enums.Covers = ossapi.enums.Covers(**{
+        cover_attribute: f'https://assets.ppy.sh/beatmaps/{beatmapset_id}/covers/{cover_name}.jpg'
+        for cover_attribute, cover_name in (
+            ('cover', 'cover'), ('cover_2x', 'cover@2x'), ('card', 'card'), ('card_2x', 'card@2x'),
+            ('list', 'list'), ('list_2x', 'list@2x'), ('slimcover', 'slimcover'), ('slimcover_2x', 'slimcover@2x')
+        )
+    })
+    osu_beatmapset: ossapi.Beatmapset = ossapi.Beatmapset(
+        id=beatmapset_id,
+        artist=row['artist'],
+        artist_unicode=row['artist_unicode'],
+        title=row['title'],
+        title_unicode=row['title_unicode'],
+        creator=row['creator'],
+        user_id=row['beatmapset_user_id'],
+        source=row['source'],
+        tags=row['tags'],
+        video=bool(row['video']),
+        storyboard=bool(row['storyboard']),
+        nsfw=bool(row['nsfw']),
+        bpm=row['beatmapset_bpm'],
+        status=ossapi.enums.RankStatus(row['beatmapset_approved']),
+        ranked=ossapi.enums.RankStatus(row['beatmapset_approved']),
+        favourite_count=row['favourite_count'],
+        play_count=row['play_count'],
+        covers=covers
+    )
+    return ossapi.Beatmap(
+        id=row['beatmap_id'],
+        beatmapset_id=beatmapset_id,
+        user_id=row['user_id'],
+        checksum=row['checksum'],
+        version=row['version'],
+        mode=list(ossapi.enums.GameMode)[row['playmode']],
+        mode_int=row['playmode'],
+        status=ossapi.enums.RankStatus(row['approved']),
+        ranked=ossapi.enums.RankStatus(row['approved']),
+        difficulty_rating=row['difficultyrating'],
+        total_length=row['total_length'],
+        hit_length=row['hit_length'],
+        count_circles=row['countNormal'],
+        count_sliders=row['countSlider'],
+        count_spinners=row['countSpinner'],
+        cs=row['diff_size'],
+        ar=row['diff_approach'],
+        accuracy=row['diff_overall'],
+        drain=row['diff_drain'],
+        bpm=row['bpm'],
+        max_combo=int(row['max_combo']) if row['max_combo'] is not None else None,
+        playcount=row['playcount'],
+        passcount=row['passcount'],
+        convert=False,
+        url=f'https://osu.ppy.sh/beatmaps/{row["beatmap_id"]}',
+        _beatmapset=osu_beatmapset
+    )
+
+beatmap_store: BeatmapStore = BeatmapStore()
+osu_metrics.registry.register_stats('beatmap_store', lambda: beatmap_store.as_dict())
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='load osu! data dumps (https://data.ppy.sh) into the local beatmap store')
+    parser.add_argument('dumps', nargs='+', help='dump archives (.tar.bz2), directories of .sql files, or .sql files')
+    parser.add_argument('--db', default=BEATMAP_STORE_PATH)
+    parser.add_argument('--dump-date', type=datetime.date.fromisoformat, default=None, help='YYYY-MM-DD the dumps were taken, if their names do not say')
+    args = parser.parse_args()
+
+    print(ingest(args.dumps, args.db, args.dump_date))
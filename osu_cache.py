@@ -0,0 +1,100 @@
+from __future__ import annotations
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import dataclass, field, asdict
+from typing import Generic, TypeVar
+import asyncio
+import time
+import osu_scheduler
+
+# --- -----
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+@dataclass
+class AsyncTTLCache(Generic[K, V]):
+    """process-wide LRU cache with a time-to-live, shared by every Flet session on this worker
+    identical lookups that arrive while the first one is still in flight wait on that same request instead of making their own,
+    which is raised to the priority of the most urgent of them (see osu_scheduler.SharedRequest)
+    """
+    max_entries: int
+    ttl_seconds: float
+
+    stats: CacheStats = field(default_factory=CacheStats)
+    _entries: OrderedDict[K, tuple[float, V]] = field(init=False, default_factory=OrderedDict)
+    _in_flight: dict[K, tuple[asyncio.Future[V], osu_scheduler.SharedRequest]] = field(init=False, default_factory=dict)
+
+    def get(self, key: K) -> V | None:
+        """return the cached value for key without fetching, or None if it is missing or expired
+        counts a hit, a miss is counted by whatever fetches the value next (see get_or_fetch), so it is not counted twice
+        """
+        value: V | None = self._get(key)
+        if value is not None:
+            self.stats.hits += 1
+        return value
+
+    def _get(self, key: K) -> V | None:
+        entry: tuple[float, V] | None = self._entries.get(key)
+        if entry is None:
+            return None
+
+        stored_at, value = entry
+        if time.monotonic() - stored_at >= self.ttl_seconds:
+            del self._entries[key]
+            self.stats.expirations += 1
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: K, value: V) -> None:
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    async def get_or_fetch(self, key: K, fetch: Callable[[], Awaitable[V]]) -> V:
+        value: V | None = self._get(key)
+        if value is not None:
+            self.stats.hits += 1
+            return value
+
+        future: asyncio.Future[V]
+        in_flight: tuple[asyncio.Future[V], osu_scheduler.SharedRequest] | None = self._in_flight.get(key)
+        if in_flight is not None:
+            self.stats.coalesced += 1
+            future, request = in_flight
+            request.raise_priority(osu_scheduler.get_request_priority())
+        else:
+            self.stats.misses += 1
+            request = osu_scheduler.SharedRequest(osu_scheduler.get_request_priority())
+            future = asyncio.ensure_future(self._fetch_and_store(key, fetch, request))
+            # mark a failure as retrieved even if every caller already gave up on it
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._in_flight[key] = (future, request)
+
+        # shield the shared request, so that one caller giving up does not cancel it for everyone else waiting on it
+        return await asyncio.shield(future)
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self.stats) | {'entries': len(self._entries), 'in_flight': len(self._in_flight)}
+
+    async def _fetch_and_store(self, key: K, fetch: Callable[[], Awaitable[V]], request: osu_scheduler.SharedRequest) -> V:
+        try:
+            with osu_scheduler.shared_request(request):
+                value: V = await fetch()
+            self.put(key, value)
+            return value
+        finally:
+            self._in_flight.pop(key, None)
@@ -0,0 +1,63 @@
+from __future__ import annotations
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Generic, TypeVar
+import os
+
+# --- -----
+
+T = TypeVar('T')
+
+HISTORY_MAX_ENTRIES: int = int(os.environ.get('OSU_HISTORY_MAX_ENTRIES', '20'))
+
+@dataclass
+class NavigationHistory(Generic[T]):
+    """bounded back/forward history of one session, like a browser's: visiting a new entry drops every entry forward of the current one
+    entries that are dropped, or age out past max_entries, are passed to release (once), so whatever they hold on to can go
+    """
+    release: Callable[[T], None] = lambda _: None
+    max_entries: int = HISTORY_MAX_ENTRIES
+
+    entries: list[T] = field(init=False, default_factory=list)
+        # index of the current entry, -1 while there is none
+    position: int = field(init=False, default=-1)
+
+    @property
+    def current(self) -> T | None:
+        return self.entries[self.position] if self.position >= 0 else None
+
+    @property
+    def can_go_back(self) -> bool:
+        return self.position > 0
+
+    @property
+    def can_go_forward(self) -> bool:
+        return self.position < len(self.entries) - 1
+
+    def visit(self, entry: T) -> None:
+        for dropped_entry in self.entries[self.position+1:]:
+            self.release(dropped_entry)
+        del self.entries[self.position+1:]
+
+        self.entries.append(entry)
+        while len(self.entries) > self.max_entries:
+            self.release(self.entries.pop(0))
+        self.position = len(self.entries) - 1
+
+    def back(self) -> T | None:
+        if not self.can_go_back:
+            return None
+        self.position -= 1
+        return self.entries[self.position]
+
+    def forward(self) -> T | None:
+        if not self.can_go_forward:
+            return None
+        self.position += 1
+        return self.entries[self.position]
+
+    def clear(self) -> None:
+        for entry in self.entries:
+            self.release(entry)
+        self.entries.clear()
+        self.position = -1
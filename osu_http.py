@@ -0,0 +1,86 @@
+from __future__ import annotations
+from dataclasses import dataclass
+import asyncio
+import aiohttp
+
+# --- -----
+
+# shared aiohttp session for everything the app sends over HTTP: osu! API requests (see osu_api.AppOssapiAsync) as well as beatmap covers and user avatars
+# a single keep-alive connection pool is reused across every Flet session on this worker,
+# so warm requests to osu.ppy.sh and the asset CDN skip DNS resolution and the TCP+TLS handshake
+    # (aiohttp only speaks HTTP/1.1, and ossapi is built on aiohttp, so connection reuse comes from keep-alive rather than HTTP/2)
+
+REQUEST_TIMEOUT: aiohttp.ClientTimeout = aiohttp.ClientTimeout(total=15, connect=5, sock_read=10)
+IMAGE_TIMEOUT: aiohttp.ClientTimeout = aiohttp.ClientTimeout(total=10, connect=3, sock_read=5)
+IMAGE_MAX_CONCURRENT_DOWNLOADS: int = 8
+
+CONNECTION_POOL_LIMIT: int = 64
+CONNECTION_POOL_LIMIT_PER_HOST: int = 16
+CONNECTION_KEEPALIVE_TIMEOUT: float = 60
+DNS_CACHE_SECONDS: int = 5*60
+
+_client_session: aiohttp.ClientSession | None = None
+_client_session_loop: asyncio.AbstractEventLoop | None = None
+_image_semaphore: asyncio.Semaphore | None = None
+
+def get_client_session() -> aiohttp.ClientSession:
+    """return the process-wide aiohttp session, creating it on first use
+    (or again if the previous one was closed, or belongs to an event loop that is no longer running)
+    """
+    global _client_session, _client_session_loop, _image_semaphore
+
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+
+    if _client_session is None or _client_session.closed or _client_session_loop is not loop:
+        _client_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=CONNECTION_POOL_LIMIT,
+                limit_per_host=CONNECTION_POOL_LIMIT_PER_HOST,
+                keepalive_timeout=CONNECTION_KEEPALIVE_TIMEOUT,
+                use_dns_cache=True,
+                ttl_dns_cache=DNS_CACHE_SECONDS
+            ),
+            timeout=REQUEST_TIMEOUT
+        )
+        _client_session_loop = loop
+        _image_semaphore = asyncio.Semaphore(IMAGE_MAX_CONCURRENT_DOWNLOADS)
+
+    return _client_session
+
+async def close_client_session() -> None:
+    global _client_session
+
+    if _client_session is not None and not _client_session.closed:
+        await _client_session.close()
+    _client_session = None
+
+# --- -----
+
+@dataclass(frozen=True)
+class FetchResult:
+    status: int
+    content: bytes
+    etag: str | None
+    last_modified: str | None
+    content_type: str | None = None
+
+async def fetch(url: str, etag: str | None = None, last_modified: str | None = None) -> FetchResult:
+    """GET url through the shared session, with at most IMAGE_MAX_CONCURRENT_DOWNLOADS in flight at once
+    if etag/last_modified are given, the request is made conditional, and a 304 comes back with empty content
+    """
+    client_session: aiohttp.ClientSession = get_client_session()
+    assert _image_semaphore is not None
+
+    headers: dict[str, str] = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
+    async with _image_semaphore:
+        async with client_session.get(url, headers=headers, timeout=IMAGE_TIMEOUT) as response:
+            if response.status == 304:
+                return FetchResult(304, b'', response.headers.get('ETag', etag), response.headers.get('Last-Modified', last_modified))
+
+            response.raise_for_status()
+            return FetchResult(response.status, await response.read(), response.headers.get('ETag'), response.headers.get('Last-Modified'), response.headers.get('Content-Type'))
@@ -0,0 +1,242 @@
+from __future__ import annotations
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+import asyncio
+import hashlib
+import json
+import os
+import time
+import aiohttp
+import osu_http
+import osu_metrics
+
+# --- -----
+
+# app-wide cache for beatmap covers and user avatars, served to the browser from this app's own image route (see osu_server)
+# tier 1: size-bounded in-memory LRU of the raw image bytes (shared by every Flet session on this worker)
+# tier 2: on-disk copy of the raw bytes plus their ETag/Last-Modified, revalidated with a conditional GET once stale
+# images are addressed by the sha256 of their URL, and the route only serves URLs that a renderer asked for, so it is not an open proxy
+
+IMAGE_CACHE_DIRECTORY: str = os.environ.get('OSU_IMAGE_CACHE_DIR', os.path.join('.cache', 'images'))
+IMAGE_CACHE_MEMORY_BYTES: int = int(os.environ.get('OSU_IMAGE_CACHE_MEMORY_MB', '64')) * 1024 * 1024
+IMAGE_CACHE_FRESH_SECONDS: float = 60 * 60
+
+IMAGE_ROUTE: str = '/images'
+    # how many image URLs the route remembers (beyond what is already in the memory or disk tier)
+IMAGE_ROUTE_MAX_URLS: int = 10000
+
+def get_image_key(url: str) -> str:
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+@dataclass
+class ImageCacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    revalidations: int = 0
+    misses: int = 0
+    evictions: int = 0
+    errors: int = 0
+
+@dataclass
+class ImageCacheEntry:
+    content: bytes
+    content_type: str | None
+    etag: str | None
+    last_modified: str | None
+    fetched_at: float
+        # fingerprint of content, for the route's own ETag
+    digest: str = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.digest = hashlib.sha256(self.content).hexdigest()[:32]
+
+@dataclass
+class ImageCache:
+    directory: str = IMAGE_CACHE_DIRECTORY
+    max_memory_bytes: int = IMAGE_CACHE_MEMORY_BYTES
+    fresh_seconds: float = IMAGE_CACHE_FRESH_SECONDS
+    max_urls: int = IMAGE_ROUTE_MAX_URLS
+
+    stats: ImageCacheStats = field(default_factory=ImageCacheStats)
+    memory_bytes: int = field(init=False, default=0)
+    _memory: OrderedDict[str, ImageCacheEntry] = field(init=False, default_factory=OrderedDict)
+    _urls: OrderedDict[str, str] = field(init=False, default_factory=OrderedDict)
+        # display sizes that get_src handed out, so the route only renders thumbnails (see osu_thumbnails) at sizes the app actually uses
+    thumbnail_sizes: set[tuple[int | None, int | None]] = field(init=False, default_factory=set)
+    _in_flight: dict[str, asyncio.Task[ImageCacheEntry | None]] = field(init=False, default_factory=dict)
+
+    def get_src(self, url: str | None, width: int | None = None, height: int | None = None) -> str | None:
+        """return the path of url on this app's image route, for ft.Image.src
+        with a width and/or height, the route serves it downscaled to that display size
+        nothing is downloaded until the browser asks for it, and the browser caches it from then on
+        """
+        if not url:
+            return None
+
+        key: str = get_image_key(url)
+        self._urls[key] = url
+        self._urls.move_to_end(key)
+        while len(self._urls) > self.max_urls:
+            self._urls.popitem(last=False)
+
+        if not width and not height:
+            return f'{IMAGE_ROUTE}/{key}'
+
+        self.thumbnail_sizes.add((width or None, height or None))
+        return f'{IMAGE_ROUTE}/{key}?' + '&'.join(f'{name}={value}' for name, value in (('w', width), ('h', height)) if value)
+
+    async def get(self, url: str | None) -> ImageCacheEntry | None:
+        """return the image at url, or None if it could not be downloaded
+        concurrent lookups of the same url share a single download
+        """
+        if not url:
+            return None
+
+        key: str = get_image_key(url)
+        entry: ImageCacheEntry | None = self._memory.get(key)
+        if entry is not None and time.time() - entry.fetched_at < self.fresh_seconds:
+            self._memory.move_to_end(key)
+            self.stats.memory_hits += 1
+            return entry
+
+        task: asyncio.Task[ImageCacheEntry | None] | None = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(url, entry))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        return await asyncio.shield(task)
+
+    async def get_by_key(self, key: str) -> ImageCacheEntry | None:
+        """return the image with the given key (see get_src), or None if no renderer has asked for it (or it could not be downloaded)
+        """
+        url: str | None = self._urls.get(key)
+        if url is None:
+            # the URL may have been handed out before a restart, or dropped from the registry, but still be on disk
+            url = await asyncio.to_thread(self._read_disk_url, key)
+        if url is None:
+            return None
+
+        return await self.get(url)
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self.stats) | {'memory_bytes': self.memory_bytes, 'memory_entries': len(self._memory), 'urls': len(self._urls)}
+
+    # ---
+
+    async def _load(self, url: str, entry: ImageCacheEntry | None) -> ImageCacheEntry | None:
+        # memory entry is missing or stale, so fall back to the disk copy
+        if entry is None:
+            entry = await asyncio.to_thread(self._read_disk, url)
+
+        if entry is not None and time.time() - entry.fetched_at < self.fresh_seconds:
+            self.stats.disk_hits += 1
+            self._store_memory(url, entry)
+            return entry
+
+        try:
+            with osu_metrics.registry.time(osu_metrics.IMAGE_FETCH_SECONDS, osu_metrics.IMAGE_FETCH_ERRORS_TOTAL):
+                result: osu_http.FetchResult = await osu_http.fetch(
+                    url,
+                    etag=entry.etag if entry else None,
+                    last_modified=entry.last_modified if entry else None
+                )
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.stats.errors += 1
+            # serve the stale copy rather than nothing if the CDN is unreachable
+            return entry
+
+        if result.status == 304 and entry is not None:
+            self.stats.revalidations += 1
+            entry = ImageCacheEntry(entry.content, entry.content_type, result.etag, result.last_modified, time.time())
+            content: bytes | None = None
+        else:
+            self.stats.misses += 1
+            entry = ImageCacheEntry(result.content, result.content_type, result.etag, result.last_modified, time.time())
+            content = result.content
+
+        await asyncio.to_thread(self._write_disk, url, entry, content)
+        self._store_memory(url, entry)
+        return entry
+
+    def _store_memory(self, url: str, entry: ImageCacheEntry) -> None:
+        key: str = get_image_key(url)
+        previous: ImageCacheEntry | None = self._memory.pop(key, None)
+        if previous is not None:
+            self.memory_bytes -= len(previous.content)
+
+        # a single image bigger than the whole budget is served but never kept
+        if len(entry.content) > self.max_memory_bytes:
+            return
+
+        self._memory[key] = entry
+        self.memory_bytes += len(entry.content)
+
+        while self.memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self.memory_bytes -= len(evicted.content)
+            self.stats.evictions += 1
+
+    # ---
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _read_disk_metadata(self, key: str) -> dict | None:
+        try:
+            with open(f'{self._disk_path(key)}.json', 'r', encoding='utf-8') as metadata_file:
+                return json.load(metadata_file)
+        except (OSError, ValueError):
+            return None
+
+    def _read_disk_url(self, key: str) -> str | None:
+        metadata: dict | None = self._read_disk_metadata(key)
+        url: str | None = metadata.get('url') if metadata else None
+        return url if url and get_image_key(url) == key else None
+
+    def _read_disk(self, url: str) -> ImageCacheEntry | None:
+        key: str = get_image_key(url)
+        metadata: dict | None = self._read_disk_metadata(key)
+        if metadata is None or metadata.get('url') != url:
+            return None
+
+        try:
+            with open(f'{self._disk_path(key)}.bin', 'rb') as content_file:
+                content: bytes = content_file.read()
+        except OSError:
+            return None
+
+        return ImageCacheEntry(
+            content,
+            metadata.get('content_type'),
+            metadata.get('etag'),
+            metadata.get('last_modified'),
+            float(metadata.get('fetched_at', 0))
+        )
+
+    def _write_disk(self, url: str, entry: ImageCacheEntry, content: bytes | None) -> None:
+        path: str = self._disk_path(get_image_key(url))
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+
+            # only rewrite the body when it actually changed (a 304 only refreshes the metadata)
+            if content is not None:
+                with open(f'{path}.bin.tmp', 'wb') as content_file:
+                    content_file.write(content)
+                os.replace(f'{path}.bin.tmp', f'{path}.bin')
+
+            with open(f'{path}.json.tmp', 'w', encoding='utf-8') as metadata_file:
+                json.dump({
+                    'url': url,
+                    'content_type': entry.content_type,
+                    'etag': entry.etag,
+                    'last_modified': entry.last_modified,
+                    'fetched_at': entry.fetched_at
+                }, metadata_file)
+            os.replace(f'{path}.json.tmp', f'{path}.json')
+        except OSError:
+            # the disk tier is best-effort, the memory tier still has the image
+            pass
+
+image_cache: ImageCache = ImageCache()
+osu_metrics.registry.register_stats('image_cache', lambda: image_cache.as_dict())
@@ -0,0 +1,155 @@
+from __future__ import annotations
+from collections.abc import Callable, Iterator, Mapping
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import bisect
+import time
+
+# --- -----
+
+# process-wide metrics (shared by every Flet session on this worker), served in the Prometheus text format on /metrics (see osu_server)
+# latency histograms and error counters are recorded where the work happens, stats that modules already keep (caches, scheduler) are read when scraped
+
+LATENCY_BUCKETS_SECONDS: tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    # osu! API requests, labelled by the OssapiAsync method (beatmap, beatmaps, beatmap_attributes, user, users)
+API_REQUEST_SECONDS = 'osu_api_request_seconds'
+API_ERRORS_TOTAL = 'osu_api_errors_total'
+    # downloads from the covers/avatars CDN, and thumbnails rendered from them
+IMAGE_FETCH_SECONDS = 'osu_image_fetch_seconds'
+IMAGE_FETCH_ERRORS_TOTAL = 'osu_image_fetch_errors_total'
+THUMBNAIL_SECONDS = 'osu_thumbnail_seconds'
+    # each stage of building a renderer, labelled by renderer (beatmap, user) and stage (see BeatmapRenderer.stage_timings)
+RENDER_STAGE_SECONDS = 'osu_render_stage_seconds'
+    # searches and expansions that ended with an error message for the user
+SEARCH_ERRORS_TOTAL = 'osu_search_errors_total'
+    # searches answered from a local index instead of the API, labelled by index
+LOCAL_SEARCH_SECONDS = 'osu_local_search_seconds'
+    # difficulty attribute prefetches not sent because the request budget was running low
+PREFETCH_SKIPPED_TOTAL = 'osu_prefetch_skipped_total'
+PAGE_UPDATE_SECONDS = 'osu_page_update_seconds'
+ACTIVE_SESSIONS = 'osu_active_sessions'
+SESSIONS_TOTAL = 'osu_sessions_total'
+STATS = 'osu_stats'
+
+METRIC_HELP: dict[str, tuple[str, str]] = {
+    API_REQUEST_SECONDS: ('histogram', 'osu! API request latency, by endpoint'),
+    API_ERRORS_TOTAL: ('counter', 'osu! API requests that failed, by endpoint and error'),
+    IMAGE_FETCH_SECONDS: ('histogram', 'image download (or revalidation) latency'),
+    IMAGE_FETCH_ERRORS_TOTAL: ('counter', 'image downloads that failed, by error'),
+    THUMBNAIL_SECONDS: ('histogram', 'thumbnail decode, resize and encode time, including the wait for a worker'),
+    RENDER_STAGE_SECONDS: ('histogram', 'renderer construction time, by renderer and stage'),
+    SEARCH_ERRORS_TOTAL: ('counter', 'searches and expansions that failed, by search and error'),
+    LOCAL_SEARCH_SECONDS: ('histogram', 'local index search time, by index'),
+    PREFETCH_SKIPPED_TOTAL: ('counter', 'difficulty attribute prefetches skipped while the request budget was low'),
+    PAGE_UPDATE_SECONDS: ('histogram', 'page.update() time, by kind (full or targeted)'),
+    ACTIVE_SESSIONS: ('gauge', 'Flet sessions currently open on this worker'),
+    SESSIONS_TOTAL: ('counter', 'Flet sessions started on this worker'),
+    STATS: ('gauge', 'stats kept by the caches and the request scheduler, by component and stat')
+}
+
+Labels = tuple[tuple[str, str], ...]
+
+def escape_label_value(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label_value(value)}"' for name, value in labels) + '}'
+
+def format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+@dataclass
+class Histogram:
+    buckets: tuple[float, ...] = LATENCY_BUCKETS_SECONDS
+
+        # counts per bucket (not cumulative), plus one past the last bucket for +Inf
+    counts: list[int] = field(init=False)
+    sum: float = field(init=False, default=0)
+    count: int = field(init=False, default=0)
+
+    def __post_init__(self) -> None:
+        self.counts = [0]*(len(self.buckets) + 1)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+@dataclass
+class MetricsRegistry:
+    _histograms: dict[str, dict[Labels, Histogram]] = field(init=False, default_factory=dict)
+    _values: dict[str, dict[Labels, float]] = field(init=False, default_factory=dict)
+    _stats: list[tuple[str, Callable[[], Mapping[str, float]]]] = field(init=False, default_factory=list)
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        label_key: Labels = tuple(labels.items())
+        histograms: dict[Labels, Histogram] = self._histograms.setdefault(name, {})
+        histogram: Histogram | None = histograms.get(label_key)
+        if histogram is None:
+            histogram = histograms[label_key] = Histogram()
+        histogram.observe(value)
+
+    def increment(self, name: str, amount: float = 1, **labels: str) -> None:
+        """add amount to a counter or gauge (a negative amount for a gauge going down)
+        """
+        values: dict[Labels, float] = self._values.setdefault(name, {})
+        label_key: Labels = tuple(labels.items())
+        values[label_key] = values.get(label_key, 0) + amount
+
+    def register_stats(self, component: str, as_dict: Callable[[], Mapping[str, float]]) -> None:
+        """export the stats of component (e.g. a cache's as_dict) as osu_stats{component=..., stat=...}, read whenever /metrics is scraped
+        """
+        self._stats.append((component, as_dict))
+
+    @contextmanager
+    def time(self, name: str, errors: str | None = None, **labels: str) -> Iterator[None]:
+        """observe how long the block took in the histogram name, and count any exception it raised in the counter errors
+        """
+        start: float = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            if errors is not None:
+                self.increment(errors, **labels, error=type(e).__name__)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def render(self) -> str:
+        """every metric in the Prometheus text exposition format
+        """
+        lines: list[str] = []
+
+        def add_header(name: str) -> None:
+            kind, metric_help = METRIC_HELP.get(name, ('untyped', name))
+            lines.append(f'# HELP {name} {metric_help}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        for name, histograms in sorted(self._histograms.items()):
+            add_header(name)
+            for labels, histogram in histograms.items():
+                cumulative_count: int = 0
+                for bucket, bucket_count in zip((*histogram.buckets, '+Inf'), histogram.counts):
+                    cumulative_count += bucket_count
+                    bucket_labels: Labels = (*labels, ('le', bucket if isinstance(bucket, str) else format_value(bucket)))
+                    lines.append(f'{name}_bucket{format_labels(bucket_labels)} {cumulative_count}')
+                lines.append(f'{name}_sum{format_labels(labels)} {format_value(histogram.sum)}')
+                lines.append(f'{name}_count{format_labels(labels)} {histogram.count}')
+
+        for name, values in sorted(self._values.items()):
+            add_header(name)
+            for labels, value in values.items():
+                lines.append(f'{name}{format_labels(labels)} {format_value(value)}')
+
+        if self._stats:
+            add_header(STATS)
+            for component, as_dict in self._stats:
+                for stat, value in as_dict().items():
+                    lines.append(f'{STATS}{format_labels((("component", component), ("stat", stat)))} {format_value(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+registry: MetricsRegistry = MetricsRegistry()
@@ -0,0 +1,269 @@
+from __future__ import annotations
+from collections.abc import Iterator
+from typing import Literal
+from dataclasses import dataclass
+import functools
+import itertools
+import math
+import ossapi as ossapi # type: ignore
+
+# --- -----
+
+# local mod application for osu!standard beatmap settings
+# everything except star rating can be derived from the base beatmap values, so the renderer never has to wait on the API for them
+
+ModWorthPP = Literal['HD', 'HR', 'EZ', 'DT', 'NC', 'HT', 'FL', 'NF', 'SO']
+
+# dict denoting a list of all mods that conflict with a given mod
+CONFLICT_MODS: dict[ModWorthPP, list[ModWorthPP]] = {
+    'HR': ['EZ'],
+    'EZ': ['HR'],
+    'DT': ['NC', 'HT'],
+    'NC': ['DT', 'HT'],
+    'HT': ['DT', 'NC']
+}
+
+# one bit per mod, in the order ossapi prints them
+MODS_ORDER: tuple[ModWorthPP, ...] = ('NF', 'EZ', 'HD', 'HR', 'DT', 'NC', 'HT', 'FL', 'SO')
+MOD_BITS: dict[ModWorthPP, int] = {mod: 1 << i for i, mod in enumerate(MODS_ORDER)}
+    # every bit that has to be cleared when a mod is selected
+CONFLICT_MASKS: dict[ModWorthPP, int] = {mod: sum(MOD_BITS[conflict_mod] for conflict_mod in CONFLICT_MODS.get(mod, [])) for mod in MODS_ORDER}
+    # the mods that change difficulty attributes (HD only does along with FL, see ModSet.difficulty_mods)
+MASK_DIFFICULTY: int = MOD_BITS['EZ'] | MOD_BITS['HR'] | MOD_BITS['DT'] | MOD_BITS['HT'] | MOD_BITS['FL']
+
+@dataclass(frozen=True, slots=True)
+class ModSet:
+    """immutable set of selected mods, stored as a bitmask
+    hashable, so it can key caches directly, and toggling a mod returns a new ModSet
+    """
+    bits: int = 0
+
+    @classmethod
+    def from_mods(cls, mods: list[ModWorthPP] | tuple[ModWorthPP, ...]) -> ModSet:
+        return ModSet(sum(MOD_BITS[mod] for mod in set(mods)))
+
+    @classmethod
+    def from_acronyms(cls, acronyms: str) -> ModSet:
+        """'HDHR' -> HD+HR (raises KeyError for anything that is not a ModWorthPP)
+        """
+        return ModSet.from_mods([acronyms[i:i+2].upper() for i in range(0, len(acronyms), 2)]) # type: ignore
+
+    def __contains__(self, mod: object) -> bool:
+        return bool(self.bits & MOD_BITS.get(mod, 0)) # type: ignore
+
+    def __iter__(self) -> Iterator[ModWorthPP]:
+        return iter(self.mods)
+
+    def __len__(self) -> int:
+        return self.bits.bit_count()
+
+    def __str__(self) -> str:
+        return str(get_ossapi_mod(self.bits))
+
+    def toggle(self, mod: ModWorthPP) -> ModSet:
+        """deselect mod if it is selected, otherwise select it and deselect every mod that conflicts with it
+        """
+        if self.bits & MOD_BITS[mod]:
+            return ModSet(self.bits & ~MOD_BITS[mod])
+        return ModSet((self.bits & ~CONFLICT_MASKS[mod]) | MOD_BITS[mod])
+
+    @property
+    def mods(self) -> tuple[ModWorthPP, ...]:
+        return tuple(mod for mod in MODS_ORDER if self.bits & MOD_BITS[mod])
+
+    @property
+    def is_valid(self) -> bool:
+        return not any(self.bits & MOD_BITS[mod] and self.bits & CONFLICT_MASKS[mod] for mod in MODS_ORDER)
+
+    @property
+    def difficulty_mods(self) -> ModSet:
+        """the mods difficulty attributes (star rating and the rest) actually depend on, as the API and the osu! data dumps tell them apart:
+        NC is the same as DT, HD only matters along with FL, and NF/SO never do
+        so NoMod and HD, or HR and HDHR, are one and the same for caching and requesting difficulty attributes
+        """
+        bits: int = self.bits & MASK_DIFFICULTY
+        if self.bits & MOD_BITS['NC']:
+            bits |= MOD_BITS['DT']
+        if self.bits & MOD_BITS['FL']:
+            bits |= self.bits & MOD_BITS['HD']
+        return ModSet(bits)
+
+    @property
+    def value(self) -> int:
+        """the osu! API's own mod bitmask (as used by ossapi.Mod), for cache keys shared with everything that was keyed on ossapi.Mod
+        """
+        return get_ossapi_mod(self.bits).value
+
+    def to_ossapi(self) -> ossapi.Mod:
+        return get_ossapi_mod(self.bits)
+
+@functools.cache
+def get_ossapi_mod(bits: int) -> ossapi.Mod:
+    # there are only 2^9 possible mod sets, so each ossapi.Mod is only built once
+    return ossapi.Mod([mod for mod in MODS_ORDER if bits & MOD_BITS[mod]])
+
+def is_valid_mod_combination(mods: list[ModWorthPP]) -> bool:
+    return ModSet.from_mods(mods).is_valid
+
+def get_valid_mod_combinations(mods: list[ModWorthPP]) -> list[ModSet]:
+    """every combination of the given mods that can be selected at once (including NoMod), from fewest to most mods
+    """
+    mod_sets: list[ModSet] = [
+        ModSet.from_mods(mod_combination)
+        for size in range(len(mods) + 1)
+        for mod_combination in itertools.combinations(mods, size)
+    ]
+    return [mod_set for mod_set in mod_sets if mod_set.is_valid]
+
+# ---
+
+RATE_DT: float = 1.5
+RATE_HT: float = 0.75
+
+MASK_RATE_UP: int = MOD_BITS['DT'] | MOD_BITS['NC']
+MASK_RATE_DOWN: int = MOD_BITS['HT']
+
+def get_mods_rate(mods: ModSet) -> float:
+    if mods.bits & MASK_RATE_UP:
+        return RATE_DT
+    elif mods.bits & MASK_RATE_DOWN:
+        return RATE_HT
+    else:
+        return 1.0
+
+def get_mods_difficulty_multiplier(mods: ModSet, hr_multiplier: float) -> float:
+    if mods.bits & MOD_BITS['EZ']:
+        return 0.5
+    elif mods.bits & MOD_BITS['HR']:
+        return hr_multiplier
+    else:
+        return 1.0
+
+# ---
+
+def get_beatmap_cs_with_mods(cs: float, mods: ModSet) -> float:
+    return min(cs*get_mods_difficulty_multiplier(mods, 1.3), 10.0)
+
+def get_beatmap_hp_with_mods(hp: float, mods: ModSet) -> float:
+    return min(hp*get_mods_difficulty_multiplier(mods, 1.4), 10.0)
+
+def get_beatmap_ar_with_mods(ar: float, mods: ModSet) -> float:
+    """apply EZ/HR to AR, then scale the approach time (preempt) by the DT/HT rate and convert it back to AR
+    """
+    ar = min(ar*get_mods_difficulty_multiplier(mods, 1.4), 10.0)
+
+    # AR 5 = 1200ms, -150ms per AR above 5, +120ms per AR below 5
+    preempt: float = 1800 - 120*ar if ar < 5 else 1200 - 150*(ar - 5)
+    preempt /= get_mods_rate(mods)
+
+    return (1800 - preempt)/120 if preempt > 1200 else 5 + (1200 - preempt)/150
+
+def get_beatmap_od_with_mods(od: float, mods: ModSet) -> float:
+    """apply EZ/HR to OD, then scale the 300 hit window by the DT/HT rate and convert it back to OD
+    """
+    od = min(od*get_mods_difficulty_multiplier(mods, 1.4), 10.0)
+
+    # the 300 hit window is 80ms at OD 0, -6ms per OD
+    hit_window_great: float = (80 - 6*od)/get_mods_rate(mods)
+
+    return (80 - hit_window_great)/6
+
+def get_beatmap_length_with_mods(length: int, mods: ModSet) -> int:
+    return math.floor(length/get_mods_rate(mods))
+
+def get_beatmap_bpm_with_mods(bpm: float | None, mods: ModSet) -> float | None:
+    return bpm*get_mods_rate(mods) if bpm is not None else None
+
+# ---
+
+@dataclass(frozen=True, slots=True)
+class BeatmapSettings:
+    cs: float
+    ar: float
+    od: float
+    hp: float
+    length: int
+    bpm: float | None
+
+    @classmethod
+    def from_beatmap(cls, osu_beatmap: ossapi.Beatmap) -> BeatmapSettings:
+        # the beatmap's own (NoMod) settings
+        return BeatmapSettings(osu_beatmap.cs, osu_beatmap.ar, osu_beatmap.accuracy, osu_beatmap.drain, osu_beatmap.total_length, osu_beatmap.bpm)
+
+def get_settings_with_mods(settings: BeatmapSettings, mods: ModSet) -> BeatmapSettings:
+    return BeatmapSettings(
+        cs=get_beatmap_cs_with_mods(settings.cs, mods),
+        ar=get_beatmap_ar_with_mods(settings.ar, mods),
+        od=get_beatmap_od_with_mods(settings.od, mods),
+        hp=get_beatmap_hp_with_mods(settings.hp, mods),
+        length=get_beatmap_length_with_mods(settings.length, mods),
+        bpm=get_beatmap_bpm_with_mods(settings.bpm, mods)
+    )
+
+def get_beatmap_settings_with_mods(osu_beatmap: ossapi.Beatmap, mods: ModSet) -> BeatmapSettings:
+    return get_settings_with_mods(BeatmapSettings.from_beatmap(osu_beatmap), mods)
+
+# --- -----
+
+# everything the beatmap panel shows for a mod selection (apart from star rating, which comes from the API)
+
+COLOR_DEFAULT: str = 'black'
+COLOR_HD: str = '#F1C232'
+COLOR_HR: str = '#CC0000'
+COLOR_EZ: str = '#6AA84F'
+COLOR_DT: str = '#674EA7'
+COLOR_NC: str = '#674EA7'
+COLOR_HT: str = '#45818E'
+COLOR_FL: str = '#434343'
+
+@dataclass(frozen=True, slots=True)
+class DisplayValue:
+    value: str
+    tooltip: str
+    color: str = COLOR_DEFAULT
+
+@dataclass(frozen=True, slots=True)
+class BeatmapDisplayModel:
+    stars_color: str
+    length: DisplayValue
+    bpm: DisplayValue
+    cs: DisplayValue
+    ar: DisplayValue
+    od: DisplayValue
+    hp: DisplayValue
+    mods: DisplayValue
+
+@functools.lru_cache(maxsize=4096)
+def get_display_model(settings: BeatmapSettings, mods: ModSet) -> BeatmapDisplayModel:
+    """settings rounded off to 2 decimal places, with tooltips holding the exact values
+    memoized, since every session looking at the same beatmap with the same mods gets an identical model
+    """
+    settings = get_settings_with_mods(settings, mods)
+
+    # HR/EZ color every difficulty setting, FL overrides that for stars, and DT/NC/HT override stars, length, BPM, AR and OD
+    difficulty_color: str = COLOR_HR if mods.bits & MOD_BITS['HR'] else COLOR_EZ if mods.bits & MOD_BITS['EZ'] else COLOR_DEFAULT
+    stars_color: str = COLOR_FL if mods.bits & MOD_BITS['FL'] else difficulty_color
+    rate_color: str = COLOR_DEFAULT
+    ar_od_color: str = difficulty_color
+    if mods.bits & MASK_RATE_UP:
+        stars_color = rate_color = ar_od_color = COLOR_DT
+    elif mods.bits & MASK_RATE_DOWN:
+        stars_color = rate_color = ar_od_color = COLOR_HT
+
+    return BeatmapDisplayModel(
+        stars_color=stars_color,
+        length=DisplayValue(f'Length: {settings.length}', f'{settings.length}', rate_color),
+        bpm=DisplayValue(
+            f'BPM: {round(settings.bpm, 3):g}' if settings.bpm is not None else 'BPM: ?',
+            f'{settings.bpm:g}' if settings.bpm is not None else '?',
+            rate_color
+        ),
+        cs=DisplayValue(f'{round(settings.cs, 2):g}', f'{settings.cs:g}', difficulty_color),
+        ar=DisplayValue(f'{round(settings.ar, 2):g}', f'{settings.ar:g}', ar_od_color),
+        od=DisplayValue(f'{round(settings.od, 2):g}', f'{settings.od:g}', ar_od_color),
+        hp=DisplayValue(f'{round(settings.hp, 2):g}', f'{settings.hp:g}', difficulty_color),
+        mods=DisplayValue(f'Mods: {mods}', f'{mods}')
+    )
+
+def get_beatmap_display_model(osu_beatmap: ossapi.Beatmap, mods: ModSet) -> BeatmapDisplayModel:
+    return get_display_model(BeatmapSettings.from_beatmap(osu_beatmap), mods)
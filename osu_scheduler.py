@@ -0,0 +1,240 @@
+from __future__ import annotations
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Literal
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import time
+import aiohttp
+import osu_metrics
+
+# --- -----
+
+# app-wide token bucket that every osu! API request goes through, no matter which session's OssapiAsync made it
+# when requests have to queue, interactive searches go first, then mod toggles, then background prefetching
+
+RequestPriority = Literal['interactive', 'mod_toggle', 'background']
+REQUEST_PRIORITIES: tuple[RequestPriority, ...] = ('interactive', 'mod_toggle', 'background')
+
+# the priority of whatever API request the current task makes, set with request_priority(...)
+current_request_priority: ContextVar[RequestPriority] = ContextVar('current_request_priority', default='interactive')
+
+@contextmanager
+def request_priority(priority: RequestPriority) -> Iterator[None]:
+    token = current_request_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_request_priority.reset(token)
+
+@dataclass(eq=False)
+class SharedRequest:
+    """a request that several callers wait on (see osu_cache), queued at the highest priority of any of them
+    a mod click that joins a request a background prefetch started raises it to mod_toggle, instead of waiting behind every other prefetch
+    """
+    priority: RequestPriority
+
+        # where the request is queued right now, if it is
+    _queued: tuple[RequestScheduler, asyncio.Future[None]] | None = field(init=False, default=None)
+
+    def raise_priority(self, priority: RequestPriority) -> None:
+        if REQUEST_PRIORITIES.index(priority) >= REQUEST_PRIORITIES.index(self.priority):
+            return
+        self.priority = priority
+        if self._queued is not None:
+            scheduler, waiter = self._queued
+            scheduler._requeue(waiter, priority)
+
+# the shared request the current task is making, set with shared_request(...), which overrides current_request_priority
+current_shared_request: ContextVar[SharedRequest | None] = ContextVar('current_shared_request', default=None)
+
+@contextmanager
+def shared_request(request: SharedRequest) -> Iterator[None]:
+    token = current_shared_request.set(request)
+    try:
+        yield
+    finally:
+        current_shared_request.reset(token)
+
+def get_request_priority() -> RequestPriority:
+    request: SharedRequest | None = current_shared_request.get()
+    return request.priority if request is not None else current_request_priority.get()
+
+class RateLimited(Exception):
+    """the osu! API kept answering 429 Too Many Requests, even after backing off"""
+
+@dataclass
+class PriorityStats:
+    requests: int = 0
+    queued: int = 0
+    wait_seconds_total: float = 0
+    wait_seconds_max: float = 0
+
+@dataclass
+class SchedulerStats:
+    rate_limited: int = 0
+    retries: int = 0
+    queue_depth_max: int = 0
+    priorities: dict[RequestPriority, PriorityStats] = field(default_factory=lambda: {priority: PriorityStats() for priority in REQUEST_PRIORITIES})
+
+@dataclass
+class RequestScheduler:
+    requests_per_minute: float
+    burst: int
+    max_retries: int = 3
+    backoff_seconds: float = 1
+    backoff_jitter: float = 0.5
+
+    stats: SchedulerStats = field(default_factory=SchedulerStats)
+    _tokens: float = field(init=False)
+    _tokens_updated: float = field(init=False, default_factory=time.monotonic)
+    _paused_until: float = field(init=False, default=0)
+    _queue: list[tuple[int, int, asyncio.Future[None]]] = field(init=False, default_factory=list)
+    _queue_order: Iterator[int] = field(init=False, default_factory=itertools.count)
+    _dispatcher: asyncio.Task[None] | None = field(init=False, default=None)
+
+    def __post_init__(self) -> None:
+        self._tokens = self.burst
+
+    @property
+    def queue_depth(self) -> int:
+        # a request whose priority was raised is in the queue twice, under both priorities
+        return len({waiter for _, _, waiter in self._queue if not waiter.done()})
+
+    @property
+    def available_tokens(self) -> float:
+        """tokens in the bucket right now (without taking one), 0 while paused after a 429
+        """
+        now: float = time.monotonic()
+        if now < self._paused_until:
+            return 0
+        return min(self.burst, self._tokens + (now - self._tokens_updated)*self.requests_per_minute/60)
+
+    async def acquire(self, priority: RequestPriority, request: SharedRequest | None = None) -> None:
+        """wait for a token, behind every queued request of the same or a higher priority
+        (a shared request can still have its priority raised while it waits)
+        """
+        priority_stats: PriorityStats = self.stats.priorities[priority]
+        priority_stats.requests += 1
+
+        if not self._queue and self._take_token():
+            return
+
+        wait_start: float = time.monotonic()
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (REQUEST_PRIORITIES.index(priority), next(self._queue_order), waiter))
+        if request is not None:
+            request._queued = (self, waiter)
+
+        priority_stats.queued += 1
+        self.stats.queue_depth_max = max(self.stats.queue_depth_max, self.queue_depth)
+        self._start_dispatcher()
+
+        try:
+            await waiter
+        finally:
+            if request is not None:
+                request._queued = None
+            wait_seconds: float = time.monotonic() - wait_start
+            priority_stats.wait_seconds_total += wait_seconds
+            priority_stats.wait_seconds_max = max(priority_stats.wait_seconds_max, wait_seconds)
+
+    async def request(self, send: Callable[[], Awaitable[aiohttp.ClientResponse]]) -> aiohttp.ClientResponse:
+        """send a request once a token is available, backing off and retrying (with jitter) while the API answers 429
+        """
+        request: SharedRequest | None = current_shared_request.get()
+
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(get_request_priority(), request)
+            response: aiohttp.ClientResponse = await send()
+            if response.status != 429:
+                return response
+
+            self.stats.rate_limited += 1
+            retry_after: float = self._get_retry_after(response, attempt)
+            response.release()
+            if attempt == self.max_retries:
+                break
+
+            # the budget is shared, so every session waits out the Retry-After, not just this one
+            self.stats.retries += 1
+            self.pause(retry_after*random.uniform(1, 1 + self.backoff_jitter))
+
+        raise RateLimited()
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+    def as_dict(self) -> dict[str, float]:
+        scheduler_dict: dict[str, float] = {
+            'queue_depth': self.queue_depth,
+            'queue_depth_max': self.stats.queue_depth_max,
+            'rate_limited': self.stats.rate_limited,
+            'retries': self.stats.retries
+        }
+        for priority, priority_stats in self.stats.priorities.items():
+            scheduler_dict[f'{priority}_requests'] = priority_stats.requests
+            scheduler_dict[f'{priority}_queued'] = priority_stats.queued
+            scheduler_dict[f'{priority}_wait_seconds_total'] = priority_stats.wait_seconds_total
+            scheduler_dict[f'{priority}_wait_seconds_max'] = priority_stats.wait_seconds_max
+        return scheduler_dict
+
+    # ---
+
+    def _start_dispatcher(self) -> None:
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    def _requeue(self, waiter: asyncio.Future[None], priority: RequestPriority) -> None:
+        # queue the waiter again at the higher priority, the old entry is skipped once the waiter is done (like a cancelled one)
+        if not waiter.done():
+            heapq.heappush(self._queue, (REQUEST_PRIORITIES.index(priority), next(self._queue_order), waiter))
+            self._start_dispatcher()
+
+    def _take_token(self) -> bool:
+        now: float = time.monotonic()
+        if now < self._paused_until:
+            self._tokens_updated = now
+            return False
+
+        self._tokens = min(self.burst, self._tokens + (now - self._tokens_updated)*self.requests_per_minute/60)
+        self._tokens_updated = now
+
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    async def _dispatch(self) -> None:
+        # hand out tokens to queued requests in priority order, sleeping until the next token whenever the bucket runs dry
+        while self._queue:
+            _, _, waiter = self._queue[0]
+            if waiter.done():
+                # the request was cancelled while it was queued, or already got its token under a raised priority
+                heapq.heappop(self._queue)
+                continue
+
+            if self._take_token():
+                heapq.heappop(self._queue)
+                waiter.set_result(None)
+                continue
+
+            await asyncio.sleep(max(self._paused_until - time.monotonic(), (1 - self._tokens)*60/self.requests_per_minute))
+
+    def _get_retry_after(self, response: aiohttp.ClientResponse, attempt: int) -> float:
+        try:
+            return max(float(response.headers.get('Retry-After', '')), 0)
+        except ValueError:
+            return self.backoff_seconds*2**attempt
+
+request_scheduler: RequestScheduler = RequestScheduler(
+    requests_per_minute=float(os.environ.get('OSU_API_REQUESTS_PER_MINUTE', '1000')),
+    burst=int(os.environ.get('OSU_API_REQUESTS_BURST', '30'))
+)
+osu_metrics.registry.register_stats('request_scheduler', lambda: request_scheduler.as_dict())
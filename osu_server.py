@@ -0,0 +1,69 @@
+from __future__ import annotations
+from collections.abc import Awaitable, Callable
+import os
+import secrets
+import flet as ft # type: ignore
+import flet.fastapi as flet_fastapi # type: ignore
+import uvicorn
+from fastapi import Request, Response
+import osu_images
+import osu_metrics
+import osu_thumbnails
+
+# --- -----
+
+# the web server the app runs on: Flet's own FastAPI app, plus the routes this app serves next to it
+
+    # the browser keeps images for this long before revalidating them with If-None-Match
+IMAGE_ROUTE_MAX_AGE_SECONDS: int = 24*60*60
+    # every interface by default, as the deployed app needs, OSU_HOST (or Flet's own FLET_SERVER_IP) narrows it down, e.g. to 127.0.0.1
+SERVER_HOST: str = os.environ.get('OSU_HOST') or os.environ.get('FLET_SERVER_IP') or '0.0.0.0'
+    # when set, /metrics needs an "Authorization: Bearer <token>" header, otherwise it is only served to this machine
+METRICS_TOKEN: str | None = os.environ.get('OSU_METRICS_TOKEN') or None
+METRICS_LOOPBACK_HOSTS: frozenset[str] = frozenset({'127.0.0.1', '::1'})
+
+def create_web_app(session_handler: Callable[[ft.Page], Awaitable[None]], assets_dir: str = 'assets') -> flet_fastapi.FastAPI:
+    web_app: flet_fastapi.FastAPI = flet_fastapi.FastAPI()
+
+    @web_app.get(f'{osu_images.IMAGE_ROUTE}/{{key}}')
+    async def get_image(key: str, request: Request, w: int | None = None, h: int | None = None) -> Response:
+        # only sizes the app itself displays images at, so that the thumbnail cache cannot be flooded with arbitrary ones
+        if (w or h) and (w or None, h or None) not in osu_images.image_cache.thumbnail_sizes:
+            return Response(status_code=404)
+
+        entry: osu_images.ImageCacheEntry | None = await osu_images.image_cache.get_by_key(key)
+        if entry is None:
+            return Response(status_code=404)
+        entry = await osu_thumbnails.thumbnail_cache.get(entry, w, h)
+
+        headers: dict[str, str] = {
+            'Cache-Control': f'public, max-age={IMAGE_ROUTE_MAX_AGE_SECONDS}',
+            'ETag': f'"{entry.digest}"'
+        }
+        if request.headers.get('If-None-Match') == headers['ETag']:
+            return Response(status_code=304, headers=headers)
+
+        return Response(content=entry.content, media_type=entry.content_type or 'application/octet-stream', headers=headers)
+
+    # scraped by Prometheus (or just opened in a browser) to find the slow stage under real load
+    @web_app.get('/metrics')
+    async def get_metrics(request: Request) -> Response:
+        if METRICS_TOKEN is None:
+            if request.client is None or request.client.host not in METRICS_LOOPBACK_HOSTS:
+                return Response(status_code=404)
+        elif not secrets.compare_digest(request.headers.get('Authorization', ''), f'Bearer {METRICS_TOKEN}'):
+            return Response(status_code=401, headers={'WWW-Authenticate': 'Bearer'})
+        return Response(content=osu_metrics.registry.render(), media_type='text/plain; version=0.0.4')
+
+    # Flet's handlers (web client, websocket, OAuth callback) take every other path, so they are mounted last
+    web_app.mount('/', flet_fastapi.app(
+        session_handler,
+        assets_dir=os.path.abspath(assets_dir),
+        web_renderer=ft.WebRenderer.CANVAS_KIT
+    ))
+
+    return web_app
+
+def serve(session_handler: Callable[[ft.Page], Awaitable[None]], host: str = SERVER_HOST, port: int = 80) -> None:
+    uvicorn.run(create_web_app(session_handler), host=host, port=port)
+    osu_thumbnails.thumbnail_cache.shutdown()
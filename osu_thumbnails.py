@@ -0,0 +1,156 @@
+from __future__ import annotations
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, asdict
+import asyncio
+import io
+import multiprocessing
+import os
+import osu_images
+import osu_metrics
+
+# Pillow is optional: without it (or with OSU_THUMBNAILS=0) the image route just serves the original images
+try:
+    from PIL import Image # type: ignore
+except ImportError:
+    Image = None
+
+# --- -----
+
+# covers and avatars downscaled to the size they are displayed at, and re-encoded as WebP
+# decoding and encoding run in a process pool, so a large cover never holds up the event loop (or the GIL) of the Flet sessions
+# thumbnails are kept in a size-bounded in-memory LRU, keyed by the original image's content and the requested size,
+# so a revalidated image that actually changed gets new thumbnails, and an unchanged one keeps its old ones
+
+THUMBNAILS_ENABLED: bool = Image is not None and os.environ.get('OSU_THUMBNAILS', '1') != '0'
+THUMBNAIL_CACHE_MEMORY_BYTES: int = int(os.environ.get('OSU_THUMBNAIL_CACHE_MEMORY_MB', '32')) * 1024 * 1024
+THUMBNAIL_WORKERS: int = int(os.environ.get('OSU_THUMBNAIL_WORKERS', '2'))
+    # thumbnails are rendered at this multiple of their displayed size, so they stay sharp on high-DPI screens
+THUMBNAIL_SCALE: float = float(os.environ.get('OSU_THUMBNAIL_SCALE', '2'))
+THUMBNAIL_QUALITY: int = 80
+THUMBNAIL_CONTENT_TYPE: str = 'image/webp'
+    # what each cache entry costs on top of its content (key, LRU node), so that "serve the original" markers count against the budget too
+THUMBNAIL_ENTRY_OVERHEAD_BYTES: int = 256
+
+def make_thumbnail(content: bytes, width: int, height: int, quality: int = THUMBNAIL_QUALITY) -> bytes | None:
+    """downscale content to fit within width x height (keeping its aspect ratio) and encode it as WebP
+    return None if the original should be served as is: animated, not decodable, or not any smaller as a thumbnail
+    runs in a worker process
+    """
+    try:
+        with Image.open(io.BytesIO(content)) as image:
+            # animated avatars would lose their animation
+            if getattr(image, 'is_animated', False):
+                return None
+
+            # lets JPEG decode straight at a reduced scale, instead of decoding at full size and then downscaling
+            image.draft('RGB', (width, height))
+            image.thumbnail((width, height), Image.Resampling.LANCZOS)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+            thumbnail_file = io.BytesIO()
+            image.save(thumbnail_file, 'WEBP', quality=quality, method=4)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+    thumbnail: bytes = thumbnail_file.getvalue()
+    return thumbnail if len(thumbnail) < len(content) else None
+
+def get_entry_bytes(thumbnail_entry: osu_images.ImageCacheEntry | None) -> int:
+    return THUMBNAIL_ENTRY_OVERHEAD_BYTES + (len(thumbnail_entry.content) if thumbnail_entry else 0)
+
+@dataclass
+class ThumbnailCacheStats:
+    hits: int = 0
+    misses: int = 0
+    originals: int = 0
+    evictions: int = 0
+    errors: int = 0
+
+@dataclass
+class ThumbnailCache:
+    max_memory_bytes: int = THUMBNAIL_CACHE_MEMORY_BYTES
+    workers: int = THUMBNAIL_WORKERS
+    scale: float = THUMBNAIL_SCALE
+    enabled: bool = THUMBNAILS_ENABLED
+
+    stats: ThumbnailCacheStats = field(default_factory=ThumbnailCacheStats)
+    memory_bytes: int = field(init=False, default=0)
+        # None marks an image that is served as the original (see make_thumbnail), so it is not decoded again on every request
+    _memory: OrderedDict[tuple[str, int, int], osu_images.ImageCacheEntry | None] = field(init=False, default_factory=OrderedDict)
+    _in_flight: dict[tuple[str, int, int], asyncio.Task[osu_images.ImageCacheEntry | None]] = field(init=False, default_factory=dict)
+    _executor: ProcessPoolExecutor | None = field(init=False, default=None)
+
+    async def get(self, entry: osu_images.ImageCacheEntry, width: int | None, height: int | None) -> osu_images.ImageCacheEntry:
+        """return entry downscaled to fit within width x height (at the display scale), or entry itself if it cannot be made any smaller
+        """
+        if not self.enabled or (not width and not height):
+            return entry
+
+        # a missing dimension is unbounded, as with ft.Image(width=...) and no height
+        size: tuple[int, int] = (
+            round(width*self.scale) if width else 1 << 16,
+            round(height*self.scale) if height else 1 << 16
+        )
+        key: tuple[str, int, int] = (entry.digest, *size)
+
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.stats.hits += 1
+            return self._memory[key] or entry
+
+        task: asyncio.Task[osu_images.ImageCacheEntry | None] | None = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, entry, size))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        return await asyncio.shield(task) or entry
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self.stats) | {'memory_bytes': self.memory_bytes, 'memory_entries': len(self._memory), 'in_flight': len(self._in_flight)}
+
+    # ---
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn rather than fork: the server process has threads running (uvicorn, Flet), which fork does not carry over safely
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    async def _load(self, key: tuple[str, int, int], entry: osu_images.ImageCacheEntry, size: tuple[int, int]) -> osu_images.ImageCacheEntry | None:
+        self.stats.misses += 1
+        try:
+            with osu_metrics.registry.time(osu_metrics.THUMBNAIL_SECONDS):
+                thumbnail: bytes | None = await asyncio.get_running_loop().run_in_executor(self._get_executor(), make_thumbnail, entry.content, *size)
+        except Exception:
+            # a crashed or shut down pool: serve the original this time, and try again on the next request
+            self.stats.errors += 1
+            return None
+
+        if thumbnail is None:
+            self.stats.originals += 1
+            self._store_memory(key, None)
+            return None
+
+        thumbnail_entry: osu_images.ImageCacheEntry = osu_images.ImageCacheEntry(thumbnail, THUMBNAIL_CONTENT_TYPE, None, None, entry.fetched_at)
+        self._store_memory(key, thumbnail_entry)
+        return thumbnail_entry
+
+    def _store_memory(self, key: tuple[str, int, int], thumbnail_entry: osu_images.ImageCacheEntry | None) -> None:
+        self._memory[key] = thumbnail_entry
+        self.memory_bytes += get_entry_bytes(thumbnail_entry)
+
+        while self.memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self.memory_bytes -= get_entry_bytes(evicted)
+            self.stats.evictions += 1
+
+thumbnail_cache: ThumbnailCache = ThumbnailCache()
+osu_metrics.registry.register_stats('thumbnail_cache', lambda: thumbnail_cache.as_dict())
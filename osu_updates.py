@@ -0,0 +1,94 @@
+from __future__ import annotations
+from dataclasses import dataclass, field, asdict
+import asyncio
+import os
+import time
+import flet as ft # type: ignore
+import osu_metrics
+
+# --- -----
+
+# per-session update layer: handlers mark the controls they changed, and everything marked within one event loop tick is sent in one page.update(...)
+# page.update() with no arguments walks (and diffs) every control on the page, page.update(*controls) only walks the controls given and their children
+
+# set OSU_TARGETED_UPDATES=0 to go back to a full page.update() for every update (e.g. to compare the two)
+CONTROL_UPDATES_TARGETED: bool = os.environ.get('OSU_TARGETED_UPDATES', '1') != '0'
+
+@dataclass
+class ControlUpdaterStats:
+    updates: int = 0
+    flushes: int = 0
+    full_flushes: int = 0
+    controls_flushed: int = 0
+    flush_seconds_total: float = 0
+    flush_seconds_max: float = 0
+
+@dataclass
+class ControlUpdater:
+    page: ft.Page
+    targeted: bool = CONTROL_UPDATES_TARGETED
+
+    stats: ControlUpdaterStats = field(default_factory=ControlUpdaterStats)
+    _dirty: dict[int, ft.Control] = field(init=False, default_factory=dict)
+    _dirty_page: bool = field(init=False, default=False)
+    _flush_handle: asyncio.Handle | None = field(init=False, default=None)
+
+    def update(self, *controls: ft.Control) -> None:
+        """mark controls as changed, to be sent to the client at the end of this event loop tick
+        with no controls, the whole page is updated instead (e.g. after switching views)
+        if a control's children were added or replaced, mark the control that holds them, since controls that are not on the page yet cannot be updated by themselves
+        """
+        self.stats.updates += 1
+
+        if not self.targeted:
+            self._flush_now(full=True)
+            return
+
+        if not controls:
+            self._dirty_page = True
+        for control in controls:
+            self._dirty[id(control)] = control
+
+        if self._flush_handle is None:
+            try:
+                self._flush_handle = asyncio.get_running_loop().call_soon(self.flush)
+            except RuntimeError:
+                # no event loop to defer to, so send it right away
+                self.flush()
+
+    def flush(self) -> None:
+        """send every pending update now
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        if not self._dirty_page and not self._dirty:
+            return
+
+        self._flush_now(full=self._dirty_page)
+
+    def as_dict(self) -> dict[str, float]:
+        return asdict(self.stats) | {'pending': len(self._dirty)}
+
+    # ---
+
+    def _flush_now(self, full: bool) -> None:
+        # controls that are not on the page (yet) are skipped, they are sent along with whichever marked control they were added to
+        controls: list[ft.Control] = [] if full else [control for control in self._dirty.values() if control.page is not None and control.uid is not None]
+        self._dirty.clear()
+        self._dirty_page = False
+
+        flush_start: float = time.perf_counter()
+        if full:
+            self.page.update() # type: ignore
+            self.stats.full_flushes += 1
+        elif controls:
+            self.page.update(*controls) # type: ignore
+            self.stats.controls_flushed += len(controls)
+        flush_seconds: float = time.perf_counter() - flush_start
+
+        osu_metrics.registry.observe(osu_metrics.PAGE_UPDATE_SECONDS, flush_seconds, kind='full' if full else 'targeted')
+        self.stats.flushes += 1
+        self.stats.flush_seconds_total += flush_seconds
+        self.stats.flush_seconds_max = max(self.stats.flush_seconds_max, flush_seconds)
@@ -0,0 +1,120 @@
+from __future__ import annotations
+from collections.abc import Iterable
+from dataclasses import dataclass, field, asdict
+import bisect
+import os
+import ossapi as ossapi # type: ignore
+import osu_metrics
+
+# --- -----
+
+# every username (current and former) of every user the app has resolved, for username type-ahead and for resolving names to user IDs without the API
+# kept as one sorted array of (casefolded name, user ID), so a prefix lookup is a binary search plus a short scan, and each entry costs one small tuple
+
+USERNAME_INDEX_MAX_ENTRIES: int = int(os.environ.get('OSU_USERNAME_INDEX_MAX_ENTRIES', '200000'))
+
+def get_username_key(username: str) -> str:
+    # osu! usernames are case-insensitive, and treat spaces and underscores as the same character
+    return username.casefold().replace('_', ' ')
+
+def is_username(user: ossapi.UserCompact, username: str) -> bool:
+    # whether username is user's current username, e.g. to check that a name resolved from the index still belongs to the user
+    return get_username_key(user.username) == get_username_key(username.strip())
+
+@dataclass(frozen=True, slots=True)
+class UsernameSuggestion:
+    user_id: int
+    username: str
+        # the former username that matched, if the current one did not
+    former_username: str | None = None
+
+@dataclass
+class UsernameIndexStats:
+    suggestions: int = 0
+    resolve_hits: int = 0
+    resolve_misses: int = 0
+        # users not added because the index was full
+    dropped: int = 0
+
+@dataclass
+class UsernameIndex:
+    max_entries: int = USERNAME_INDEX_MAX_ENTRIES
+
+    stats: UsernameIndexStats = field(default_factory=UsernameIndexStats)
+    _keys: list[tuple[str, int]] = field(init=False, default_factory=list)
+        # user ID -> current username (as displayed), and former usernames, by casefolded name
+    _usernames: dict[int, str] = field(init=False, default_factory=dict)
+    _former_usernames: dict[tuple[str, int], str] = field(init=False, default_factory=dict)
+
+    def add(self, user_id: int, username: str, previous_usernames: Iterable[str] = ()) -> None:
+        if user_id not in self._usernames and len(self._keys) >= self.max_entries:
+            # no eviction: a full index keeps answering for the users it has, and the API resolves the rest as before
+            self.stats.dropped += 1
+            return
+
+        former_username: str | None = self._usernames.get(user_id)
+        self._usernames[user_id] = username
+        self._insert(get_username_key(username), user_id)
+        self._former_usernames.pop((get_username_key(username), user_id), None)
+
+        # a rename seen by the app is a former username even before the API lists it as one
+        for previous_username in (*previous_usernames, *([former_username] if former_username and former_username != username else [])):
+            key: str = get_username_key(previous_username)
+            if key != get_username_key(username):
+                self._insert(key, user_id)
+                self._former_usernames[(key, user_id)] = previous_username
+
+    def add_user(self, user: ossapi.UserCompact) -> None:
+        self.add(user.id, user.username, user.previous_usernames or [])
+
+    def add_users(self, users: Iterable[ossapi.UserCompact]) -> None:
+        for user in users:
+            self.add_user(user)
+
+    def resolve(self, username: str) -> int | None:
+        """the ID of the user whose current username this is, if the app has seen them
+        a former username is not resolved: whoever has it now may be someone the app has not seen, so only the API can answer for it
+        """
+        key: str = get_username_key(username.strip())
+        user_id: int | None = next((user_id for candidate_key, user_id in self._iter_prefix(key) if candidate_key == key and (key, user_id) not in self._former_usernames), None)
+
+        if user_id is None:
+            self.stats.resolve_misses += 1
+        else:
+            self.stats.resolve_hits += 1
+        return user_id
+
+    def suggest(self, prefix: str, limit: int = 8) -> list[UsernameSuggestion]:
+        """up to limit users with a username (or former username) starting with prefix, in alphabetical order, each user once
+        """
+        with osu_metrics.registry.time(osu_metrics.LOCAL_SEARCH_SECONDS, index='usernames'):
+            suggestions: dict[int, UsernameSuggestion] = {}
+            prefix_key: str = get_username_key(prefix.strip())
+
+            for key, user_id in self._iter_prefix(prefix_key):
+                if len(suggestions) >= limit:
+                    break
+                if user_id not in suggestions:
+                    suggestions[user_id] = UsernameSuggestion(user_id, self._usernames[user_id], self._former_usernames.get((key, user_id)))
+
+        self.stats.suggestions += 1
+        return list(suggestions.values())
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self.stats) | {'entries': len(self._keys), 'users': len(self._usernames)}
+
+    # ---
+
+    def _insert(self, key: str, user_id: int) -> None:
+        i: int = bisect.bisect_left(self._keys, (key, user_id))
+        if i == len(self._keys) or self._keys[i] != (key, user_id):
+            self._keys.insert(i, (key, user_id))
+
+    def _iter_prefix(self, prefix_key: str) -> Iterable[tuple[str, int]]:
+        for i in range(bisect.bisect_left(self._keys, (prefix_key,)), len(self._keys)):
+            if not self._keys[i][0].startswith(prefix_key):
+                return
+            yield self._keys[i]
+
+username_index: UsernameIndex = UsernameIndex()
+osu_metrics.registry.register_stats('username_index', lambda: username_index.as_dict())
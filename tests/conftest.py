@@ -0,0 +1,7 @@
+import os
+import sys
+
+# the app is a set of top-level modules rather than a package, so make them importable from the tests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# and the headless Flet page and fake ossapi handler the benchmarks use, for tests that need a real App
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
@@ -0,0 +1,65 @@
+from __future__ import annotations
+from typing import Any
+import asyncio
+import types
+import ossapi # type: ignore
+import headless
+import osu_mods
+from osu_api_flet import App, BeatmapRenderer
+
+# --- -----
+
+class ControlledOssapiHandler(headless.FakeOssapiHandler):
+    """beatmap_attributes only returns once the test resolves the future for that mod combination"""
+    def __init__(self) -> None:
+        super().__init__()
+        self.pending: dict[int, asyncio.Future[Any]] = {}
+
+    async def beatmap_attributes(self, beatmap_id: int, mods: ossapi.Mod | None = None) -> Any:
+        return await self.pending.setdefault(mods.value if mods is not None else 0, asyncio.get_running_loop().create_future())
+
+def make_difficulty_attributes(star_rating: float) -> Any:
+    return types.SimpleNamespace(attributes=types.SimpleNamespace(star_rating=star_rating))
+
+async def wait_until(condition: Any) -> None:
+    while not condition():
+        await asyncio.sleep(0)
+
+def test_latest_mod_toggle_wins_when_the_first_request_finishes_last(monkeypatch: Any) -> None:
+    monkeypatch.setattr(BeatmapRenderer, 'MOD_TOGGLE_DEBOUNCE_SECONDS', 0)
+
+    async def run() -> None:
+        page, _ = headless.make_page()
+        app: App = App(page)
+        ossapi_handler: ControlledOssapiHandler = ControlledOssapiHandler()
+        app.ossapi_handler = ossapi_handler # type: ignore
+        # the NoMod attributes are fetched while the renderer is set up, leave prefetching off so the only other requests are the toggles
+        ossapi_handler.pending[0] = asyncio.get_running_loop().create_future()
+        ossapi_handler.pending[0].set_result(make_difficulty_attributes(5.55))
+        beatmap_renderer: BeatmapRenderer = BeatmapRenderer(app, headless.make_fake_beatmap(960_006))
+        await beatmap_renderer._post_init_async()
+        beatmap_renderer.build_beatmap_panel()
+
+        hr: osu_mods.ModSet = osu_mods.ModSet.from_acronyms('HR')
+        dt: osu_mods.ModSet = osu_mods.ModSet.from_acronyms('DT')
+
+        # toggle HR, and toggle DT while HR's star rating is still being fetched
+        first_toggle: asyncio.Task[None] = asyncio.create_task(beatmap_renderer.select_mods(hr))
+        await wait_until(lambda: hr.to_ossapi().value in ossapi_handler.pending)
+        second_toggle: asyncio.Task[None] = asyncio.create_task(beatmap_renderer.select_mods(dt))
+        await wait_until(lambda: dt.to_ossapi().value in ossapi_handler.pending)
+
+        # DT's request finishes first, then HR's
+        ossapi_handler.pending[dt.to_ossapi().value].set_result(make_difficulty_attributes(7.77))
+        await second_toggle
+        ossapi_handler.pending[hr.to_ossapi().value].set_result(make_difficulty_attributes(6.66))
+        await first_toggle
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+        assert beatmap_renderer.selected_mods == dt
+        assert beatmap_renderer.text_beatmap_stars.value == 'Stars: 7.77'
+        assert beatmap_renderer.mod_toggle_updates_applied == 1
+        assert beatmap_renderer.mod_toggle_updates_cancelled == 1
+
+    asyncio.run(run())
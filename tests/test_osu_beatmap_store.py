@@ -0,0 +1,136 @@
+from __future__ import annotations
+import datetime
+import pytest
+import osu_beatmap_store
+import osu_mods
+from osu_beatmap_store import BeatmapQuery
+
+# --- -----
+
+### BeatmapQuery
+
+def test_words_become_lowercase_terms() -> None:
+    query = BeatmapQuery.parse('Freedom  DIVE')
+    assert query.terms == ('freedom', 'dive')
+    assert query.filters == ()
+    assert query.mods == osu_mods.ModSet()
+    assert not query.is_empty
+
+def test_punctuation_splits_words() -> None:
+    assert BeatmapQuery.parse('xi - "freedom dive" [four dimensions]').terms == ('xi', 'freedom', 'dive', 'four', 'dimensions')
+
+def test_mod_acronyms_are_selected_not_searched() -> None:
+    query = BeatmapQuery.parse('freedom dive HR dt')
+    assert query.terms == ('freedom', 'dive')
+    assert query.mods == osu_mods.ModSet.from_mods(['HR', 'DT'])
+
+def test_only_a_mod_acronym_is_a_title() -> None:
+    query = BeatmapQuery.parse('HD')
+    assert query.terms == ('hd',)
+    assert query.mods == osu_mods.ModSet()
+
+@pytest.mark.parametrize(('search', 'filters'), [
+    ('stars>7', (('b.difficultyrating', '>', 7.0),)),
+    ('SR<=5.5', (('b.difficultyrating', '<=', 5.5),)),
+    ('ar>=9 od<8', (('b.diff_approach', '>=', 9.0), ('b.diff_overall', '<', 8.0))),
+    ('bpm>200', (('b.bpm', '>', 200.0),)),
+    ('length<90', (('b.total_length', '<', 90.0),))
+])
+def test_filters(search: str, filters: tuple[tuple[str, str, float], ...]) -> None:
+    query = BeatmapQuery.parse(search)
+    assert query.filters == filters
+    assert query.terms == ()
+    assert not query.is_empty
+
+@pytest.mark.parametrize(('search', 'low', 'high'), [
+    # = matches everything that rounds to the value, at the precision it was written with
+    ('stars=6', 5.5, 6.5),
+    ('stars:6.2', 6.15, 6.25),
+    ('cs=4.25', 4.245, 4.255)
+])
+def test_equals_filter_is_a_range(search: str, low: float, high: float) -> None:
+    (column, operator_low, value_low), (_, operator_high, value_high) = BeatmapQuery.parse(search).filters
+    assert (operator_low, operator_high) == ('>=', '<')
+    assert (value_low, value_high) == (pytest.approx(low), pytest.approx(high))
+
+def test_unknown_filters_are_searched_as_words() -> None:
+    assert BeatmapQuery.parse('combo>100').terms == ('combo', '100')
+
+def test_empty_search() -> None:
+    assert BeatmapQuery.parse('   ').is_empty
+    assert BeatmapQuery.parse('!!').is_empty
+
+@pytest.mark.parametrize(('search', 'fts'), [
+    ('freedom dive', '"freedom" "dive"*'),
+    ('freedom d', '"freedom" "d"'),
+    ('camellia', '"camellia"*')
+])
+def test_to_fts_only_the_last_word_is_a_prefix(search: str, fts: str) -> None:
+    assert BeatmapQuery.parse(search).to_fts() == fts
+
+### Search
+
+BEATMAPSETS_SQL = '''INSERT INTO `osu_beatmapsets` (`beatmapset_id`, `user_id`, `artist`, `title`, `creator`, `tags`, `bpm`, `approved`, `play_count`) VALUES (1,10,'xi','FREEDOM DiVE','Nakagawa-Kanon','touhou',222.22,1,900),(2,20,'Camellia','Exit This Earth\\'s Atomosphere','ProfessionalBox','dive',170,1,500),(3,30,'Someone','Dive Into You','Mapper','',150,1,100);
+'''
+BEATMAPS_SQL = '''INSERT INTO `osu_beatmaps` (`beatmap_id`, `beatmapset_id`, `user_id`, `version`, `total_length`, `diff_drain`, `diff_size`, `diff_overall`, `diff_approach`, `playmode`, `approved`, `difficultyrating`, `playcount`, `bpm`) VALUES (101,1,10,'FOUR DIMENSIONS',257,5,4,8,9,0,1,7.21,900,222.22),(102,1,10,'Another',257,5,4,7,8.5,0,1,5.8,400,222.22),(201,2,20,'Evolution',500,6,4,9,9.6,0,1,8.12,500,170),(301,3,30,'Normal',120,3,3,4,5,0,1,2.1,100,150);
+'''
+
+def make_dump(tmp_path, name: str) -> str:
+    dump_path = tmp_path / name
+    dump_path.mkdir()
+    (dump_path / 'osu_beatmapsets.sql').write_text(BEATMAPSETS_SQL)
+    (dump_path / 'osu_beatmaps.sql').write_text(BEATMAPS_SQL)
+    return str(dump_path)
+
+@pytest.fixture
+def beatmap_store(tmp_path) -> osu_beatmap_store.BeatmapStore:
+    store_path: str = str(tmp_path / 'store.sqlite3')
+    osu_beatmap_store.ingest([make_dump(tmp_path, '2024_10_01_performance_osu_top_1000')], store_path)
+    return osu_beatmap_store.BeatmapStore(store_path, max_age_days=0)
+
+def test_search_ranks_title_matches_first(beatmap_store: osu_beatmap_store.BeatmapStore) -> None:
+    assert beatmap_store.can_search
+    # a title match outranks a tag match, even a more played one
+    beatmap_ids = beatmap_store.search_beatmaps(BeatmapQuery.parse('dive'))
+    assert sorted(beatmap_ids[:3]) == [101, 102, 301]
+    assert beatmap_ids[3:] == [201]
+
+def test_search_matches_a_prefix_of_the_last_word(beatmap_store: osu_beatmap_store.BeatmapStore) -> None:
+    assert beatmap_store.search_beatmaps(BeatmapQuery.parse('freedom di')) == [101, 102]
+    assert beatmap_store.search_beatmaps(BeatmapQuery.parse('four dimensions')) == [101]
+
+def test_search_filters(beatmap_store: osu_beatmap_store.BeatmapStore) -> None:
+    assert beatmap_store.search_beatmaps(BeatmapQuery.parse('dive stars>7')) == [101, 201]
+    # a search of only filters is in star rating order
+    assert beatmap_store.search_beatmaps(BeatmapQuery.parse('ar>=8.5')) == [102, 101, 201]
+
+def test_search_pages(beatmap_store: osu_beatmap_store.BeatmapStore) -> None:
+    query = BeatmapQuery.parse('dive')
+    assert beatmap_store.search_beatmaps(query, offset=0, limit=2) + beatmap_store.search_beatmaps(query, offset=2, limit=2) == beatmap_store.search_beatmaps(query)
+
+def test_no_store_finds_nothing(tmp_path) -> None:
+    beatmap_store = osu_beatmap_store.BeatmapStore(str(tmp_path / 'missing.sqlite3'))
+    assert not beatmap_store.can_search
+    assert beatmap_store.search_beatmaps(BeatmapQuery.parse('dive')) == []
+
+### Freshness
+
+def test_dated_dump_is_fresh(beatmap_store: osu_beatmap_store.BeatmapStore) -> None:
+    assert beatmap_store.get_beatmap(101) is not None
+    assert beatmap_store.as_dict()['fresh']
+
+def test_undated_dump_is_never_fresh(tmp_path) -> None:
+    store_path: str = str(tmp_path / 'store.sqlite3')
+    osu_beatmap_store.ingest([make_dump(tmp_path, 'performance_osu_top_1000')], store_path)
+    beatmap_store = osu_beatmap_store.BeatmapStore(store_path, max_age_days=0)
+    # it still finds beatmaps, but their details come from the API
+    assert beatmap_store.search_beatmaps(BeatmapQuery.parse('four dimensions')) == [101]
+    assert beatmap_store.get_beatmap(101) is None
+    assert not beatmap_store.as_dict()['fresh']
+
+def test_dump_date_can_be_given(tmp_path) -> None:
+    store_path: str = str(tmp_path / 'store.sqlite3')
+    osu_beatmap_store.ingest([make_dump(tmp_path, 'performance_osu_top_1000')], store_path, datetime.date(2024, 10, 1))
+    beatmap_store = osu_beatmap_store.BeatmapStore(store_path, max_age_days=0)
+    assert beatmap_store.get_beatmap(101) is not None
+    assert beatmap_store.as_dict()['fresh']
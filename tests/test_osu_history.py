@@ -0,0 +1,61 @@
+from __future__ import annotations
+from osu_history import NavigationHistory
+
+# --- -----
+
+def make_history(max_entries: int = 20) -> tuple[NavigationHistory[str], list[str]]:
+    released: list[str] = []
+    return NavigationHistory(release=released.append, max_entries=max_entries), released
+
+def test_empty_history() -> None:
+    history, _ = make_history()
+    assert history.current is None
+    assert not history.can_go_back and not history.can_go_forward
+    assert history.back() is None
+    assert history.forward() is None
+
+def test_back_and_forward() -> None:
+    history, released = make_history()
+    for entry in ('a', 'b', 'c'):
+        history.visit(entry)
+    assert history.current == 'c'
+
+    assert history.back() == 'b'
+    assert history.back() == 'a'
+    assert history.back() is None
+    assert history.current == 'a'
+    assert not history.can_go_back and history.can_go_forward
+
+    assert history.forward() == 'b'
+    assert history.forward() == 'c'
+    assert history.forward() is None
+    assert released == []
+
+def test_visiting_after_going_back_drops_the_forward_entries() -> None:
+    history, released = make_history()
+    for entry in ('a', 'b', 'c'):
+        history.visit(entry)
+    history.back()
+    history.back()
+
+    history.visit('d')
+    assert history.entries == ['a', 'd']
+    assert not history.can_go_forward
+    assert released == ['b', 'c']
+
+def test_oldest_entries_age_out() -> None:
+    history, released = make_history(max_entries=3)
+    for entry in ('a', 'b', 'c', 'd', 'e'):
+        history.visit(entry)
+    assert history.entries == ['c', 'd', 'e']
+    assert history.current == 'e'
+    assert released == ['a', 'b']
+
+def test_clear_releases_everything_once() -> None:
+    history, released = make_history()
+    for entry in ('a', 'b'):
+        history.visit(entry)
+    history.clear()
+    history.clear()
+    assert history.current is None
+    assert released == ['a', 'b']
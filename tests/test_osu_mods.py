@@ -0,0 +1,163 @@
+from __future__ import annotations
+import ossapi as ossapi # type: ignore
+import pytest
+import osu_mods
+from osu_mods import ModSet
+
+# --- -----
+
+def mods(acronyms: str) -> ModSet:
+    return ModSet.from_acronyms(acronyms)
+
+### ModSet
+
+def test_toggle_selects_and_deselects() -> None:
+    assert ModSet().toggle('HD') == mods('HD')
+    assert mods('HD').toggle('HD') == ModSet()
+    assert mods('HD').toggle('HR') == mods('HDHR')
+
+@pytest.mark.parametrize(('selected', 'mod', 'expected'), [
+    ('DT', 'HT', 'HT'),
+    ('HT', 'DT', 'DT'),
+    ('NC', 'HT', 'HT'),
+    ('HT', 'NC', 'NC'),
+    ('DT', 'NC', 'NC'),
+    ('HR', 'EZ', 'EZ'),
+    ('EZ', 'HR', 'HR'),
+    ('HDHRDT', 'EZ', 'HDDTEZ'),
+    ('HDHRDT', 'HT', 'HDHRHT')
+])
+def test_toggle_deselects_conflicting_mods(selected: str, mod: osu_mods.ModWorthPP, expected: str) -> None:
+    assert mods(selected).toggle(mod) == mods(expected)
+
+@pytest.mark.parametrize(('acronyms', 'is_valid'), [
+    ('', True),
+    ('HDHRDT', True),
+    ('EZHTFL', True),
+    ('DTHT', False),
+    ('NCHT', False),
+    ('DTNC', False),
+    ('HREZ', False)
+])
+def test_is_valid(acronyms: str, is_valid: bool) -> None:
+    assert mods(acronyms).is_valid is is_valid
+
+@pytest.mark.parametrize(('acronyms', 'value'), [
+    ('', 0),
+    ('HD', 8),
+    ('HR', 16),
+    ('DT', 64),
+    ('HDHRDT', 88),
+    ('EZHT', 258),
+    ('FL', 1024),
+    # NC is sent with the DT bit set, as the API expects
+    ('NC', 576),
+    ('HDNC', 584)
+])
+def test_value_is_the_api_bitmask(acronyms: str, value: int) -> None:
+    assert mods(acronyms).value == value
+    assert mods(acronyms).value == ossapi.Mod(acronyms or 'NM').value
+
+def test_iteration_and_str() -> None:
+    mod_set = ModSet.from_mods(['DT', 'HR', 'HD'])
+    assert tuple(mod_set) == ('HD', 'HR', 'DT')
+    assert len(mod_set) == 3
+    assert 'HR' in mod_set and 'EZ' not in mod_set
+    # printed the way ossapi prints mods
+    assert str(mod_set) == str(ossapi.Mod('HDHRDT'))
+
+def test_from_acronyms_rejects_unknown_mods() -> None:
+    with pytest.raises(KeyError):
+        ModSet.from_acronyms('HDXX')
+
+### Beatmap settings
+
+@pytest.mark.parametrize(('ar', 'acronyms', 'expected'), [
+    (9, 'DT', 10.33),
+    (10, 'DT', 11),
+    (8, 'DT', 9.67),
+    (5, 'DT', 7.67),
+    (4, 'DT', 7.13),
+    (9, 'HT', 7.67),
+    (10, 'HT', 9),
+    (9, 'HRDT', 11),
+    (9, 'EZHT', 1),
+    (8, 'NC', 9.67)
+])
+def test_ar_with_rate_mods(ar: float, acronyms: str, expected: float) -> None:
+    assert osu_mods.get_beatmap_ar_with_mods(ar, mods(acronyms)) == pytest.approx(expected, abs=0.005)
+
+@pytest.mark.parametrize(('od', 'acronyms', 'expected'), [
+    (8, 'DT', 9.78),
+    (10, 'DT', 11.11),
+    (5, 'DT', 7.78),
+    (8, 'HT', 6.22),
+    (10, 'HT', 8.89),
+    (9, 'HRDT', 11.11),
+    (8, 'HR', 10)
+])
+def test_od_with_rate_mods(od: float, acronyms: str, expected: float) -> None:
+    assert osu_mods.get_beatmap_od_with_mods(od, mods(acronyms)) == pytest.approx(expected, abs=0.005)
+
+@pytest.mark.parametrize(('acronyms', 'length', 'bpm'), [
+    ('', 120, 180),
+    ('DT', 80, 270),
+    ('NC', 80, 270),
+    ('HT', 160, 135)
+])
+def test_length_and_bpm_with_rate_mods(acronyms: str, length: int, bpm: float) -> None:
+    assert osu_mods.get_beatmap_length_with_mods(120, mods(acronyms)) == length
+    assert osu_mods.get_beatmap_bpm_with_mods(180, mods(acronyms)) == bpm
+    assert osu_mods.get_beatmap_bpm_with_mods(None, mods(acronyms)) is None
+
+def test_hr_and_ez_cap_and_scale_settings() -> None:
+    settings = osu_mods.BeatmapSettings(cs=8, ar=9, od=8, hp=6, length=100, bpm=200)
+    assert osu_mods.get_settings_with_mods(settings, mods('HR')) == osu_mods.BeatmapSettings(cs=10, ar=10, od=10, hp=pytest.approx(8.4), length=100, bpm=200) # type: ignore
+    assert osu_mods.get_settings_with_mods(settings, mods('EZ')) == osu_mods.BeatmapSettings(cs=4, ar=4.5, od=4, hp=3, length=100, bpm=200)
+
+### Display model
+
+SETTINGS = osu_mods.BeatmapSettings(cs=4, ar=9, od=8, hp=6, length=120, bpm=180)
+
+@pytest.mark.parametrize(('acronyms', 'stars_color'), [
+    ('', osu_mods.COLOR_DEFAULT),
+    ('HD', osu_mods.COLOR_DEFAULT),
+    ('HR', osu_mods.COLOR_HR),
+    ('EZ', osu_mods.COLOR_EZ),
+    # FL wins over HR/EZ, and the rate mods win over everything
+    ('HRFL', osu_mods.COLOR_FL),
+    ('HRFLDT', osu_mods.COLOR_DT),
+    ('NC', osu_mods.COLOR_NC),
+    ('EZHT', osu_mods.COLOR_HT)
+])
+def test_stars_color(acronyms: str, stars_color: str) -> None:
+    assert osu_mods.get_display_model(SETTINGS, mods(acronyms)).stars_color == stars_color
+
+def test_display_model_values_and_colors() -> None:
+    display_model = osu_mods.get_display_model(SETTINGS, mods('HRDT'))
+    assert display_model.length == osu_mods.DisplayValue('Length: 80', '80', osu_mods.COLOR_DT)
+    assert display_model.bpm == osu_mods.DisplayValue('BPM: 270', '270', osu_mods.COLOR_DT)
+    assert display_model.cs == osu_mods.DisplayValue('5.2', '5.2', osu_mods.COLOR_HR)
+    assert display_model.ar.value == '11' and display_model.ar.color == osu_mods.COLOR_DT
+    assert display_model.od.value == '11.11' and display_model.od.color == osu_mods.COLOR_DT
+    assert display_model.hp.value == '8.4' and display_model.hp.color == osu_mods.COLOR_HR
+    assert display_model.mods.value == f'Mods: {ossapi.Mod("HRDT")}'
+
+def test_display_model_without_bpm() -> None:
+    display_model = osu_mods.get_display_model(osu_mods.BeatmapSettings(cs=4, ar=9, od=8, hp=6, length=120, bpm=None), ModSet())
+    assert display_model.bpm.value == 'BPM: ?'
+
+@pytest.mark.parametrize(('acronyms', 'difficulty_mods'), [
+    ('', ''),
+    ('HD', ''),
+    ('HDHR', 'HR'),
+    ('HDDT', 'DT'),
+    ('NC', 'DT'),
+    ('NFSO', ''),
+    # HD only changes difficulty along with FL
+    ('HDFL', 'HDFL'),
+    ('HDNCFL', 'HDDTFL'),
+    ('EZHT', 'EZHT')
+])
+def test_difficulty_mods(acronyms: str, difficulty_mods: str) -> None:
+    assert mods(acronyms).difficulty_mods == mods(difficulty_mods)
@@ -0,0 +1,155 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+import asyncio
+import pytest
+import osu_cache
+import osu_scheduler
+
+# --- -----
+
+@dataclass
+class FakeResponse:
+    status: int
+    headers: dict[str, str] = field(default_factory=dict)
+    released: bool = False
+
+    def release(self) -> None:
+        self.released = True
+
+def make_scheduler(**kwargs) -> osu_scheduler.RequestScheduler:
+    # one token to start with, then one every 10ms
+    return osu_scheduler.RequestScheduler(**{'requests_per_minute': 6000, 'burst': 1, **kwargs})
+
+async def acquire_in_order(scheduler: osu_scheduler.RequestScheduler, priorities: list[osu_scheduler.RequestPriority]) -> list[str]:
+    served: list[str] = []
+
+    async def acquire(name: str, priority: osu_scheduler.RequestPriority) -> None:
+        await scheduler.acquire(priority)
+        served.append(name)
+
+    await asyncio.gather(*[acquire(f'{priority}{i}', priority) for i, priority in enumerate(priorities)])
+    return served
+
+### Token bucket
+
+def test_burst_is_served_immediately() -> None:
+    async def run() -> None:
+        scheduler = make_scheduler(burst=3)
+        for _ in range(3):
+            await asyncio.wait_for(scheduler.acquire('interactive'), 0.001)
+        assert scheduler.available_tokens < 1
+        assert scheduler.stats.priorities['interactive'].queued == 0
+
+    asyncio.run(run())
+
+def test_queued_requests_are_served_by_priority() -> None:
+    async def run() -> None:
+        scheduler = make_scheduler()
+        await scheduler.acquire('interactive')
+
+        served = await acquire_in_order(scheduler, ['background', 'mod_toggle', 'interactive', 'background', 'interactive'])
+        assert served == ['interactive2', 'interactive4', 'mod_toggle1', 'background0', 'background3']
+        assert scheduler.stats.queue_depth_max == 5
+
+    asyncio.run(run())
+
+def test_available_tokens_is_zero_while_paused() -> None:
+    scheduler = make_scheduler(burst=5)
+    assert scheduler.available_tokens == 5
+    scheduler.pause(60)
+    assert scheduler.available_tokens == 0
+
+### Retries
+
+def test_429_is_retried_after_retry_after() -> None:
+    async def run() -> None:
+        scheduler = make_scheduler(burst=5)
+        responses = [FakeResponse(429, {'Retry-After': '0.01'}), FakeResponse(200)]
+
+        async def send() -> FakeResponse:
+            return responses.pop(0)
+
+        response = await scheduler.request(send) # type: ignore
+        assert response.status == 200
+        assert scheduler.stats.rate_limited == 1
+        assert scheduler.stats.retries == 1
+
+    asyncio.run(run())
+
+def test_rate_limited_after_max_retries() -> None:
+    async def run() -> None:
+        scheduler = make_scheduler(burst=5, max_retries=2, backoff_seconds=0.001)
+        sent: list[FakeResponse] = []
+
+        async def send() -> FakeResponse:
+            sent.append(FakeResponse(429))
+            return sent[-1]
+
+        with pytest.raises(osu_scheduler.RateLimited):
+            await scheduler.request(send) # type: ignore
+        assert len(sent) == 3
+        assert all(response.released for response in sent)
+
+    asyncio.run(run())
+
+### Shared requests
+
+def test_raising_a_queued_shared_request_moves_it_ahead() -> None:
+    async def run() -> None:
+        scheduler = make_scheduler()
+        await scheduler.acquire('interactive')
+        served: list[str] = []
+        shared_request = osu_scheduler.SharedRequest('background')
+
+        async def acquire(name: str, priority: osu_scheduler.RequestPriority, request: osu_scheduler.SharedRequest | None = None) -> None:
+            await scheduler.acquire(priority, request)
+            served.append(name)
+
+        tasks = [
+            asyncio.create_task(acquire('background', 'background')),
+            asyncio.create_task(acquire('shared', shared_request.priority, shared_request)),
+            asyncio.create_task(acquire('mod_toggle', 'mod_toggle'))
+        ]
+        await asyncio.sleep(0)
+        shared_request.raise_priority('interactive')
+        assert scheduler.queue_depth == 3
+
+        await asyncio.gather(*tasks)
+        assert served == ['shared', 'mod_toggle', 'background']
+
+    asyncio.run(run())
+
+def test_priority_is_never_lowered() -> None:
+    shared_request = osu_scheduler.SharedRequest('mod_toggle')
+    shared_request.raise_priority('background')
+    assert shared_request.priority == 'mod_toggle'
+
+def test_cache_lookup_raises_the_priority_of_the_request_it_joins(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def run() -> None:
+        scheduler = make_scheduler()
+        monkeypatch.setattr(osu_scheduler, 'request_scheduler', scheduler)
+        await scheduler.acquire('interactive')
+        cache: osu_cache.AsyncTTLCache[str, str] = osu_cache.AsyncTTLCache(max_entries=10, ttl_seconds=60)
+        served: list[str] = []
+
+        async def fetch(name: str) -> str:
+            await osu_scheduler.request_scheduler.request(lambda: asyncio.sleep(0, FakeResponse(200))) # type: ignore
+            served.append(name)
+            return name
+
+        async def prefetch(name: str) -> str:
+            with osu_scheduler.request_priority('background'):
+                return await cache.get_or_fetch(name, lambda: fetch(name))
+
+        prefetches = [asyncio.create_task(prefetch(name)) for name in ('HD', 'HR', 'DT')]
+        await asyncio.sleep(0.001)
+
+        # the click joins the DT prefetch, which then goes before the other two
+        with osu_scheduler.request_priority('mod_toggle'):
+            assert await cache.get_or_fetch('DT', lambda: fetch('DT')) == 'DT'
+        assert served[0] == 'DT'
+        assert cache.stats.coalesced == 1
+
+        await asyncio.gather(*prefetches)
+
+    asyncio.run(run())
@@ -0,0 +1,116 @@
+from __future__ import annotations
+from types import SimpleNamespace
+from typing import Any
+import asyncio
+import ossapi # type: ignore
+import osu_usernames
+from osu_usernames import UsernameIndex, UsernameSuggestion
+
+# --- -----
+
+def make_index() -> UsernameIndex:
+    username_index = UsernameIndex()
+    username_index.add(124493, 'chocomint', ['Cookiezi_old'])
+    username_index.add(2, 'peppy')
+    username_index.add(3, 'Cookiezi')
+    username_index.add(4, 'cookie monster')
+    return username_index
+
+### Suggestions
+
+def test_suggest_by_prefix_in_alphabetical_order() -> None:
+    assert make_index().suggest('cook') == [
+        UsernameSuggestion(4, 'cookie monster'),
+        UsernameSuggestion(3, 'Cookiezi'),
+        UsernameSuggestion(124493, 'chocomint', 'Cookiezi_old')
+    ]
+
+def test_suggest_matches_former_usernames() -> None:
+    suggestions = make_index().suggest('cookiezi ')
+    assert UsernameSuggestion(124493, 'chocomint', 'Cookiezi_old') in suggestions
+    assert UsernameSuggestion(3, 'Cookiezi') in suggestions
+
+def test_suggest_is_case_and_underscore_insensitive() -> None:
+    assert make_index().suggest('COOKIE_M') == [UsernameSuggestion(4, 'cookie monster')]
+
+def test_suggest_limit_and_each_user_once() -> None:
+    username_index = make_index()
+    assert len(username_index.suggest('c', limit=2)) == 2
+    assert [suggestion.user_id for suggestion in username_index.suggest('c')].count(124493) == 1
+
+def test_suggest_nothing() -> None:
+    assert make_index().suggest('zzz') == []
+
+### Resolving
+
+def test_resolve_current_username() -> None:
+    username_index = make_index()
+    assert username_index.resolve('Peppy') == 2
+    assert username_index.resolve(' cookie_monster ') == 4
+    assert username_index.stats.resolve_hits == 2
+
+def test_resolve_ignores_former_usernames() -> None:
+    # someone the app has not seen may have taken the name since, so only the API can say who has it now
+    username_index = make_index()
+    assert username_index.resolve('Cookiezi_old') is None
+    assert username_index.resolve('unknown') is None
+    assert username_index.stats.resolve_misses == 2
+
+def test_rename_makes_the_old_name_a_former_one() -> None:
+    username_index = make_index()
+    username_index.add(2, 'peppy2')
+    assert username_index.resolve('peppy') is None
+    assert username_index.resolve('peppy2') == 2
+    assert username_index.suggest('pep') == [UsernameSuggestion(2, 'peppy2', 'peppy')]
+
+def test_renaming_back_makes_the_name_current_again() -> None:
+    username_index = make_index()
+    username_index.add(2, 'peppy2')
+    username_index.add(2, 'peppy')
+    assert username_index.resolve('peppy') == 2
+
+def test_full_index_keeps_the_users_it_has() -> None:
+    username_index = UsernameIndex(max_entries=2)
+    username_index.add(1, 'a')
+    username_index.add(2, 'b')
+    username_index.add(3, 'c')
+    username_index.add(1, 'a2')
+    assert username_index.resolve('c') is None
+    assert username_index.resolve('a2') == 1
+    assert username_index.stats.dropped == 1
+
+def test_is_username() -> None:
+    user = SimpleNamespace(id=4, username='cookie monster')
+    assert osu_usernames.is_username(user, 'Cookie_Monster ') # type: ignore
+    assert not osu_usernames.is_username(user, 'cookie') # type: ignore
+
+### App.lookup_user
+
+class LookupOssapiHandler:
+    """chocomint (124493) can no longer be looked up by ID, e.g. restricted since the app saw them"""
+    def __init__(self) -> None:
+        self.lookups: list[tuple[int | str, Any]] = []
+
+    async def user(self, user: int | str, key: Any = None) -> Any:
+        self.lookups.append((user, key))
+        if user == 124493:
+            raise ValueError('User not found')
+        return SimpleNamespace(id=124493, username=str(user))
+
+def test_lookup_user_falls_back_to_the_username_when_the_id_lookup_fails(monkeypatch: Any) -> None:
+    import headless
+    from osu_api_flet import App
+
+    monkeypatch.setattr(osu_usernames, 'username_index', make_index())
+
+    async def run() -> None:
+        page, _ = headless.make_page()
+        app: App = App(page)
+        ossapi_handler: LookupOssapiHandler = LookupOssapiHandler()
+        app.ossapi_handler = ossapi_handler # type: ignore
+
+        user_ossapi: Any = await app.lookup_user('chocomint')
+        assert user_ossapi.username == 'chocomint'
+        assert ossapi_handler.lookups == [(124493, ossapi.UserLookupKey.ID), ('chocomint', None)]
+
+    asyncio.run(run())